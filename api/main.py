@@ -9,6 +9,10 @@ from core.config import settings
 from core.logger import app_logger 
 # MODIFICADO: Importar el api_router real desde su ubicación.
 from api.router import api_router # Asumiendo que tienes api/router.py
+from common.services.llm_client_registry import llm_client_registry
+from common.services.event_loop_monitor import event_loop_monitor
+from common.services.url_fetcher import url_fetcher
+from common.services.pdf_extractor import pdf_extractor
 
 # --- ELIMINADO: Bloque de simulación de api/router.py ---
 
@@ -44,11 +48,16 @@ async def startup_event():
     app_logger.info(f"Ruta OpenAPI JSON disponible en: {settings.API_V1_STR}/openapi.json")
     app_logger.info(f"Ruta de la UI de Docs (Swagger) disponible en: {settings.API_V1_STR}/docs")
     app_logger.info(f"Ruta de la UI de ReDoc disponible en: {settings.API_V1_STR}/redoc")
+    event_loop_monitor.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     app_logger.info("Cerrando aplicación...")
+    await event_loop_monitor.stop()
+    await llm_client_registry.aclose()
+    await url_fetcher.aclose()
+    pdf_extractor.shutdown()
 
 
 @app.get("/") 
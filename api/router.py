@@ -2,7 +2,7 @@ from fastapi import APIRouter
 
 from blog.api.routes import router as blog_router
 from linkedin.api.routes import router as linkedin_router
-from api.routes import auth_routes, user_routes, history_routes
+from api.routes import auth_routes, user_routes, history_routes, system_routes, usage_routes
 
 # NUEVAS IMPORTACIONES para las rutas de prompts
 from api.routes import system_prompt_template_routes # Router para plantillas base
@@ -18,6 +18,9 @@ api_router.include_router(user_routes.router)
 # Rutas de historial (ya tiene su propio prefijo /me/history)
 api_router.include_router(history_routes.router)
 
+# Consumo de LLM del usuario (tokens y coste; prefijo /me/usage)
+api_router.include_router(usage_routes.router)
+
 # Rutas específicas de módulos (LinkedIn y Blog ya tienen sus prefijos)
 api_router.include_router(blog_router) 
 api_router.include_router(linkedin_router) 
@@ -28,6 +31,9 @@ api_router.include_router(system_prompt_template_routes.router) # Este ya tiene
 # Las plantillas personalizadas del usuario sí están bajo /me/
 api_router.include_router(user_custom_prompt_routes.router) # Este ya tiene prefix="/me/custom-prompts"
 
+# Observabilidad interna (estadísticas del pool de clientes LLM, etc.)
+api_router.include_router(system_routes.router) # Este ya tiene prefix="/system"
+
 
 # Los routers para tags se añadirán después
 # from api.routes import tag_routes
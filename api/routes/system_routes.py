@@ -0,0 +1,164 @@
+# NUEVO ARCHIVO para endpoints de observabilidad interna (estadísticas de pools, cachés, etc.)
+
+from fastapi import APIRouter, Depends
+from typing import Dict, Any
+
+from core import models as db_models
+from api.dependencies import get_current_active_user
+from common.services.llm_client_registry import llm_client_registry
+from common.services.llm_response_cache import llm_response_cache
+from common.services.single_flight import llm_single_flight, generation_single_flight
+from common.services.llm_rate_limiter import llm_rate_limiter
+from common.services.llm_resilience import llm_resilience
+from common.services.context_budget import context_budget_manager
+from common.services.event_loop_monitor import event_loop_monitor
+from common.services.pipeline import pipeline_stats
+from common.services.url_fetcher import url_fetcher
+from common.services.url_cache import url_content_cache
+from common.services.pdf_extractor import pdf_extractor
+from common.services.pdf_cache import pdf_result_cache
+from common.services.pdf_blob_store import pdf_blob_store
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+@router.get("/llm-pool/stats", response_model=Dict[str, Any])
+async def read_llm_pool_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve las estadísticas del pool de clientes LLM compartidos:
+    clientes creados, conexiones abiertas/ociosas y latencias p50/p95 por modelo.
+    """
+    return llm_client_registry.get_stats()
+
+@router.get("/llm-cache/stats", response_model=Dict[str, Any])
+async def read_llm_cache_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores de la caché exacta de respuestas LLM:
+    aciertos, fallos, ratio de aciertos, expulsiones LRU y expiraciones por TTL.
+    """
+    return llm_response_cache.get_stats()
+
+@router.get("/single-flight/stats", response_model=Dict[str, Any])
+async def read_single_flight_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores de coalescencia de peticiones idénticas en curso, tanto a nivel
+    de llamada al LLM como de generación completa (con su guardado en el historial).
+    """
+    return {
+        "llm": llm_single_flight.get_stats(),
+        "generation": generation_single_flight.get_stats(),
+    }
+
+@router.get("/llm-rate-limiter/stats", response_model=Dict[str, Any])
+async def read_llm_rate_limiter_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve el estado del limitador de llamadas LLM por modelo: límites RPM/TPM,
+    límite de concurrencia adaptativo actual, llamadas en curso y en cola, esperas y sobrecargas.
+    """
+    return llm_rate_limiter.get_stats()
+
+@router.get("/llm-resilience/stats", response_model=Dict[str, Any])
+async def read_llm_resilience_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve, por modelo, los reintentos y peticiones de cobertura (hedging) realizados,
+    las veces que se agotó su presupuesto y el umbral de cobertura actual (p95 observado).
+    """
+    return llm_resilience.get_stats()
+
+@router.get("/context-budget/stats", response_model=Dict[str, Any])
+async def read_context_budget_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores del presupuesto de contexto: llamadas ajustadas, cuántas tuvieron
+    que recortar contenido y los tokens descartados por segmento (investigación, PDF...).
+    """
+    return context_budget_manager.get_stats()
+
+@router.get("/url-fetcher/stats", response_model=Dict[str, Any])
+async def read_url_fetcher_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores de la descarga de URLs de investigación: descargas, errores,
+    plazos agotados, páginas recortadas por tamaño, redirecciones y descargas en curso por host.
+    """
+    return url_fetcher.get_stats()
+
+@router.get("/url-cache/stats", response_model=Dict[str, Any])
+async def read_url_cache_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores de la caché persistente de contenido de URLs: aciertos sin red,
+    revalidaciones con 304, descargas completas, copias caducadas servidas ante error y expulsiones.
+    """
+    return url_content_cache.get_stats()
+
+@router.get("/pdf-extractor/stats", response_model=Dict[str, Any])
+async def read_pdf_extractor_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores de la extracción de PDFs en el pool de procesos: documentos y páginas
+    extraídos, documentos recortados por páginas, rechazos por tamaño o saturación, memoria de
+    parseo en curso frente al límite de admisión y caracteres/tokens ahorrados por la normalización.
+    """
+    return pdf_extractor.get_stats()
+
+@router.get("/pdf-cache/stats", response_model=Dict[str, Any])
+async def read_pdf_cache_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores de la caché persistente de PDFs: aciertos y fallos del texto extraído
+    y de la transformación a borrador de blog, expulsiones y ocupación en disco.
+    """
+    return pdf_result_cache.get_stats()
+
+@router.get("/pdf-blob-store/stats", response_model=Dict[str, Any])
+async def read_pdf_blob_store_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve los contadores del almacén de PDFs subidos: subidas, subidas repetidas que no se han
+    vuelto a escribir, bytes escritos, expulsiones y ocupación en disco.
+    """
+    return pdf_blob_store.get_stats()
+
+@router.get("/pipeline/stats", response_model=Dict[str, Any])
+async def read_pipeline_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve, por pipeline de generación (interés general, caso de éxito) y por paso,
+    el número de ejecuciones y la duración p50/p95, para ver qué paso domina la latencia.
+    """
+    return pipeline_stats.get_stats()
+
+@router.get("/event-loop/stats", response_model=Dict[str, Any])
+async def read_event_loop_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve el retardo observado del event loop de este worker (media, p50/p95/p99 y máximo).
+    Requiere EVENT_LOOP_MONITOR_ENABLED; sin él no se toman muestras.
+    """
+    return event_loop_monitor.get_stats()
+
+@router.post("/event-loop/reset", response_model=Dict[str, Any])
+async def reset_event_loop_stats(
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """Descarta las muestras de retardo acumuladas, p. ej. entre escalones de una prueba de carga."""
+    event_loop_monitor.reset()
+    return event_loop_monitor.get_stats()
@@ -0,0 +1,38 @@
+# NUEVO ARCHIVO para los endpoints de consumo de LLM (tokens, coste) del usuario
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+
+from core.database import get_db
+from core import models as db_models
+from schemas import usage_schemas
+from crud import usage_crud
+from api.dependencies import get_current_active_user
+
+router = APIRouter(prefix="/me/usage", tags=["Usage"])
+
+@router.get("/", response_model=usage_schemas.UsageReportResponse)
+async def read_my_llm_usage(
+    since: Optional[datetime] = Query(None, description="Solo generaciones creadas desde esta fecha (incluida)"),
+    until: Optional[datetime] = Query(None, description="Solo generaciones creadas antes de esta fecha"),
+    by_content_type: bool = Query(False, description="Desglosar también por tipo de contenido"),
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve el consumo de LLM del usuario actual por modelo: generaciones, llamadas,
+    tokens (de entrada, de salida y cacheados), reintentos, latencia media y coste estimado.
+    """
+    items = usage_crud.get_usage_aggregates(
+        db,
+        user_id=current_user.user_id,
+        since=since,
+        until=until,
+        group_by_user=False,
+        group_by_content_type=by_content_type
+    )
+    return usage_schemas.UsageReportResponse(
+        since=since, until=until, items=items, total_cost_usd=round(sum(item.cost_usd for item in items), 6)
+    )
@@ -0,0 +1,81 @@
+"""
+Benchmark de los extractores de texto HTML ("bs4", el original con BeautifulSoup, y "readability",
+el de contenido principal): tiempo por página y caracteres/tokens extraídos sobre un corpus de
+páginas guardadas (por defecto benchmarks/html_corpus; con --corpus, cualquier carpeta de .html).
+Los dos se recortan igual, a HTML_EXTRACT_MAX_CHARS, como en producción.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.html_extraction --repeats 20 --output extraccion.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict
+
+from common.services.context_budget import context_budget_manager
+from common.utils.helpers import extract_text_from_html
+from core.config import settings
+
+ENGINES = ["bs4", "readability"]
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "html_corpus")
+TOKEN_MODEL = "gpt-4o"
+
+
+def measure_page(html: str, engine: str, repeats: int) -> Dict[str, Any]:
+    samples_ms = []
+    text = ""
+    for _ in range(repeats):
+        started = time.perf_counter()
+        text = extract_text_from_html(html, engine=engine) or ""
+        samples_ms.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples_ms), 3),
+        "chars": len(text),
+        "tokens": context_budget_manager.count_tokens(text, TOKEN_MODEL),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Carpeta con las páginas .html")
+    parser.add_argument("--repeats", type=int, default=10, help="Extracciones medidas por página y extractor")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    pages = sorted(name for name in os.listdir(args.corpus) if name.endswith((".html", ".htm")))
+    results: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "corpus": args.corpus,
+        "max_chars": settings.HTML_EXTRACT_MAX_CHARS,
+        "pages": {},
+        "totals": {},
+    }
+    for name in pages:
+        with open(os.path.join(args.corpus, name), encoding="utf-8", errors="replace") as page_file:
+            html = page_file.read()
+        results["pages"][name] = {"html_bytes": len(html.encode("utf-8"))}
+        for engine in ENGINES:
+            results["pages"][name][engine] = measure_page(html, engine, args.repeats)
+
+    for engine in ENGINES:
+        results["totals"][engine] = {
+            metric: round(sum(page[engine][metric] for page in results["pages"].values()), 3)
+            for metric in ("median_ms", "chars", "tokens")
+        }
+    bs4_ms = results["totals"]["bs4"]["median_ms"]
+    if bs4_ms:
+        results["totals"]["readability_speedup"] = round(bs4_ms / max(results["totals"]["readability"]["median_ms"], 1e-9), 2)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
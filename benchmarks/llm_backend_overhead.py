@@ -0,0 +1,119 @@
+"""
+Micro-benchmark de los backends LLM ("langchain" y "openai"): sobrecoste por llamada y tiempo de
+importación del proceso. Las llamadas no salen a la red: un transporte httpx simulado responde al
+instante con una respuesta fija, de modo que lo medido es solo el coste propio de cada backend.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.llm_backend_overhead --calls 2000 --output resultados.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+import httpx
+
+from common.utils.stats import percentile
+
+BACKENDS = ["langchain", "openai"]
+MODEL_NAME = "gpt-4o"
+
+_COMPLETION_BODY = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": MODEL_NAME,
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Texto generado."}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1200, "completion_tokens": 40, "total_tokens": 1240,
+              "prompt_tokens_details": {"cached_tokens": 1024}},
+}
+
+# Mide, en un proceso nuevo, la importación de la aplicación más la creación del primer cliente del backend.
+_IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import api.main
+from common.services.llm_backends import get_llm_backend
+from common.services.llm_client_registry import llm_client_registry
+backend = get_llm_backend()
+if backend.name == "langchain":
+    llm_client_registry.get_client("gpt-4o")
+else:
+    llm_client_registry.get_openai_client()
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def measure_import_ms(backend: str, repeats: int) -> Dict[str, float]:
+    env = {**os.environ, "LLM_BACKEND": backend, "OPENAI_API_KEY": "sk-benchmark", "LOG_LEVEL": "WARNING"}
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2)}
+
+
+async def measure_call_overhead(backend_name: str, calls: int, warmup: int) -> Dict[str, Any]:
+    from core.config import settings
+    from common.services.llm_backends import get_llm_backend
+    from common.services.llm_client_registry import llm_client_registry
+
+    settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "sk-benchmark"
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=_COMPLETION_BODY))
+    await llm_client_registry.aclose()
+    llm_client_registry._http_client = httpx.AsyncClient(transport=transport)
+
+    backend = get_llm_backend(backend_name)
+    call_kwargs = {"temperature": 0.7, "max_tokens": 500}
+    system_prompt = "Eres un asistente que escribe publicaciones de LinkedIn. " * 40
+    for _ in range(warmup):
+        await backend.complete(MODEL_NAME, system_prompt, "Tema de prueba", call_kwargs)
+
+    samples_us = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await backend.complete(MODEL_NAME, system_prompt, "Tema de prueba", call_kwargs)
+        samples_us.append((time.perf_counter() - started) * 1_000_000)
+    await llm_client_registry.aclose()
+    samples_us.sort()
+    return {
+        "calls": calls,
+        "mean_us": round(statistics.mean(samples_us), 1),
+        "p50_us": percentile(samples_us, 50, ndigits=1),
+        "p95_us": percentile(samples_us, 95, ndigits=1),
+        "p99_us": percentile(samples_us, 99, ndigits=1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="Llamadas medidas por backend")
+    parser.add_argument("--warmup", type=int, default=50, help="Llamadas de calentamiento (no medidas)")
+    parser.add_argument("--import-repeats", type=int, default=5, help="Procesos lanzados para medir la importación")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"python": sys.version.split()[0], "backends": {}}
+    for backend in BACKENDS:
+        results["backends"][backend] = {
+            "per_call": asyncio.run(measure_call_overhead(backend, args.calls, args.warmup)),
+            "import": measure_import_ms(backend, args.import_repeats),
+        }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
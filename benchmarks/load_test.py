@@ -0,0 +1,350 @@
+"""
+Prueba de carga extremo a extremo de la API de generación con el LLM simulado.
+
+Arranca `api.main:app` en un único worker de uvicorn con el backend LLM "synthetic" (sin llamadas
+al proveedor) y lanza una mezcla de peticiones de LinkedIn, blog de interés general (con
+investigación de URLs, servidas por un servidor HTTP local) y casos de éxito (con subida de PDF)
+a concurrencia creciente. Por escalón informa del throughput, la latencia p50/p95/p99 (global y
+por tipo), los errores y el retardo del event loop del servidor, y guarda todo en JSON para
+comparar entre versiones.
+
+Necesita la base de datos local (postgres-docker o DATABASE_URL): las generaciones se guardan en
+el historial igual que en producción. El usuario de la prueba se registra si no existe.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.load_test --concurrency 1 4 16 64 --duration 30 --output carga.json
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000   # contra un servidor ya arrancado
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from common.utils.stats import percentile
+
+API_PREFIX = "/api/v1"
+REQUEST_TYPES = ["linkedin", "general_interest", "success_case"]
+DEFAULT_MIX = "linkedin=5,general_interest=3,success_case=2"
+
+# Entorno del servidor arrancado por la prueba; las variables ya definidas en el entorno tienen prioridad
+# (p. ej. LLM_SYNTHETIC_FIRST_TOKEN_P50_MS o LLM_SYNTHETIC_500_RATE para otros perfiles del proveedor).
+SERVER_ENV_DEFAULTS = {
+    "LLM_BACKEND": "synthetic",
+    "LLM_RATE_LIMIT_BACKEND": "local",
+    "EVENT_LOOP_MONITOR_ENABLED": "True",
+    "OPENAI_API_KEY": "sk-benchmark",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "720",
+    "LOG_LEVEL": "WARNING",
+    "DEBUG": "False",
+}
+
+_ARTICLE_HTML = (
+    "<html><head><title>Informe de sector</title><style>p {margin: 0}</style></head><body>"
+    "<nav><a href='/'>Inicio</a></nav><article><h1>Tendencias de automatización en PYMEs</h1>"
+    + "".join(
+        f"<h2>Apartado {index}</h2><p>Las empresas medianas adoptan herramientas de IA generativa para "
+        f"marketing, atención al cliente y análisis de datos; el apartado {index} resume cifras de adopción, "
+        "costes de implantación y retorno observado en los primeros doce meses.</p>"
+        for index in range(1, 31)
+    )
+    + "</article><footer>Pie de página</footer></body></html>"
+).encode("utf-8")
+
+_SYSTEM_PROMPT_LINKEDIN = (
+    "Eres un especialista en contenido para LinkedIn. Escribe publicaciones claras, con un gancho "
+    "inicial, tres ideas principales y una llamada a la acción. Tono profesional y cercano."
+)
+_SYSTEM_PROMPT_BLOG = (
+    "Eres un redactor de blog corporativo. Estructura: introducción, desarrollo en secciones con "
+    "subtítulos y conclusión. Tono informativo, orientado a directivos de PYMEs."
+)
+
+
+def _latency_summary(latencies_ms: List[float]) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(statistics.mean(latencies_ms), 1) if latencies_ms else None,
+        "p50_ms": _round(percentile(ordered, 50)),
+        "p95_ms": _round(percentile(ordered, 95)),
+        "p99_ms": _round(percentile(ordered, 99)),
+        "max_ms": _round(max(latencies_ms)) if latencies_ms else None,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def build_sample_pdf(pages: int = 3) -> bytes:
+    """PDF mínimo con texto extraíble (una línea por página), sin dependencias externas."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    page_ids = [4 + index * 2 for index in range(pages)]
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {pages} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for index in range(pages):
+        text = (
+            f"Caso de exito pagina {index + 1}: la empresa Y redujo un 30 por ciento el tiempo de respuesta "
+            "a clientes tras implantar la solucion X en tres meses."
+        )
+        stream = f"BT /F1 10 Tf 40 760 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {page_ids[index] + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    return bytes(output)
+
+
+class _ArticleHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(_ARTICLE_HTML)))
+        self.end_headers()
+        self.wfile.write(_ARTICLE_HTML)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_research_server() -> Tuple[ThreadingHTTPServer, str]:
+    """Servidor HTTP local que sirve la página usada como URL de investigación."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ArticleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/informe"
+
+
+def start_api_server(port: int, log_path: str) -> subprocess.Popen:
+    env = {**SERVER_ENV_DEFAULTS, **os.environ}
+    log_file = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning"],
+        env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, timeout_s: float = 60) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"El servidor no respondió en /health tras {timeout_s} s.")
+
+
+async def authenticate(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post(f"{API_PREFIX}/auth/register", json={"email": email, "password": password})
+    if response.status_code not in (201, 400): # 400: el usuario ya existe
+        response.raise_for_status()
+    response = await client.post(f"{API_PREFIX}/auth/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in REQUEST_TYPES:
+            raise ValueError(f"Tipo de petición desconocido en --mix: '{name}'. Disponibles: {REQUEST_TYPES}")
+        weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+class LoadRunner:
+    """Lanza peticiones de la mezcla configurada y guarda latencias y errores por tipo."""
+
+    def __init__(self, client: httpx.AsyncClient, research_url: str, pdf_bytes: bytes, mix: Dict[str, float], seed: int):
+        self.client = client
+        self.research_url = research_url
+        self.pdf_bytes = pdf_bytes
+        self.mix_names = list(mix)
+        self.mix_weights = [mix[name] for name in self.mix_names]
+        self.random = random.Random(seed)
+        self.sequence = 0
+
+    def _topic(self, base: str) -> str:
+        # Tema distinto en cada petición: la caché y la coalescencia de peticiones idénticas no deben ocultar el coste real
+        self.sequence += 1
+        return f"{base} (petición {self.sequence})"
+
+    async def send(self, request_type: str) -> httpx.Response:
+        if request_type == "linkedin":
+            return await self.client.post(f"{API_PREFIX}/linkedin/generate_post_refactored", json={
+                "human_prompt": self._topic("Novedades sobre IA en marketing digital y su impacto en PYMEs"),
+                "model": "Default",
+                "system_prompt": _SYSTEM_PROMPT_LINKEDIN,
+            })
+        if request_type == "general_interest":
+            return await self.client.post(f"{API_PREFIX}/blog/generate/general_interest", json={
+                "human_prompt": self._topic("Cómo están adoptando la automatización las PYMEs"),
+                "model": "Default",
+                "system_prompt": _SYSTEM_PROMPT_BLOG,
+                "urls_to_research": [self.research_url],
+            })
+        request_data = {
+            "human_prompt": self._topic("Caso de éxito: implantación de la solución X en la empresa Y"),
+            "model": "Default",
+            "system_prompt": _SYSTEM_PROMPT_BLOG,
+        }
+        return await self.client.post(
+            f"{API_PREFIX}/blog/generate/success_case",
+            data={"request_data": json.dumps(request_data)},
+            files={"pdf_file": ("caso_exito.pdf", self.pdf_bytes, "application/pdf")},
+        )
+
+    async def run_step(self, concurrency: int, duration_s: float) -> Dict[str, Any]:
+        latencies: Dict[str, List[float]] = {name: [] for name in self.mix_names}
+        errors: Dict[str, int] = {}
+        deadline = time.monotonic() + duration_s
+
+        async def worker() -> None:
+            while time.monotonic() < deadline:
+                request_type = self.random.choices(self.mix_names, weights=self.mix_weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await self.send(request_type)
+                    outcome = None if response.status_code == 200 else str(response.status_code)
+                except httpx.HTTPError as exc:
+                    outcome = type(exc).__name__
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if outcome is None:
+                    latencies[request_type].append(elapsed_ms)
+                else:
+                    key = f"{request_type}:{outcome}"
+                    errors[key] = errors.get(key, 0) + 1
+
+        await self.client.post(f"{API_PREFIX}/system/event-loop/reset")
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed_s = time.perf_counter() - started
+        event_loop = (await self.client.get(f"{API_PREFIX}/system/event-loop/stats")).json()
+
+        all_latencies = [value for values in latencies.values() for value in values]
+        return {
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed_s, 2),
+            "completed": len(all_latencies),
+            "errors": sum(errors.values()),
+            "errors_by_type": errors,
+            "throughput_rps": round(len(all_latencies) / elapsed_s, 3) if elapsed_s else None,
+            "latency": _latency_summary(all_latencies),
+            "latency_by_type": {name: _latency_summary(values) for name, values in latencies.items()},
+            "event_loop": event_loop,
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    research_server, research_url = start_research_server()
+    server_process = None
+    base_url = args.base_url
+    if not base_url:
+        server_process = start_api_server(args.port, args.server_log)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 10, max_keepalive_connections=max(args.concurrency) + 10)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+            await wait_until_healthy(client)
+            token = await authenticate(client, args.email, args.password)
+            client.headers["Authorization"] = f"Bearer {token}"
+
+            runner = LoadRunner(client, research_url, build_sample_pdf(), mix, args.seed)
+            for request_type in mix: # Calentamiento: primera petición de cada tipo (importaciones, conexiones, plantillas)
+                (await runner.send(request_type)).raise_for_status()
+
+            steps = []
+            for concurrency in args.concurrency:
+                step = await runner.run_step(concurrency, args.duration)
+                steps.append(step)
+                print(
+                    f"concurrencia={concurrency:>4}  rps={step['throughput_rps']}  p50={step['latency']['p50_ms']} ms  "
+                    f"p95={step['latency']['p95_ms']} ms  p99={step['latency']['p99_ms']} ms  errores={step['errors']}  "
+                    f"lag_p99={step['event_loop'].get('lag_p99_ms')} ms",
+                    file=sys.stderr
+                )
+    finally:
+        research_server.shutdown()
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait(timeout=30)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "base_url": base_url if args.base_url else None,
+        "server_env": None if args.base_url else {
+            name: os.environ.get(name, default) for name, default in SERVER_ENV_DEFAULTS.items() if name != "OPENAI_API_KEY"
+        },
+        "duration_per_step_s": args.duration,
+        "mix": mix,
+        "steps": steps,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32, 64], help="Escalones de concurrencia")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga por escalón")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos de cada tipo de petición (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--base-url", help="Usar un servidor ya arrancado en lugar de lanzar uno")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto del servidor lanzado por la prueba")
+    parser.add_argument("--server-log", default=os.path.join(tempfile.gettempdir(), "load_test_server.log"))
+    parser.add_argument("--request-timeout", type=float, default=300, help="Timeout por petición (s)")
+    parser.add_argument("--email", default="loadtest@example.com", help="Usuario de la prueba (se registra si no existe)")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--seed", type=int, default=1234, help="Semilla del sorteo de tipos de petición")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
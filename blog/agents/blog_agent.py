@@ -1,15 +1,31 @@
 # (Refactorizado para la nueva lógica y modelos)
 
-from typing import Optional, Dict, List, Any # Any añadido para el retorno de generate_content
-from common.base_agent import BaseAgent
+import asyncio
+import hashlib
+import json
+import math
+import time
+from dataclasses import replace
+from functools import partial
+from typing import Optional, Dict, List, Any, AsyncIterator, Tuple, Union # Any añadido para el retorno de generate_content
+from common.base_agent import BaseAgent, LLMCallOptions
+from common.services.context_budget import ContextSegment, context_budget_manager
+from common.services.pipeline import Pipeline
+from common.services.llm_rate_limiter import get_rate_limit, llm_rate_limiter
+from common.services.pdf_extractor import pdf_extractor
+from common.services.pdf_cache import pdf_result_cache
+from common.services.pdf_blob_store import pdf_blob_store
+from common.utils.pdf_normalization import NORMALIZATION_VERSION
+from common.services.url_fetcher import url_fetcher
 from blog.models.blog_models import (
+    BlogArticleBaseRequest,
     GeneralInterestBlogRequest,
     SuccessCaseBlogRequest,
     BlogArticleResponse,
     SuccessCaseBlogResponse
 )
 from blog.prompts import blog_prompts 
-from common.utils.helpers import extract_text_from_pdf, extract_content_from_url, chunk_text, format_content_for_readability
+from common.utils.helpers import chunk_text, format_content_for_readability, compose_static_prefix, select_relevant_chunks
 from core.logger import get_logger
 from core.config import settings
 
@@ -62,177 +78,763 @@ class BlogAgent(BaseAgent):
             "Llame a generate_general_interest_article o generate_success_case_article directamente."
         )
 
-    def _apply_author_prefix_to_system_prompt(self, system_prompt: str) -> str:
-        if self.model_identifier_key == "Pablo":
-            return PABLO_BLOG_SYSTEM_PROMPT_PREFIX + system_prompt
-        elif self.model_identifier_key == "Aitor":
-            return AITOR_BLOG_SYSTEM_PROMPT_PREFIX + system_prompt
-        return system_prompt
+    def _apply_author_prefix_to_system_prompt(self, system_prompt: str, model_key: Optional[str] = None) -> str:
+        # Prefijo de autor y plantilla se unen en forma canónica: prefijo estable para la caché de prompts del proveedor.
+        key_to_check = model_key if model_key else self.model_identifier_key
+        if key_to_check == "Pablo":
+            return compose_static_prefix(PABLO_BLOG_SYSTEM_PROMPT_PREFIX, system_prompt)
+        elif key_to_check == "Aitor":
+            return compose_static_prefix(AITOR_BLOG_SYSTEM_PROMPT_PREFIX, system_prompt)
+        return compose_static_prefix(system_prompt)
 
-    async def _research_urls(self, topic: str, urls: List[str], web_research_options: Dict[str, Any]) -> Optional[str]:
-        if not urls:
-            return None
+    def _article_call_options(self, request: BlogArticleBaseRequest) -> LLMCallOptions:
+        """Opciones de la llamada principal del artículo, resueltas a partir de la solicitud."""
+        actual_model_name = settings.MODEL_MAPPING.get(request.model)
+        if not actual_model_name:
+            error_msg = f"Modelo/Autor '{request.model}' no encontrado en MODEL_MAPPING."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        return self._build_call_options(
+            model_name=actual_model_name,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens_article,
+            cache_mode=request.cache,
+            step="article"
+        )
 
-        url_contents = []
-        for url_str in urls:
-            logger.info(f"Extrayendo contenido de URL para investigación: {url_str}")
-            content = extract_content_from_url(str(url_str)) 
-            if content:
-                chunks = chunk_text(content, chunk_size=3000, chunk_overlap=300) 
-                url_contents.extend(chunks) 
-            else:
-                logger.warning(f"No se pudo extraer contenido de {url_str}")
-        
-        if not url_contents:
+    async def _fetch_research_chunks(self, url: str, deadline: Optional[float] = None) -> List[str]:
+        """Descarga (asíncrona, con el plazo global de la petición) y trocea una URL de investigación."""
+        logger.info(f"Extrayendo contenido de URL para investigación: {url}")
+        content = await url_fetcher.fetch_text(url, deadline)
+        if not content:
+            logger.warning(f"No se pudo extraer contenido de {url}")
+            return []
+        return await asyncio.to_thread(chunk_text, content, 3000, 300)
+
+    async def _research_urls(
+        self,
+        topic: str,
+        chunks_per_url: List[List[str]],
+        dropped_tokens: Optional[Dict[str, int]] = None,
+        mode: Optional[str] = None
+    ) -> Optional[str]:
+        chunks_per_url = [chunks for chunks in chunks_per_url if chunks]
+        if not chunks_per_url:
             logger.info("No se extrajo contenido de ninguna URL para investigación.")
             return None
 
-        combined_url_text = "\n\n---\n\n".join(url_contents[:5]) 
-        
-        web_search_llm = BlogAgent(model_identifier="Default", temperature=0.3) 
+        # Si la investigación falla, el artículo se genera sin ella: nunca se pasa un mensaje de error al LLM.
+        try:
+            if (mode or settings.RESEARCH_MODE) == "map_reduce":
+                summary = await self._research_map_reduce(topic, chunks_per_url, dropped_tokens)
+                if summary is not None:
+                    return summary
+                logger.warning("La investigación map-reduce no obtuvo resúmenes parciales; se usa una única llamada.")
+            return await self._research_single_call(topic, chunks_per_url, dropped_tokens)
+        except Exception as e:
+            logger.error(f"Error durante la investigación web con LLM; se continúa sin investigación: {e}", exc_info=True)
+            return None
+
+    def _research_options(self) -> LLMCallOptions:
+        # Ya no se crea un BlogAgent anidado: basta con opciones propias para esta llamada.
+        return self._build_call_options(
+            model_name=settings.MODEL_WEB_SEARCH,
+            temperature=0.3,
+            max_tokens=settings.DEFAULT_MAX_TOKENS,
+            cache_mode="prefer", # Paso interno determinista: caché activada por defecto
+            step="web_research"
+        )
+
+    async def _research_single_call(
+        self,
+        topic: str,
+        chunks_per_url: List[List[str]],
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> str:
+        """
+        Resume en una sola llamada los trozos de todas las URLs que quepan en el presupuesto de investigación.
+        Los errores del LLM se propagan.
+        """
+        research_options = self._research_options()
+        research_instructions = (
+            "Por favor, proporciona un resumen conciso y factual de la información más relevante de este contenido "
+            "en relación con el tema principal, para ser usado en un artículo de blog."
+        )
+        # Los trozos se priorizan por turnos entre URLs (primer trozo de cada URL, luego el segundo...)
+        # para que todas las fuentes estén representadas antes de agotar el presupuesto de tokens.
+        chunk_segments = [
+            ContextSegment(name=f"url_{url_index}_chunk_{chunk_index}", text=chunk, priority=chunk_index, group="research_urls")
+            for url_index, chunks in enumerate(chunks_per_url)
+            for chunk_index, chunk in enumerate(chunks)
+        ]
+        packed = self._pack_context(
+            research_options,
+            [
+                ContextSegment(name="system", text=blog_prompts.WEB_RESEARCH_SYSTEM_PROMPT, required=True),
+                ContextSegment(name="instructions", text=f"{research_instructions}\n\nTema principal: {topic}", required=True),
+                *chunk_segments,
+            ],
+            dropped_tokens=dropped_tokens,
+            group_limits={"research_urls": settings.CONTEXT_MAX_RESEARCH_TOKENS}
+        )
+        combined_url_text = "\n\n---\n\n".join(
+            packed.texts[segment.name] for segment in chunk_segments if packed.texts[segment.name]
+        )
         
+        # Instrucciones fijas primero y contenido variable al final: prefijo común entre peticiones.
         research_human_prompt = (
+            f"{research_instructions}\n\n"
             f"Tema principal: {topic}\n\n"
-            f"Contenido extraído de URLs de referencia:\n{combined_url_text}\n\n"
-            "Por favor, proporciona un resumen conciso y factual de la información más relevante de este contenido "
-            "en relación con el tema principal, para ser usado en un artículo de blog."
+            f"Contenido extraído de URLs de referencia:\n{combined_url_text}"
         )
         
-        logger.info(f"Llamando a LLM de búsqueda web para resumir contenido de URLs. Modelo: {web_search_llm.model_name}")
-        try:
-            summary = await web_search_llm._call_llm_with_prompts(
-                system_prompt=blog_prompts.WEB_RESEARCH_SYSTEM_PROMPT,
-                human_prompt=research_human_prompt
+        logger.info(f"Llamando a LLM de búsqueda web para resumir contenido de URLs. Modelo: {research_options.model_name}")
+        summary = await self._call_llm_with_prompts(
+            system_prompt=blog_prompts.WEB_RESEARCH_SYSTEM_PROMPT,
+            human_prompt=research_human_prompt,
+            options=research_options
+        )
+        logger.info("Resumen de investigación web obtenido.")
+        return summary
+
+    async def _research_map_reduce(
+        self,
+        topic: str,
+        chunks_per_url: List[List[str]],
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> Optional[str]:
+        """
+        Fase "map": resume en paralelo (con tope de concurrencia) los trozos más relevantes de todas las URLs
+        con el modelo barato. Fase "reduce": combina los resúmenes parciales en un único resumen de investigación.
+        Devuelve None si no se obtuvo ningún resumen parcial; los errores de la fase reduce se propagan.
+        """
+        selected_chunks = select_relevant_chunks(topic, chunks_per_url, settings.RESEARCH_MAP_MAX_CHUNKS)
+        total_chunks = sum(len(chunks) for chunks in chunks_per_url)
+        if dropped_tokens is not None and total_chunks > len(selected_chunks):
+            # Los trozos menos relevantes que exceden RESEARCH_MAP_MAX_CHUNKS no se resumen: se informan como descartados.
+            selected_keys = {(url_index, chunk_index) for url_index, chunk_index, _ in selected_chunks}
+            dropped_tokens["research_map"] = sum(
+                context_budget_manager.count_tokens(chunk, settings.MODEL_RESEARCH_MAP)
+                for url_index, chunks in enumerate(chunks_per_url)
+                for chunk_index, chunk in enumerate(chunks)
+                if (url_index, chunk_index) not in selected_keys
             )
-            logger.info("Resumen de investigación web obtenido.")
-            return summary
-        except Exception as e:
-            logger.error(f"Error durante la investigación web con LLM: {e}", exc_info=True)
-            return "Error al procesar la información de las URLs."
+        logger.info(
+            f"Investigación map-reduce: {len(selected_chunks)} de {total_chunks} trozos de {len(chunks_per_url)} URL(s). "
+            f"Modelo map: {settings.MODEL_RESEARCH_MAP}"
+        )
 
+        map_options = self._build_call_options(
+            model_name=settings.MODEL_RESEARCH_MAP,
+            temperature=0.0,
+            max_tokens=settings.RESEARCH_MAP_MAX_TOKENS,
+            cache_mode="prefer",
+            step="research_map"
+        )
+        semaphore = asyncio.Semaphore(settings.RESEARCH_MAP_CONCURRENCY)
 
-    async def generate_general_interest_article(self, request: GeneralInterestBlogRequest) -> BlogArticleResponse:
-        logger.info(f"Iniciando generación de artículo de interés general. Tema: '{request.human_prompt[:50]}...'")
+        async def summarize_chunk(chunk: str) -> Optional[str]:
+            async with semaphore:
+                try:
+                    # Tema primero y fragmento al final: el prefijo (system + tema) se comparte entre los trozos.
+                    partial_summary = await self._call_llm_with_prompts(
+                        system_prompt=blog_prompts.RESEARCH_MAP_SYSTEM_PROMPT,
+                        human_prompt=f"Tema principal: {topic}\n\nFragmento:\n{chunk}",
+                        options=map_options
+                    )
+                except Exception as e:
+                    logger.warning(f"Fallo al resumir un trozo de investigación: {e}")
+                    return None
+            partial_summary = (partial_summary or "").strip()
+            if not partial_summary or blog_prompts.RESEARCH_MAP_NO_INFO in partial_summary.upper():
+                return None
+            return partial_summary
+
+        partial_summaries = await asyncio.gather(*(summarize_chunk(chunk) for _, _, chunk in selected_chunks))
+        partial_segments = [
+            ContextSegment(
+                name=f"url_{url_index}_partial_{chunk_index}",
+                text=f"[Fuente {url_index + 1}] {partial_summary}",
+                priority=chunk_index,
+                group="research_partials"
+            )
+            for (url_index, chunk_index, _), partial_summary in zip(selected_chunks, partial_summaries)
+            if partial_summary
+        ]
+        if not partial_segments:
+            return None
+
+        research_options = self._research_options()
+        reduce_instructions = (
+            "Combina las siguientes notas, extraídas de varias fuentes de referencia, en un resumen conciso y factual "
+            "de la información más relevante en relación con el tema principal, para ser usado en un artículo de blog. "
+            "Elimina duplicados y conserva los datos concretos."
+        )
+        packed = self._pack_context(
+            research_options,
+            [
+                ContextSegment(name="system", text=blog_prompts.WEB_RESEARCH_SYSTEM_PROMPT, required=True),
+                ContextSegment(name="instructions", text=f"{reduce_instructions}\n\nTema principal: {topic}", required=True),
+                *partial_segments,
+            ],
+            dropped_tokens=dropped_tokens,
+            group_limits={"research_partials": settings.CONTEXT_MAX_RESEARCH_TOKENS}
+        )
+        combined_notes = "\n\n".join(
+            packed.texts[segment.name] for segment in partial_segments if packed.texts[segment.name]
+        )
+
+        logger.info(f"Combinando {len(partial_segments)} resúmenes parciales. Modelo: {research_options.model_name}")
+        summary = await self._call_llm_with_prompts(
+            system_prompt=blog_prompts.WEB_RESEARCH_SYSTEM_PROMPT,
+            human_prompt=f"{reduce_instructions}\n\nTema principal: {topic}\n\nNotas de las fuentes:\n{combined_notes}",
+            options=research_options
+        )
+        logger.info("Resumen de investigación web obtenido (map-reduce).")
+        return summary
 
-        final_system_prompt = self._apply_author_prefix_to_system_prompt(request.system_prompt)
+    def _build_general_interest_prompt(
+        self,
+        request: GeneralInterestBlogRequest,
+        researched_summary: Optional[str],
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> Tuple[str, str, LLMCallOptions]:
+        """
+        Resuelve system prompt, human prompt (con la investigación web si la hay, ajustada a la
+        ventana de contexto) y opciones de la llamada principal.
+        """
+        final_system_prompt = self._apply_author_prefix_to_system_prompt(request.system_prompt, request.model)
+        article_options = self._article_call_options(request)
         current_human_prompt = request.human_prompt
-        researched_summary = None
 
-        if request.urls_to_research:
+        packed = self._pack_context(
+            article_options,
+            [
+                ContextSegment(name="system", text=final_system_prompt, required=True),
+                ContextSegment(name="human_prompt", text=request.human_prompt, required=True),
+                ContextSegment(name="research_summary", text=researched_summary or "", priority=1),
+            ],
+            dropped_tokens=dropped_tokens
+        )
+        if packed.texts["research_summary"]:
+            current_human_prompt = (
+                f"{request.human_prompt}\n\n"
+                f"--- Resumen de Investigación Adicional ---\n"
+                f"{packed.texts['research_summary']}\n"
+                f"--- Fin del Resumen de Investigación ---"
+            )
+            logger.info("Resumen de investigación añadido al human_prompt.")
+
+        return final_system_prompt, current_human_prompt, article_options
+
+    def _general_interest_pipeline(
+        self, request: GeneralInterestBlogRequest, dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> Pipeline:
+        """
+        Pasos previos al artículo: descarga de cada URL (en paralelo), resumen de la investigación
+        y preparación del prompt ("article_prompt": system prompt, human prompt y opciones).
+        """
+        pipeline = Pipeline("general_interest")
+        fetch_steps = []
+        # Todas las URLs se descargan a la vez y comparten un plazo global
+        fetch_deadline = time.monotonic() + settings.URL_FETCH_TOTAL_DEADLINE_SECONDS
+        for url_index, url in enumerate(request.urls_to_research or []):
+            fetch_steps.append(f"fetch_url_{url_index}")
+            pipeline.add(fetch_steps[-1], partial(self._fetch_research_chunks, str(url), fetch_deadline))
+
+        if fetch_steps:
             logger.info(f"Investigando URLs para el tema: {request.human_prompt[:50]}...")
-            researched_summary = await self._research_urls(
-                request.human_prompt, 
-                request.urls_to_research,
-                request.web_research_options.model_dump() if request.web_research_options else {}
+            pipeline.add(
+                "research",
+                lambda **chunks: self._research_urls(
+                    request.human_prompt,
+                    [chunks[name] for name in fetch_steps],
+                    dropped_tokens,
+                    request.web_research_options.mode if request.web_research_options else None
+                ),
+                depends_on=fetch_steps
             )
-            if researched_summary:
-                current_human_prompt = (
-                    f"{request.human_prompt}\n\n"
-                    f"--- Resumen de Investigación Adicional ---\n"
-                    f"{researched_summary}\n"
-                    f"--- Fin del Resumen de Investigación ---"
-                )
-                logger.info("Resumen de investigación añadido al human_prompt.")
-
-        if self.model_identifier_key != request.model or self.temperature != request.temperature or (request.max_tokens_article and self.max_tokens != request.max_tokens_article) :
-            new_model_name = settings.MODEL_MAPPING.get(request.model, self.model_name)
-            self.update_llm_config(
-                model_name=new_model_name, 
-                temperature=request.temperature,
-                max_tokens=request.max_tokens_article
+            pipeline.add(
+                "article_prompt",
+                lambda research: self._build_general_interest_prompt(request, research, dropped_tokens),
+                depends_on=["research"]
             )
-        
-        article_content = await self._call_llm_with_prompts(
-            system_prompt=final_system_prompt,
-            human_prompt=current_human_prompt
+        else:
+            pipeline.add("article_prompt", lambda: self._build_general_interest_prompt(request, None, dropped_tokens))
+        return pipeline
+
+    async def generate_general_interest_article(self, request: GeneralInterestBlogRequest) -> BlogArticleResponse:
+        logger.info(f"Iniciando generación de artículo de interés general. Tema: '{request.human_prompt[:50]}...'")
+
+        dropped_tokens: Dict[str, int] = {}
+        pipeline = self._general_interest_pipeline(request, dropped_tokens)
+        # La investigación web se hace una vez; las variantes del artículo salen de una única llamada (n choices).
+        pipeline.add(
+            "article",
+            lambda article_prompt: self._call_llm_variants(
+                system_prompt=article_prompt[0],
+                human_prompt=article_prompt[1],
+                options=article_prompt[2],
+                num_variants=request.num_variants
+            ),
+            depends_on=["article_prompt"]
         )
+        run = await pipeline.run()
+        article_options = run.results["article_prompt"][2]
+        formatted_variants = [format_content_for_readability(variant) for variant in run.results["article"]]
 
         return BlogArticleResponse(
-            generated_article=format_content_for_readability(article_content),
+            generated_article=formatted_variants[0],
+            model_used=request.model,
+            actual_model_name_used=article_options.model_name,
+            temperature_used=article_options.temperature,
+            researched_content_summary=run.results.get("research"),
+            article_variants=formatted_variants,
+            context_tokens_dropped=dropped_tokens,
+            step_timings_ms=run.timings_ms
+        )
+
+    async def stream_general_interest_article(
+        self, request: GeneralInterestBlogRequest
+    ) -> AsyncIterator[Union[str, BlogArticleResponse]]:
+        """
+        Genera el artículo en streaming. La investigación web (si la hay) se completa antes;
+        después se emiten los fragmentos del artículo (str) y, al final, un BlogArticleResponse
+        con el artículo completo formateado y sus metadatos.
+        """
+        logger.info(f"Iniciando streaming de artículo de interés general. Tema: '{request.human_prompt[:50]}...'")
+        if request.num_variants > 1:
+            raise ValueError("El streaming genera una sola versión del artículo: num_variants debe ser 1.")
+
+        dropped_tokens: Dict[str, int] = {}
+        run = await self._general_interest_pipeline(request, dropped_tokens).run()
+        final_system_prompt, current_human_prompt, article_options = run.results["article_prompt"]
+
+        parts: List[str] = []
+        started = time.perf_counter()
+        async for token in self._stream_llm_with_prompts(
+            system_prompt=final_system_prompt,
+            human_prompt=current_human_prompt,
+            options=article_options
+        ):
+            parts.append(token)
+            yield token
+
+        generated_article = format_content_for_readability("".join(parts))
+        yield BlogArticleResponse(
+            generated_article=generated_article,
             model_used=request.model,
-            actual_model_name_used=self.model_name,
-            temperature_used=self.temperature,
-            researched_content_summary=researched_summary
+            actual_model_name_used=article_options.model_name,
+            temperature_used=article_options.temperature,
+            researched_content_summary=run.results.get("research"),
+            article_variants=[generated_article],
+            context_tokens_dropped=dropped_tokens,
+            step_timings_ms={**run.timings_ms, "article": round((time.perf_counter() - started) * 1000, 2)}
         )
 
-    async def _transform_pdf_text_for_blog(self, pdf_text: str, target_style_prompt: str) -> str:
+    async def _transform_pdf_text_for_blog(
+        self,
+        pdf_text: str,
+        target_style_prompt: str,
+        options: Optional[LLMCallOptions] = None,
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> str:
         if not pdf_text:
+            logger.warning("No se pudo extraer texto del PDF o el PDF estaba vacío.")
             return ""
         
         logger.info(f"Transformando texto de PDF (longitud: {len(pdf_text)}) para estilo blog.")
+        options = self._pdf_transform_options(options or self.default_call_options)
+
+        # Documentos largos: en lugar de recortar al tope, se transforman por secciones y se combinan.
+        if settings.PDF_TRANSFORM_MODE == "map_reduce":
+            pdf_tokens = await asyncio.to_thread(context_budget_manager.count_tokens, pdf_text, options.model_name)
+            if pdf_tokens > settings.CONTEXT_MAX_PDF_TOKENS:
+                transformed_text = await self._transform_pdf_map_reduce(pdf_text, pdf_tokens, options, dropped_tokens)
+                if transformed_text is not None:
+                    return transformed_text
+                logger.warning("No se pudo transformar ninguna sección del PDF: se usa una sola llamada con el texto recortado.")
+
+        # El texto del PDF se ajusta en tokens (no en caracteres) al tope configurado y a la ventana del modelo.
+        packed = self._pack_context(
+            options,
+            [
+                ContextSegment(name="system", text=blog_prompts.PDF_TRANSFORMATION_SYSTEM_PROMPT, required=True),
+                ContextSegment(name="pdf_text", text=pdf_text, max_tokens=settings.CONTEXT_MAX_PDF_TOKENS),
+            ],
+            dropped_tokens=dropped_tokens
+        )
         
         transformed_text = await self._call_llm_with_prompts(
             system_prompt=blog_prompts.PDF_TRANSFORMATION_SYSTEM_PROMPT,
-            human_prompt=pdf_text[:15000] 
+            human_prompt=packed.texts["pdf_text"],
+            options=options
         )
         logger.info("Texto de PDF transformado para blog.")
         return transformed_text
 
-    async def _summarize_article(self, article_text: str, max_tokens_summary: Optional[int]) -> str:
+    async def _transform_pdf_map_reduce(
+        self,
+        pdf_text: str,
+        pdf_tokens: int,
+        options: LLMCallOptions,
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> Optional[str]:
+        """
+        Fase "map": divide el texto en secciones por tokens y las transforma en paralelo (con tope de concurrencia).
+        Fase "reduce": combina los borradores de las secciones en un único borrador del documento completo.
+        Las secciones que no se pudieron transformar se anotan en dropped_tokens["pdf_sections_failed"].
+        Devuelve None si no se pudo transformar ninguna sección.
+        """
+        # Si el documento daría más secciones que el máximo, las secciones crecen: siempre se cubre entero.
+        # (Con un 10% de margen, porque los cortes entre párrafos dejan las secciones algo por debajo del tamaño.)
+        section_tokens = max(
+            settings.PDF_TRANSFORM_SECTION_TOKENS,
+            math.ceil(pdf_tokens * 1.1 / max(settings.PDF_TRANSFORM_MAX_SECTIONS, 1))
+        )
+        sections = await asyncio.to_thread(
+            context_budget_manager.split_to_tokens, pdf_text, section_tokens, options.model_name
+        )
+        logger.info(
+            f"Transformación map-reduce del PDF: {len(sections)} secciones de hasta {section_tokens} tokens "
+            f"({pdf_tokens} tokens en total). Modelo: {options.model_name}"
+        )
+
+        # Los borradores de todas las secciones deben caber juntos en la fase reduce (tope CONTEXT_MAX_PDF_TOKENS)
+        draft_max_tokens = max(1, min(settings.PDF_TRANSFORM_SECTION_MAX_TOKENS, settings.CONTEXT_MAX_PDF_TOKENS // len(sections)))
+        map_options = replace(options, max_tokens=draft_max_tokens, step="pdf_transform_map")
+        section_cost = section_tokens + draft_max_tokens + await asyncio.to_thread(
+            context_budget_manager.count_tokens, blog_prompts.PDF_TRANSFORMATION_SECTION_SYSTEM_PROMPT, options.model_name
+        )
+        semaphore = asyncio.Semaphore(self._pdf_map_concurrency(options.model_name, section_cost))
+
+        async def transform_section(section_index: int, section: str) -> Optional[str]:
+            packed = self._pack_context(
+                map_options,
+                [
+                    ContextSegment(name="system", text=blog_prompts.PDF_TRANSFORMATION_SECTION_SYSTEM_PROMPT, required=True),
+                    ContextSegment(name="pdf_section", text=section, max_tokens=section_tokens),
+                ],
+                dropped_tokens=dropped_tokens
+            )
+            async with semaphore:
+                try:
+                    draft = await self._call_llm_with_prompts(
+                        system_prompt=blog_prompts.PDF_TRANSFORMATION_SECTION_SYSTEM_PROMPT,
+                        human_prompt=f"Sección {section_index + 1} de {len(sections)} del documento:\n\n{packed.texts['pdf_section']}",
+                        options=map_options
+                    )
+                except Exception as e:
+                    logger.warning(f"Fallo al transformar la sección {section_index + 1} del PDF: {e}")
+                    return None
+            return (draft or "").strip() or None
+
+        drafts = await asyncio.gather(*(transform_section(index, section) for index, section in enumerate(sections)))
+        failed_sections = [section for section, draft in zip(sections, drafts) if not draft]
+        if failed_sections and dropped_tokens is not None:
+            # Parte del documento no llega al artículo: se informa en la respuesta (context_tokens_dropped)
+            dropped_tokens["pdf_sections_failed"] = dropped_tokens.get("pdf_sections_failed", 0) + sum(
+                context_budget_manager.count_tokens(section, options.model_name) for section in failed_sections
+            )
+        draft_segments = [
+            ContextSegment(
+                name=f"pdf_section_{index}",
+                text=f"[Sección {index + 1}]\n{draft}",
+                priority=index,
+                group="pdf_sections"
+            )
+            for index, draft in enumerate(drafts)
+            if draft
+        ]
+        if not draft_segments:
+            return None
+        if failed_sections:
+            logger.warning(f"Solo se transformaron {len(draft_segments)} de {len(sections)} secciones del PDF.")
+
+        reduce_instructions = (
+            "Las siguientes notas son borradores de las secciones consecutivas de un mismo documento técnico. "
+            "Combínalas en un único borrador narrativo del caso de éxito que cubra el documento completo, "
+            "eliminando repeticiones y conservando las cifras y los datos concretos."
+        )
+        packed = self._pack_context(
+            options,
+            [
+                ContextSegment(name="system", text=blog_prompts.PDF_TRANSFORMATION_SYSTEM_PROMPT, required=True),
+                ContextSegment(name="instructions", text=reduce_instructions, required=True),
+                *draft_segments,
+            ],
+            dropped_tokens=dropped_tokens,
+            group_limits={"pdf_sections": settings.CONTEXT_MAX_PDF_TOKENS}
+        )
+        combined_drafts = "\n\n".join(
+            packed.texts[segment.name] for segment in draft_segments if packed.texts[segment.name]
+        )
+
+        logger.info(f"Combinando {len(draft_segments)} borradores de sección del PDF.")
+        transformed_text = await self._call_llm_with_prompts(
+            system_prompt=blog_prompts.PDF_TRANSFORMATION_SYSTEM_PROMPT,
+            human_prompt=f"{reduce_instructions}\n\n{combined_drafts}",
+            options=options
+        )
+        logger.info("Texto de PDF transformado para blog (map-reduce).")
+        return transformed_text
+
+    @staticmethod
+    def _pdf_map_concurrency(model_name: str, section_cost: int) -> int:
+        """
+        Secciones que se transforman a la vez sin que la última de una tanda agote la espera máxima del
+        limitador (LLM_RATE_LIMIT_MAX_WAIT_SECONDS) con los límites RPM/TPM del modelo, como máximo
+        PDF_TRANSFORM_CONCURRENCY.
+        """
+        concurrency = max(settings.PDF_TRANSFORM_CONCURRENCY, 1)
+        if not llm_rate_limiter.enabled:
+            return concurrency
+        limits = get_rate_limit(model_name)
+        wait_minutes = settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS / 60
+        affordable = min(int(limits.tpm * wait_minutes // max(section_cost, 1)), int(limits.rpm * wait_minutes))
+        if affordable < concurrency:
+            logger.info(
+                f"Transformación del PDF limitada a {max(affordable, 1)} secciones a la vez por los límites de "
+                f"{model_name} ({limits.tpm} TPM, {section_cost} tokens por sección)."
+            )
+        return max(1, min(concurrency, affordable))
+
+    @staticmethod
+    def _pdf_text_version() -> str:
+        """Versión del texto extraído para la caché: cambia al activar o modificar la normalización."""
+        return f"n{NORMALIZATION_VERSION}" if pdf_extractor.normalize else "raw"
+
+    @staticmethod
+    def _pdf_transform_options(options: LLMCallOptions) -> LLMCallOptions:
+        """
+        Opciones de la transformación del PDF: el modelo de la petición con temperatura y longitud propias
+        de la transformación, para que el borrador (y su entrada en la caché) no dependa de las opciones del artículo.
+        """
+        return replace(
+            options,
+            temperature=settings.PDF_TRANSFORM_TEMPERATURE,
+            max_tokens=settings.PDF_TRANSFORM_MAX_TOKENS,
+            step="pdf_transform"
+        )
+
+    def _pdf_transformation_version(self, options: LLMCallOptions) -> str:
+        """Versión de la transformación de PDF para la caché: cambia con el texto, los prompts, el modelo o los parámetros de la transformación."""
+        fingerprint = json.dumps(
+            [
+                self._pdf_text_version(),
+                blog_prompts.PDF_TRANSFORMATION_SYSTEM_PROMPT,
+                options.model_name,
+                settings.PDF_TRANSFORM_TEMPERATURE,
+                settings.PDF_TRANSFORM_MAX_TOKENS,
+                settings.CONTEXT_MAX_PDF_TOKENS,
+                settings.PDF_TRANSFORM_MODE,
+                blog_prompts.PDF_TRANSFORMATION_SECTION_SYSTEM_PROMPT,
+                settings.PDF_TRANSFORM_SECTION_TOKENS,
+                settings.PDF_TRANSFORM_MAX_SECTIONS,
+                settings.PDF_TRANSFORM_SECTION_MAX_TOKENS,
+            ],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+    async def _extract_pdf_text_cached(
+        self,
+        pdf_hash: str,
+        cached_transformation: Optional[str],
+        options: LLMCallOptions,
+        pdf_text_metrics: Dict[str, int]
+    ) -> str:
+        if cached_transformation is not None:
+            return "" # La transformación ya está en caché: no hace falta el texto
+        text_version = self._pdf_text_version()
+        cached = await pdf_result_cache.get_text(pdf_hash, text_version)
+        if cached is not None:
+            logger.info(f"Texto del PDF {pdf_hash[:12]} servido desde la caché de PDFs.")
+            pdf_text_metrics.update({key: value for key, value in cached.items() if isinstance(value, int)})
+            return cached["text"]
+        # Extracción en el pool de procesos, por rangos de páginas y con control de admisión por memoria,
+        # leyendo el PDF directamente del almacén de PDFs subidos.
+        pdf_path, pdf_size = await asyncio.to_thread(pdf_blob_store.locate, pdf_hash)
+        extraction = await pdf_extractor.extract_text_from_path(pdf_path, pdf_size, options.model_name)
+        # Ahorro de la normalización por documento (también se guarda con el texto en la caché)
+        pdf_text_metrics.update({
+            "page_count": extraction.page_count,
+            "raw_chars": extraction.raw_chars,
+            "chars": len(extraction.text),
+            "chars_saved": extraction.chars_saved,
+            "tokens_saved": extraction.tokens_saved or 0,
+            "removed_lines": extraction.removed_lines,
+            "dehyphenated": extraction.dehyphenated,
+        })
+        if extraction.text:
+            await pdf_result_cache.put_text(pdf_hash, text_version, extraction.text, pdf_text_metrics)
+        return extraction.text
+
+    async def _transform_pdf_text_cached(
+        self,
+        pdf_hash: str,
+        pdf_text: str,
+        cached_transformation: Optional[str],
+        target_style_prompt: str,
+        options: LLMCallOptions,
+        dropped_tokens: Dict[str, int]
+    ) -> str:
+        if cached_transformation is not None:
+            logger.info(f"Transformación del PDF {pdf_hash[:12]} servida desde la caché de PDFs.")
+            return cached_transformation
+        transformed_text = await self._transform_pdf_text_for_blog(pdf_text, target_style_prompt, options, dropped_tokens)
+        # Una transformación a la que le faltan secciones no se guarda: la próxima petición lo reintenta
+        if transformed_text and not dropped_tokens.get("pdf_sections_failed"):
+            await pdf_result_cache.put_transformation(pdf_hash, self._pdf_transformation_version(options), transformed_text)
+        return transformed_text
+
+    async def _summarize_article(
+        self,
+        article_text: str,
+        max_tokens_summary: Optional[int],
+        options: Optional[LLMCallOptions] = None,
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> str:
         if not article_text:
             return ""
 
-        original_max_tokens = self.max_tokens
         summary_max_tokens = max_tokens_summary or 250 
-        self.update_llm_config(max_tokens=summary_max_tokens) 
+        # Mismo modelo y temperatura que el artículo, solo cambia max_tokens (sin mutar el agente).
+        # Paso interno determinista respecto al artículo: caché activada por defecto.
+        summary_options = replace(
+            options or self.default_call_options, max_tokens=summary_max_tokens, cache_mode="prefer", step="summary"
+        )
 
         logger.info(f"Resumiendo artículo (max_tokens para resumen: {summary_max_tokens}).")
         
-        summary_human_prompt = f"Por favor, resume el siguiente artículo de caso de éxito:\n\n{article_text}"
+        summary_instructions = "Por favor, resume el siguiente artículo de caso de éxito:\n\n"
+        packed = self._pack_context(
+            summary_options,
+            [
+                ContextSegment(name="system", text=blog_prompts.SUCCESS_CASE_SUMMARY_SYSTEM_PROMPT, required=True),
+                ContextSegment(name="instructions", text=summary_instructions, required=True),
+                ContextSegment(name="summary_article", text=article_text),
+            ],
+            dropped_tokens=dropped_tokens
+        )
+        summary_human_prompt = f"{summary_instructions}{packed.texts['summary_article']}"
         
         summary = await self._call_llm_with_prompts(
             system_prompt=blog_prompts.SUCCESS_CASE_SUMMARY_SYSTEM_PROMPT,
-            human_prompt=summary_human_prompt
+            human_prompt=summary_human_prompt,
+            options=summary_options
         )
         
-        self.update_llm_config(max_tokens=original_max_tokens)
-        
         logger.info("Resumen de artículo generado.")
         return summary
 
-    async def generate_success_case_article(
-        self, request: SuccessCaseBlogRequest, pdf_bytes: Optional[bytes]
-    ) -> SuccessCaseBlogResponse:
+    def _build_success_case_prompt(
+        self,
+        request: SuccessCaseBlogRequest,
+        final_system_prompt: str,
+        article_options: LLMCallOptions,
+        transformed_pdf_text: str,
+        dropped_tokens: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Human prompt del artículo: el contexto del caso más el texto del PDF reescrito, ajustado a la ventana."""
+        if not transformed_pdf_text:
+            return request.human_prompt
+        case_context = f"Contexto principal del caso de éxito: {request.human_prompt}\n\n"
+        packed = self._pack_context(
+            article_options,
+            [
+                ContextSegment(name="system", text=final_system_prompt, required=True),
+                ContextSegment(name="human_prompt", text=case_context, required=True),
+                ContextSegment(name="transformed_pdf", text=transformed_pdf_text, priority=1),
+            ],
+            dropped_tokens=dropped_tokens
+        )
+        logger.info("Texto de PDF transformado y añadido al human_prompt.")
+        return (
+            f"{case_context}"
+            f"--- Información Relevante del Documento Técnico (reescrita para un blog) ---\n"
+            f"{packed.texts['transformed_pdf']}\n"
+            f"--- Fin de la Información del Documento ---"
+        )
+
+    async def generate_success_case_article(self, request: SuccessCaseBlogRequest) -> SuccessCaseBlogResponse:
         logger.info(f"Iniciando generación de caso de éxito. Tema: '{request.human_prompt[:50]}...'")
 
-        final_system_prompt = self._apply_author_prefix_to_system_prompt(request.system_prompt)
-        current_human_prompt = request.human_prompt
+        final_system_prompt = self._apply_author_prefix_to_system_prompt(request.system_prompt, request.model)
+        article_options = self._article_call_options(request)
+        dropped_tokens: Dict[str, int] = {}
+        pdf_text_metrics: Dict[str, int] = {}
 
-        if pdf_bytes:
+        pipeline = Pipeline("success_case")
+        if request.pdf_hash:
             logger.info("Procesando archivo PDF para caso de éxito.")
-            pdf_text = extract_text_from_pdf(pdf_bytes)
-            if pdf_text:
-                transformed_pdf_text = await self._transform_pdf_text_for_blog(pdf_text, request.system_prompt)
-                current_human_prompt = (
-                    f"Contexto principal del caso de éxito: {request.human_prompt}\n\n"
-                    f"--- Información Relevante del Documento Técnico (reescrita para un blog) ---\n"
-                    f"{transformed_pdf_text}\n"
-                    f"--- Fin de la Información del Documento ---"
-                )
-                logger.info("Texto de PDF transformado y añadido al human_prompt.")
-            else:
-                logger.warning("No se pudo extraer texto del PDF o el PDF estaba vacío.")
-
-        if self.model_identifier_key != request.model or self.temperature != request.temperature or (request.max_tokens_article and self.max_tokens != request.max_tokens_article):
-            new_model_name = settings.MODEL_MAPPING.get(request.model, self.model_name)
-            self.update_llm_config(
-                model_name=new_model_name, 
-                temperature=request.temperature,
-                max_tokens=request.max_tokens_article
+            # El PDF ya está en el almacén y se identifica por su hash: si ya se procesó con la misma versión
+            # de la transformación, no se vuelve a extraer ni a transformar y se pasa directamente al artículo.
+            pipeline.add("pdf_hash", lambda: request.pdf_hash)
+            pipeline.add(
+                "pdf_cached_transform",
+                lambda pdf_hash: pdf_result_cache.get_transformation(
+                    pdf_hash, self._pdf_transformation_version(article_options)
+                ),
+                depends_on=["pdf_hash"]
             )
-
-        full_article_content = await self._call_llm_with_prompts(
-            system_prompt=final_system_prompt,
-            human_prompt=current_human_prompt
+            pipeline.add(
+                "pdf_text",
+                lambda pdf_hash, pdf_cached_transform: self._extract_pdf_text_cached(
+                    pdf_hash, pdf_cached_transform, article_options, pdf_text_metrics
+                ),
+                depends_on=["pdf_hash", "pdf_cached_transform"]
+            )
+            pipeline.add(
+                "pdf_transform",
+                lambda pdf_hash, pdf_text, pdf_cached_transform: self._transform_pdf_text_cached(
+                    pdf_hash, pdf_text, pdf_cached_transform, request.system_prompt, article_options, dropped_tokens
+                ),
+                depends_on=["pdf_hash", "pdf_text", "pdf_cached_transform"]
+            )
+        else:
+            pipeline.add("pdf_transform", lambda: "")
+        pipeline.add(
+            "article_prompt",
+            lambda pdf_transform: self._build_success_case_prompt(
+                request, final_system_prompt, article_options, pdf_transform, dropped_tokens
+            ),
+            depends_on=["pdf_transform"]
         )
-        logger.info("Artículo de caso de éxito completo generado.")
-
-        summary_article_content = await self._summarize_article(full_article_content, request.max_tokens_summary)
+        pipeline.add(
+            "article",
+            lambda article_prompt: self._call_llm_variants(
+                system_prompt=final_system_prompt,
+                human_prompt=article_prompt,
+                options=article_options,
+                num_variants=request.num_variants
+            ),
+            depends_on=["article_prompt"]
+        )
+        # Cada variante tiene su propio resumen; se piden en paralelo.
+        pipeline.add(
+            "summaries",
+            lambda article: asyncio.gather(*(
+                self._summarize_article(article_variant, request.max_tokens_summary, article_options, dropped_tokens)
+                for article_variant in article
+            )),
+            depends_on=["article"]
+        )
+        run = await pipeline.run()
+        full_article_variants = run.results["article"]
+        logger.info(f"Artículo de caso de éxito completo generado ({len(full_article_variants)} variante(s)).")
 
+        formatted_articles = [format_content_for_readability(article) for article in full_article_variants]
+        formatted_summaries = [format_content_for_readability(summary) for summary in run.results["summaries"]]
         return SuccessCaseBlogResponse(
-            full_article=format_content_for_readability(full_article_content),
-            summary_article=format_content_for_readability(summary_article_content),
+            full_article=formatted_articles[0],
+            summary_article=formatted_summaries[0],
             model_used=request.model,
-            actual_model_name_used=self.model_name, 
-            temperature_used=self.temperature,
-        )
\ No newline at end of file
+            actual_model_name_used=article_options.model_name, 
+            temperature_used=article_options.temperature,
+            full_article_variants=formatted_articles,
+            summary_article_variants=formatted_summaries,
+            context_tokens_dropped=dropped_tokens,
+            step_timings_ms=run.timings_ms,
+            pdf_text_metrics=pdf_text_metrics
+        )
@@ -1,6 +1,8 @@
 # MODIFICADO: Pasar pdf_filename al servicio de caso de éxito
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, status, Form
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional
+import asyncio
 import json 
 from pydantic import ValidationError 
 from sqlalchemy.orm import Session 
@@ -11,9 +13,12 @@ from blog.models.blog_models import (
     SuccessCaseBlogRequest,
     BlogArticleResponse,
     SuccessCaseBlogResponse,
-    BlogPromptCustomizationRequest 
+    BlogPromptCustomizationRequest,
+    PdfUploadResponse
 )
 from blog.services.blog_service import BlogService
+from common.services.pdf_extractor import PdfExtractionOverloadedError, PdfTooLargeError
+from common.services.pdf_blob_store import PdfBlobNotFoundError, pdf_blob_store
 from core.logger import get_logger
 from core.database import get_db 
 from api.dependencies import get_current_active_user 
@@ -23,8 +28,11 @@ logger = get_logger("blog_api_routes")
 
 router = APIRouter(prefix="/blog", tags=["Blog Refactored"])
 
+# Servicio compartido por todas las peticiones (su agente es seguro ante concurrencia).
+blog_service = BlogService()
+
 def get_blog_service() -> BlogService:
-    return BlogService()
+    return blog_service
 
 @router.get("/prompt_config", response_model=Dict[str, Any])
 async def get_base_prompt_configurations_endpoint(
@@ -77,10 +85,60 @@ async def generate_general_interest_article_endpoint(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router.post("/generate/general_interest/stream")
+async def stream_general_interest_article_endpoint(
+    request: GeneralInterestBlogRequest, 
+    service: BlogService = Depends(get_blog_service),
+    current_user: db_models.User = Depends(get_current_active_user) 
+):
+    """
+    Variante en streaming (Server-Sent Events) de /generate/general_interest.
+    Emite eventos 'token' con cada fragmento del artículo y un evento final 'done' con los
+    mismos metadatos que BlogArticleResponse (o 'error' si la generación falla).
+    """
+    logger.info(f"API Blog: Solicitud de streaming interés general de {current_user.email}. Tema: {request.human_prompt[:50]}...")
+    return StreamingResponse(
+        service.stream_general_interest_article(request=request, user_id=current_user.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/pdf/upload", response_model=PdfUploadResponse)
+async def upload_success_case_pdf_endpoint(
+    pdf_file: UploadFile = File(..., description="PDF del caso de éxito."),
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Guarda el PDF en el almacén por contenido (copiándolo por trozos) y devuelve su hash. Las peticiones
+    a /generate/success_case pueden referenciarlo con `pdf_hash` sin volver a enviar el fichero.
+    """
+    try:
+        stored = await pdf_blob_store.save_upload(pdf_file, owner=str(current_user.user_id))
+    except PdfTooLargeError as e:
+        logger.warning(f"API Blog: PDF rechazado por tamaño en la subida: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as ve:
+        logger.warning(f"API Blog: Subida de PDF no válida: {str(ve)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        logger.error(f"API Blog: Error interno al guardar el PDF: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    finally:
+        await pdf_file.close()
+    logger.info(f"API Blog: PDF '{stored.filename}' subido por {current_user.email} ({stored.pdf_hash[:12]}).")
+    return PdfUploadResponse(
+        pdf_hash=stored.pdf_hash,
+        size_bytes=stored.size_bytes,
+        filename=stored.filename,
+        already_stored=stored.already_stored
+    )
+
+
 @router.post("/generate/success_case", response_model=SuccessCaseBlogResponse)
 async def generate_success_case_article_endpoint(
     request_data_str: str = Form(..., alias="request_data", description="JSON string de SuccessCaseBlogRequest"),
-    pdf_file: Optional[UploadFile] = File(None, description="Archivo PDF opcional para el caso de éxito."),
+    pdf_file: Optional[UploadFile] = File(None, description="Archivo PDF opcional para el caso de éxito (o `pdf_hash` en request_data)."),
     service: BlogService = Depends(get_blog_service),
     db: Session = Depends(get_db), 
     current_user: db_models.User = Depends(get_current_active_user) 
@@ -96,23 +154,46 @@ async def generate_success_case_article_endpoint(
             logger.warning(f"API Blog: Error de validación Pydantic para caso de éxito: {ve.errors()}")
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=ve.errors())
 
-        pdf_filename = pdf_file.filename if pdf_file else None
-        logger.info(f"API Blog: Solicitud caso de éxito de {current_user.email}. Tema: {request.human_prompt[:50]}..., PDF: {pdf_filename}")
-        
-        pdf_bytes: Optional[bytes] = None
+        if pdf_file and request.pdf_hash:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Envía el PDF adjunto o su 'pdf_hash', no ambos.")
+
+        # El PDF adjunto también pasa por el almacén (copia por trozos): nunca se carga entero en memoria
+        # y la petición sigue como si se hubiera referenciado por hash.
+        pdf_filename: Optional[str] = None
         if pdf_file:
-            pdf_bytes = await pdf_file.read()
-            await pdf_file.close() 
+            try:
+                stored = await pdf_blob_store.save_upload(pdf_file, owner=str(current_user.user_id))
+            finally:
+                await pdf_file.close()
+            request = request.model_copy(update={"pdf_hash": stored.pdf_hash})
+            pdf_filename = pdf_file.filename
+        elif request.pdf_hash:
+            # Solo quien lo subió puede usarlo: para cualquier otro usuario es un 404
+            pdf_filename = (
+                await asyncio.to_thread(pdf_blob_store.describe, request.pdf_hash, str(current_user.user_id))
+            ).filename
+        logger.info(f"API Blog: Solicitud caso de éxito de {current_user.email}. Tema: {request.human_prompt[:50]}..., PDF: {pdf_filename}")
 
         return await service.generate_success_case_article(
             request=request, 
             db=db, 
             user_id=current_user.user_id, 
-            pdf_bytes=pdf_bytes,
             pdf_filename=pdf_filename # Pasar el nombre del archivo al servicio
         )
     except HTTPException: 
         raise
+    except PdfBlobNotFoundError as e:
+        logger.warning(f"API Blog: PDF referenciado no encontrado en caso de éxito: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except PdfTooLargeError as e:
+        logger.warning(f"API Blog: PDF rechazado por tamaño en caso de éxito: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except PdfExtractionOverloadedError as e:
+        logger.warning(f"API Blog: Extracción de PDF saturada en caso de éxito: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except ValueError as ve:
+        logger.warning(f"API Blog: Error de validación/configuración en caso de éxito: {str(ve)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
         logger.error(f"API Blog: Error interno al generar caso de éxito: {str(e)}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
\ No newline at end of file
@@ -1,6 +1,7 @@
 # (Refactorizado para la nueva estructura de inputs)
 
 from typing import Dict, Any, List, Optional, Literal
+import uuid
 from pydantic import BaseModel, Field, HttpUrl
 from core.config import settings
 # Ya no se importa ContentRequest, ContentResponse de base_models para los requests principales del blog
@@ -12,6 +13,10 @@ class WebResearchOptions(BaseModel):
         default="medium",
         description="Context size for web research (low, medium, high)."
     )
+    mode: Optional[Literal["single", "map_reduce"]] = Field(
+        default=None,
+        description="Research mode: 'map_reduce' (summarize relevant chunks of every URL in parallel, then combine) or 'single' (one call). Defaults to RESEARCH_MODE."
+    )
 
 # --- Modelos de Solicitud Refactorizados ---
 class BlogArticleBaseRequest(BaseModel):
@@ -34,6 +39,16 @@ class BlogArticleBaseRequest(BaseModel):
         default=settings.DEFAULT_MAX_TOKENS, # Usar un default general
         description="Máximo de tokens para el artículo principal."
     )
+    cache: Literal["bypass", "prefer", "only"] = Field(
+        default="bypass",
+        description="Uso de la caché exacta de respuestas para el artículo: 'bypass' (no usar), 'prefer' (usar si hay acierto) u 'only' (solo caché)."
+    )
+    num_variants: int = Field(
+        default=1,
+        ge=1,
+        le=settings.MAX_NUM_VARIANTS,
+        description="Número de versiones alternativas del artículo. Se generan en una sola llamada al modelo."
+    )
 
 class GeneralInterestBlogRequest(BlogArticleBaseRequest):
     """Solicitud para generar un artículo de blog de interés general."""
@@ -75,6 +90,11 @@ class SuccessCaseBlogRequest(BlogArticleBaseRequest):
         default=250, # Un default razonable para un resumen
         description="Máximo de tokens para el resumen del caso de éxito."
     )
+    pdf_hash: Optional[str] = Field(
+        default=None,
+        pattern=r"^[0-9a-f]{64}$",
+        description="Hash SHA-256 de un PDF ya subido con /blog/pdf/upload (en lugar de adjuntar el fichero)."
+    )
     class Config:
         json_schema_extra = {
             "example": {
@@ -87,6 +107,13 @@ class SuccessCaseBlogRequest(BlogArticleBaseRequest):
         }
 
 # --- Modelos de Respuesta Refactorizados ---
+class PdfUploadResponse(BaseModel):
+    """Respuesta a la subida de un PDF al almacén: el hash con el que referenciarlo en las peticiones."""
+    pdf_hash: str
+    size_bytes: int
+    filename: Optional[str] = None
+    already_stored: bool = False # El mismo contenido ya se había subido: no se ha escrito de nuevo
+
 class BlogArticleResponse(BaseModel):
     """Respuesta para un artículo de blog generado (interés general)."""
     generated_article: str
@@ -94,6 +121,11 @@ class BlogArticleResponse(BaseModel):
     actual_model_name_used: str # El ID real del LLM
     temperature_used: float
     researched_content_summary: Optional[str] = None # Resumen de la investigación web, si se hizo
+    article_variants: List[str] = Field(default_factory=list) # Todas las versiones (la primera es generated_article)
+    generation_group_id: Optional[uuid.UUID] = None # Grupo del historial que enlaza las variantes hermanas
+    context_tokens_dropped: Dict[str, int] = Field(default_factory=dict) # Tokens descartados por el presupuesto de contexto, por segmento
+    cached_token_ratio: Optional[float] = None # Fracción de tokens de prompt servidos desde la caché de prompts del proveedor
+    step_timings_ms: Dict[str, float] = Field(default_factory=dict) # Duración de cada paso del pipeline de generación (ms)
 
 class SuccessCaseBlogResponse(BaseModel):
     """Respuesta para un artículo de caso de éxito generado."""
@@ -102,6 +134,13 @@ class SuccessCaseBlogResponse(BaseModel):
     model_used: str
     actual_model_name_used: str
     temperature_used: float
+    full_article_variants: List[str] = Field(default_factory=list) # Todas las versiones (la primera es full_article)
+    summary_article_variants: List[str] = Field(default_factory=list) # Resumen de cada versión, en el mismo orden
+    generation_group_id: Optional[uuid.UUID] = None
+    context_tokens_dropped: Dict[str, int] = Field(default_factory=dict) # Tokens descartados por el presupuesto de contexto, por segmento ("pdf_sections_failed": secciones del PDF que no se pudieron transformar)
+    cached_token_ratio: Optional[float] = None # Fracción de tokens de prompt servidos desde la caché de prompts del proveedor
+    step_timings_ms: Dict[str, float] = Field(default_factory=dict) # Duración de cada paso del pipeline de generación (ms)
+    pdf_text_metrics: Dict[str, int] = Field(default_factory=dict) # Páginas y ahorro de la normalización del texto del PDF (caracteres, tokens, líneas)
     # pdf_processed_text: Optional[str] = None # Opcional: texto extraído/transformado del PDF
 
 # Modelo para la personalización de prompts (si se mantiene esta funcionalidad)
@@ -13,6 +13,15 @@ PDF_TRANSFORMATION_SYSTEM_PROMPT = (
     "que no esté presente en el texto original. Concéntrate en la estructura de un caso de éxito."
 )
 
+# Prompt interno para la fase "map" de la transformación de PDFs largos: una sección del documento cada vez
+PDF_TRANSFORMATION_SECTION_SYSTEM_PROMPT = (
+    "Eres un asistente de IA especializado en reescribir contenido técnico para un artículo de blog sobre un caso "
+    "de éxito. Recibes una sección de un documento técnico más largo. Reescríbela como un borrador narrativo breve "
+    "que conserve los desafíos, las soluciones implementadas, los resultados y todas las cifras, nombres y datos "
+    "concretos que aparezcan. No inventes información ni añadas introducciones o conclusiones: otras secciones "
+    "del documento se procesan por separado y después se combinan."
+)
+
 # Prompt interno para resumir el artículo de caso de éxito
 SUCCESS_CASE_SUMMARY_SYSTEM_PROMPT = (
     "Eres un asistente de IA experto en resumir artículos. Por favor, resume el siguiente artículo de caso de éxito "
@@ -32,6 +41,15 @@ WEB_RESEARCH_SYSTEM_PROMPT = (
     "El resumen debe ser neutral y objetivo."
 )
 
+# Prompt interno para la fase "map" de la investigación: un trozo de una fuente cada vez, con un modelo barato
+RESEARCH_MAP_NO_INFO = "SIN INFORMACIÓN RELEVANTE"
+RESEARCH_MAP_SYSTEM_PROMPT = (
+    "Eres un asistente de investigación IA. Recibes un fragmento de una página web y el tema principal de un "
+    "artículo de blog. Extrae únicamente los datos, cifras, ejemplos o citas del fragmento que sean relevantes "
+    "para el tema, en viñetas breves y sin añadir información propia. Si el fragmento no contiene nada "
+    f"relevante para el tema, responde exactamente: {RESEARCH_MAP_NO_INFO}"
+)
+
 # Ya no se necesitan BlogPromptTemplate, GeneralInterestPromptTemplate, SuccessCasePromptTemplate
 # si el frontend envía el system_prompt completo.
 # La función create_default_blog_prompt_templates() también se puede eliminar.
\ No newline at end of file
@@ -1,7 +1,7 @@
 # MODIFICADO: Asegurar que urls_researched se pase como lista de strings
 from sqlalchemy.orm import Session 
 import uuid 
-from typing import Optional, Dict, Any, List 
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 from pydantic import HttpUrl 
 
 from blog.agents.blog_agent import BlogAgent 
@@ -16,13 +16,73 @@ from core.logger import get_logger
 from crud import content_crud 
 from schemas.content_schemas import GeneratedContentCreate 
 from core.config import settings 
+from core.database import SessionLocal
+from common.utils.helpers import format_sse_event
+from common.services.single_flight import generation_single_flight
+from common.services.llm_usage import collect_llm_usage
+from schemas.usage_schemas import LLMCallUsage
 
 logger = get_logger("blog_service")
 
 class BlogService:
     def __init__(self):
+        # Un único agente compartido: los parámetros de cada generación viajan por llamada
+        # (LLMCallOptions), por lo que es seguro usarlo desde corrutinas concurrentes.
+        self.agent = BlogAgent(
+            model_identifier="Default",
+            temperature=settings.DEFAULT_TEMPERATURE
+        )
         logger.info("BlogService inicializado.")
     
+    def _build_general_interest_history_entry(
+        self,
+        request: GeneralInterestBlogRequest,
+        article_response: BlogArticleResponse,
+        llm_usage: Optional[List[LLMCallUsage]] = None
+    ) -> GeneratedContentCreate:
+        urls_researched_as_strings: Optional[List[str]] = None
+        if request.urls_to_research:
+            urls_researched_as_strings = [str(url) for url in request.urls_to_research]
+
+        return GeneratedContentCreate(
+            content_type='blog_general_interest',
+            custom_title=request.human_prompt[:100], 
+            human_prompt_used=request.human_prompt,
+            system_prompt_used=self.agent._apply_author_prefix_to_system_prompt(request.system_prompt, request.model),
+            model_key_selected=request.model,
+            actual_llm_model_name_used=article_response.actual_model_name_used,
+            temperature_used=article_response.temperature_used,
+            max_tokens_article_used=request.max_tokens_article,
+            urls_researched=urls_researched_as_strings, 
+            web_research_options_used=request.web_research_options.model_dump() if request.web_research_options else None,
+            generated_text_main=article_response.generated_article,
+            researched_content_summary=article_response.researched_content_summary,
+            llm_usage=llm_usage
+        )
+
+    def _build_variant_entries(
+        self, base_entry: GeneratedContentCreate, variants: List[Tuple[str, Optional[str]]]
+    ) -> Tuple[Optional[uuid.UUID], List[GeneratedContentCreate]]:
+        """
+        Una entrada de historial por variante (texto principal y resumen opcional). Con varias
+        variantes se genera un generation_group_id común y cada hermana guarda su variant_index.
+        El uso de LLM de la generación (compartido por todas las variantes) queda solo en la variante 0.
+        """
+        if len(variants) <= 1:
+            return None, [base_entry]
+        generation_group_id = uuid.uuid4()
+        entries = [
+            base_entry.model_copy(update={
+                "generated_text_main": main_text,
+                "generated_text_summary": summary_text,
+                "generation_group_id": generation_group_id,
+                "variant_index": variant_index,
+                "llm_usage": base_entry.llm_usage if variant_index == 0 else None
+            })
+            for variant_index, (main_text, summary_text) in enumerate(variants)
+        ]
+        return generation_group_id, entries
+
     async def generate_general_interest_article(
         self, 
         request: GeneralInterestBlogRequest,
@@ -31,74 +91,103 @@ class BlogService:
     ) -> BlogArticleResponse:
         logger.info(f"Servicio Blog: Solicitud interés general. Tema: '{request.human_prompt[:50]}...' Usuario: {user_id}")
         try:
-            agent = BlogAgent(
-                model_identifier=request.model,
-                temperature=request.temperature,
-                max_tokens=request.max_tokens_article
-            )
-            article_response = await agent.generate_general_interest_article(request)
-
-            urls_researched_as_strings: Optional[List[str]] = None
-            if request.urls_to_research:
-                urls_researched_as_strings = [str(url) for url in request.urls_to_research]
-
-            content_to_save = GeneratedContentCreate(
-                content_type='blog_general_interest',
-                custom_title=request.human_prompt[:100], 
-                human_prompt_used=request.human_prompt,
-                system_prompt_used=agent._apply_author_prefix_to_system_prompt(request.system_prompt),
-                model_key_selected=request.model,
-                actual_llm_model_name_used=agent.model_name,
-                temperature_used=agent.temperature,
-                max_tokens_article_used=request.max_tokens_article,
-                urls_researched=urls_researched_as_strings, 
-                web_research_options_used=request.web_research_options.model_dump() if request.web_research_options else None,
-                generated_text_main=article_response.generated_article,
-                researched_content_summary=article_response.researched_content_summary
-            )
-            content_crud.create_generated_content(db=db, user_id=user_id, content_data=content_to_save)
-            logger.info(f"Artículo de interés general guardado en historial para usuario {user_id}")
-            
-            return article_response 
+            async def generate_and_save() -> BlogArticleResponse:
+                with collect_llm_usage() as usage:
+                    article_response = await self.agent.generate_general_interest_article(request)
+                article_response.cached_token_ratio = usage.cached_token_ratio()
+
+                article_response.generation_group_id, contents_to_save = self._build_variant_entries(
+                    self._build_general_interest_history_entry(request, article_response, usage.calls),
+                    [(variant, None) for variant in article_response.article_variants]
+                )
+                content_crud.create_generated_contents_bulk(db=db, user_id=user_id, contents_data=contents_to_save)
+                logger.info(f"Artículo de interés general ({len(contents_to_save)} variante(s)) guardado en historial para usuario {user_id}")
+                return article_response
+
+            # Solicitudes idénticas y simultáneas del mismo usuario comparten generación y fila de historial.
+            flight_key = ("blog_general_interest", user_id, request.model_dump_json())
+            return await generation_single_flight.run(flight_key, generate_and_save)
         except Exception as e:
             logger.error(f"Error en BlogService (interés general): {str(e)}", exc_info=True)
             raise
 
+    async def stream_general_interest_article(
+        self,
+        request: GeneralInterestBlogRequest,
+        user_id: uuid.UUID
+    ) -> AsyncIterator[str]:
+        """
+        Genera el artículo en streaming y emite eventos SSE: 'token' por cada fragmento,
+        'done' con los metadatos de BlogArticleResponse al terminar, o 'error'.
+        El artículo completo se guarda en el historial antes de emitir 'done'.
+        """
+        logger.info(f"Servicio Blog: Streaming interés general. Tema: '{request.human_prompt[:50]}...' Usuario: {user_id}")
+        try:
+            with collect_llm_usage() as usage:
+                async for item in self.agent.stream_general_interest_article(request):
+                    if isinstance(item, BlogArticleResponse):
+                        item.cached_token_ratio = usage.cached_token_ratio()
+                        # La sesión de la petición (get_db) ya se ha cerrado cuando se consume el stream,
+                        # así que el guardado usa su propia sesión.
+                        db = SessionLocal()
+                        try:
+                            content_crud.create_generated_content(
+                                db=db,
+                                user_id=user_id,
+                                content_data=self._build_general_interest_history_entry(request, item, usage.calls)
+                            )
+                        finally:
+                            db.close()
+                        logger.info(f"Artículo de interés general (streaming) guardado en historial para usuario {user_id}")
+                        yield format_sse_event("done", item.model_dump(mode="json"))
+                    else:
+                        yield format_sse_event("token", {"text": item})
+        except Exception as e:
+            logger.error(f"Error en BlogService (streaming interés general): {str(e)}", exc_info=True)
+            yield format_sse_event("error", {"detail": str(e)})
+
     async def generate_success_case_article(
         self, 
         request: SuccessCaseBlogRequest, 
         db: Session, 
         user_id: uuid.UUID, 
-        pdf_bytes: Optional[bytes] = None,
         pdf_filename: Optional[str] = None # Añadir filename para el historial
     ) -> SuccessCaseBlogResponse:
         logger.info(f"Servicio Blog: Solicitud caso de éxito. Tema: '{request.human_prompt[:50]}...' Usuario: {user_id}")
         try:
-            agent = BlogAgent(
-                model_identifier=request.model,
-                temperature=request.temperature,
-                max_tokens=request.max_tokens_article 
-            )
-            case_response = await agent.generate_success_case_article(request, pdf_bytes)
-
-            content_to_save = GeneratedContentCreate(
-                content_type='blog_success_case',
-                custom_title=request.human_prompt[:100],
-                human_prompt_used=request.human_prompt, 
-                system_prompt_used=agent._apply_author_prefix_to_system_prompt(request.system_prompt),
-                model_key_selected=request.model,
-                actual_llm_model_name_used=agent.model_name,
-                temperature_used=agent.temperature,
-                max_tokens_article_used=request.max_tokens_article,
-                max_tokens_summary_used=request.max_tokens_summary,
-                pdf_filename_original= pdf_filename, # Usar el filename pasado
-                generated_text_main=case_response.full_article,
-                generated_text_summary=case_response.summary_article
-            )
-            content_crud.create_generated_content(db=db, user_id=user_id, content_data=content_to_save)
-            logger.info(f"Caso de éxito guardado en historial para usuario {user_id}")
-
-            return case_response 
+            async def generate_and_save() -> SuccessCaseBlogResponse:
+                with collect_llm_usage() as usage:
+                    case_response = await self.agent.generate_success_case_article(request)
+                case_response.cached_token_ratio = usage.cached_token_ratio()
+
+                content_to_save = GeneratedContentCreate(
+                    content_type='blog_success_case',
+                    custom_title=request.human_prompt[:100],
+                    human_prompt_used=request.human_prompt, 
+                    system_prompt_used=self.agent._apply_author_prefix_to_system_prompt(request.system_prompt, request.model),
+                    model_key_selected=request.model,
+                    actual_llm_model_name_used=case_response.actual_model_name_used,
+                    temperature_used=case_response.temperature_used,
+                    max_tokens_article_used=request.max_tokens_article,
+                    max_tokens_summary_used=request.max_tokens_summary,
+                    pdf_filename_original= pdf_filename, # Usar el filename pasado
+                    generated_text_main=case_response.full_article,
+                    generated_text_summary=case_response.summary_article,
+                    llm_usage=usage.calls
+                )
+                case_response.generation_group_id, contents_to_save = self._build_variant_entries(
+                    content_to_save,
+                    list(zip(case_response.full_article_variants, case_response.summary_article_variants))
+                )
+                content_crud.create_generated_contents_bulk(db=db, user_id=user_id, contents_data=contents_to_save)
+                logger.info(f"Caso de éxito ({len(contents_to_save)} variante(s)) guardado en historial para usuario {user_id}")
+
+                return case_response
+
+            # Solicitudes idénticas y simultáneas del mismo usuario (mismo `pdf_hash` incluido) comparten
+            # generación y fila de historial.
+            flight_key = ("blog_success_case", user_id, request.model_dump_json(), pdf_filename)
+            return await generation_single_flight.run(flight_key, generate_and_save)
         except Exception as e:
             logger.error(f"Error en BlogService (caso de éxito): {str(e)}", exc_info=True)
             raise
@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional # Dict ya no es necesario para _get_messages
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple # Dict ya no es necesario para _get_messages
 # import json # No es necesario para logging simplificado aquí
 
-from langchain_core.messages import SystemMessage, HumanMessage # Actualizado
-from langchain_openai import ChatOpenAI
+from common.services.llm_client_registry import llm_client_registry
+from common.services.llm_backends import LLMBackend, LLMCompletion, get_llm_backend
+from common.services.llm_response_cache import llm_response_cache, CacheMode, CachedResponse, LLMCacheMissError
+from common.services.single_flight import llm_single_flight
+from common.services.llm_rate_limiter import llm_rate_limiter
+from common.services.llm_resilience import llm_resilience
+from common.services.context_budget import context_budget_manager, ContextSegment, PackedContext
+from common.services.llm_usage import record_llm_usage, usage_from_message
+from common.utils.helpers import canonicalize_prompt_text
 
 # from common.prompt_templates.base_templates import BasePromptTemplate # Ya no es un argumento obligatorio
 from core.logger import get_logger
@@ -11,6 +21,20 @@ from core.config import settings
 
 logger = get_logger("base_agent")
 
+@dataclass(frozen=True)
+class LLMCallOptions:
+    """
+    Parámetros de generación de una única llamada al LLM.
+    Son inmutables y viajan con la llamada, por lo que un mismo agente puede atender
+    muchas corrutinas concurrentes sin que unas usen la configuración de otras.
+    """
+    model_name: str # El nombre/ID real del modelo LLM
+    temperature: float
+    max_tokens: int
+    cache_mode: CacheMode = "bypass" # Uso de la caché exacta de respuestas (no forma parte de la clave)
+    step: str = "llm_call" # Paso del pipeline al que se imputa el uso (telemetría; no forma parte de la clave)
+
+
 class BaseAgent(ABC):
     """Clase base refactorizada para agentes de generación de contenido."""
     
@@ -25,59 +49,153 @@ class BaseAgent(ABC):
         Inicializa el agente.
         
         Args:
-            model_name: Nombre/ID del modelo de lenguaje a utilizar (e.g., "gpt-4o", "ft:...")
-            temperature: Temperatura para la generación (creatividad)
-            max_tokens: Número máximo de tokens en la respuesta
+            model_name: Nombre/ID del modelo por defecto (e.g., "gpt-4o", "ft:...")
+            temperature: Temperatura por defecto para la generación (creatividad)
+            max_tokens: Número máximo de tokens por defecto en la respuesta
         """
         # self.prompt_template = prompt_template # Se elimina dependencia directa
-        self.model_name = model_name
-        self.temperature = temperature
-        self.max_tokens = max_tokens
-        self.llm = self._initialize_llm()
-        
-    def _initialize_llm(self) -> ChatOpenAI:
-        """Inicializa el modelo de lenguaje."""
-        logger.info(f"Inicializando LLM con modelo: {self.model_name}, temperatura: {self.temperature}, max_tokens: {self.max_tokens}")
-        if not settings.OPENAI_API_KEY:
-            logger.error("API Key de OpenAI no configurada en settings.")
-            raise ValueError("API Key de OpenAI no configurada.")
-        return ChatOpenAI(
-            model=self.model_name, # Usar model_name directamente
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            api_key=settings.OPENAI_API_KEY
+        # Valores por defecto del agente. Nunca se mutan: cada llamada recibe sus propios LLMCallOptions.
+        self.default_call_options = LLMCallOptions(
+            model_name=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens
         )
+
+    @property
+    def model_name(self) -> str:
+        return self.default_call_options.model_name
+
+    @property
+    def temperature(self) -> float:
+        return self.default_call_options.temperature
+
+    @property
+    def max_tokens(self) -> int:
+        return self.default_call_options.max_tokens
+
+    def _build_call_options(
+        self,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        cache_mode: CacheMode = "bypass",
+        step: str = "llm_call"
+    ) -> LLMCallOptions:
+        """Crea las opciones de una llamada, completando lo no indicado con los valores por defecto del agente."""
+        return LLMCallOptions(
+            model_name=model_name or self.default_call_options.model_name,
+            temperature=temperature if temperature is not None else self.default_call_options.temperature,
+            max_tokens=max_tokens or self.default_call_options.max_tokens,
+            cache_mode=cache_mode,
+            step=step
+        )
+
+    def _prompt_fingerprint(
+        self, system_prompt: str, human_prompt: str, options: LLMCallOptions, num_variants: int = 1
+    ) -> str:
+        """Huella exacta de una llamada (modelo, temperatura, max_tokens, variantes y prompts), usada por la caché y el single-flight."""
+        return llm_response_cache.make_key(
+            options.model_name, options.temperature, options.max_tokens, system_prompt, human_prompt, num_variants
+        )
+
+    def _lookup_cached_response(
+        self, system_prompt: str, human_prompt: str, options: LLMCallOptions, num_variants: int = 1
+    ) -> Tuple[Optional[str], Optional[CachedResponse]]:
+        """
+        Consulta la caché exacta según options.cache_mode.
+        Devuelve (clave, respuesta en caché); la clave es None si la llamada no usa caché.
+        """
+        if options.cache_mode == "bypass":
+            return None, None
+        cache_key = self._prompt_fingerprint(system_prompt, human_prompt, options, num_variants)
+        cached = llm_response_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Respuesta servida desde la caché LLM (modelo: {options.model_name}).")
+            record_llm_usage(options.step, options.model_name, attempts=0, cache_hit=True)
+            return cache_key, cached
+        if options.cache_mode == "only":
+            raise LLMCacheMissError("No hay una respuesta en caché para esta solicitud (cache='only').")
+        return cache_key, None
+
+    def _shares_in_flight_calls(self, options: LLMCallOptions) -> bool:
+        """
+        Solo se comparte una llamada en curso si su resultado se podría compartir igualmente: es
+        determinista (temperatura 0) o la petición acepta respuestas de la caché (cache prefer/only).
+        Con cache="bypass" y temperatura > 0 cada llamada debe producir su propia generación.
+        """
+        return options.temperature == 0 or options.cache_mode != "bypass"
+
+    async def _run_llm_call(
+        self, fingerprint: str, options: LLMCallOptions, operation: Callable[[], Awaitable[List[str]]]
+    ) -> List[str]:
+        if self._shares_in_flight_calls(options):
+            return await llm_single_flight.run(fingerprint, operation)
+        return await operation()
+
+    def _estimate_call_tokens(
+        self, system_prompt: str, human_prompt: str, options: LLMCallOptions, num_variants: int = 1
+    ) -> int:
+        """Tokens que consumirá la llamada (prompt contado con el tokenizador del modelo + salida máxima), para el limitador TPM."""
+        prompt_tokens = context_budget_manager.count_tokens(system_prompt + human_prompt, options.model_name)
+        return prompt_tokens + options.max_tokens * num_variants
+
+    @staticmethod
+    def _used_tokens(message: Any) -> int:
+        """Tokens que el proveedor dice haber consumido (prompt + salida); 0 si no envía usage_metadata."""
+        usage = usage_from_message(message)
+        return usage["prompt_tokens"] + usage["completion_tokens"]
+
+    def _pack_context(
+        self,
+        options: LLMCallOptions,
+        segments: List[ContextSegment],
+        dropped_tokens: Optional[Dict[str, int]] = None,
+        group_limits: Optional[Dict[str, int]] = None
+    ) -> PackedContext:
+        """
+        Ajusta los segmentos del prompt a la ventana de contexto del modelo de la llamada
+        (reservando options.max_tokens para la respuesta). Si se pasa `dropped_tokens`,
+        acumula en él los tokens descartados por segmento para informar en la respuesta.
+        """
+        packed = context_budget_manager.pack(options.model_name, options.max_tokens, segments, group_limits)
+        if dropped_tokens is not None:
+            for name, dropped in packed.report.dropped_tokens.items():
+                dropped_tokens[name] = dropped_tokens.get(name, 0) + dropped
+        return packed
+
+    def _get_backend(self) -> LLMBackend:
+        """Backend de llamadas al proveedor (LangChain u OpenAI nativo), según settings.LLM_BACKEND."""
+        return get_llm_backend()
     
     # update_prompt_template ya no es relevante si el system_prompt viene del request
     # def update_prompt_template(self, new_template: BasePromptTemplate) -> None: ...
 
-    def update_llm_config(
-        self, 
-        model_name: Optional[str] = None, 
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
-    ) -> None:
-        """Actualiza la configuración del LLM y lo reinicializa."""
-        if model_name:
-            self.model_name = model_name
-        if temperature is not None:
-            self.temperature = temperature
-        if max_tokens is not None:
-            self.max_tokens = max_tokens
-            
-        self.llm = self._initialize_llm() # Re-inicializar con nuevos settings
-        logger.info(f"Configuración del LLM actualizada - Modelo: {self.model_name}, Temperatura: {self.temperature}, Max Tokens: {self.max_tokens}")
+    # update_llm_config se elimina: mutaba el agente y no era seguro con peticiones concurrentes.
+    # Los parámetros se pasan ahora por llamada mediante LLMCallOptions.
         
     # _get_messages se simplifica, ya no usa prompt_template
-    def _prepare_messages(self, system_prompt_content: str, human_prompt_content: str) -> List[Any]: # Era List[Dict[str,Any]]
+    def _prepare_messages(self, system_prompt_content: str, human_prompt_content: str) -> Tuple[str, str]:
         """
-        Construye los mensajes para la llamada al modelo directamente desde los strings.
+        Prepara el contenido de los mensajes system y human; cada backend construye sus propios objetos.
+        El contenido estático (prefijo de autor y plantilla, en el mensaje system) va primero y el
+        variable (petición del usuario, investigación, PDF) al final, ambos en forma canónica, para
+        que el prefijo sea idéntico byte a byte entre peticiones y lo reutilice la caché de prompts del proveedor.
         """
         logger.debug(f"Preparando mensajes. System: '{system_prompt_content[:100]}...', Human: '{human_prompt_content[:100]}...'")
-        return [
-            SystemMessage(content=system_prompt_content),
-            HumanMessage(content=human_prompt_content)
-        ]
+        return canonicalize_prompt_text(system_prompt_content), canonicalize_prompt_text(human_prompt_content)
+
+    def _provider_call_kwargs(self, system_content: str, options: LLMCallOptions) -> Dict[str, Any]:
+        """
+        Parámetros por llamada para el proveedor. Incluye una prompt_cache_key estable por paso y
+        system prompt (es decir, por plantilla y autor) para que las peticiones que comparten prefijo
+        se enruten al mismo caché de prompts.
+        """
+        call_kwargs: Dict[str, Any] = {"temperature": options.temperature, "max_tokens": options.max_tokens}
+        if settings.LLM_PROMPT_CACHE_KEY_ENABLED:
+            system_digest = hashlib.sha256(system_content.encode("utf-8")).hexdigest()[:16]
+            # extra_body: el SDK fijado no expone prompt_cache_key como argumento propio.
+            call_kwargs["extra_body"] = {"prompt_cache_key": f"{options.step}:{system_digest}"}
+        return call_kwargs
     
     @abstractmethod
     async def generate_content(self, **kwargs) -> Any:
@@ -87,30 +205,158 @@ class BaseAgent(ABC):
         """
         pass
     
-    async def _call_llm_with_prompts(self, system_prompt: str, human_prompt: str) -> str:
+    async def _call_llm_with_prompts(
+        self,
+        system_prompt: str,
+        human_prompt: str,
+        options: Optional[LLMCallOptions] = None
+    ) -> str:
         """
         Realiza la llamada al modelo de lenguaje con prompts directos.
+
+        Args:
+            system_prompt: Contenido del SystemMessage
+            human_prompt: Contenido del HumanMessage
+            options: Modelo, temperatura, max_tokens y modo de caché de esta llamada (por defecto, los del agente)
+        """
+        options = options or self.default_call_options
+        cache_key, cached = self._lookup_cached_response(system_prompt, human_prompt, options)
+        if cached is not None:
+            return cached
+        # Llamadas idénticas concurrentes comparten una única llamada al proveedor (si su resultado es compartible).
+        fingerprint = cache_key or self._prompt_fingerprint(system_prompt, human_prompt, options)
+        contents = await self._run_llm_call(
+            fingerprint, options, lambda: self._invoke_llm(system_prompt, human_prompt, options, cache_key)
+        )
+        return contents[0]
+
+    async def _call_llm_variants(
+        self,
+        system_prompt: str,
+        human_prompt: str,
+        options: Optional[LLMCallOptions] = None,
+        num_variants: int = 1
+    ) -> List[str]:
+        """
+        Genera `num_variants` respuestas alternativas para los mismos prompts en una sola llamada
+        al proveedor (parámetro n), de modo que el prompt se procesa y se paga una única vez.
+        """
+        options = options or self.default_call_options
+        if num_variants <= 1:
+            return [await self._call_llm_with_prompts(system_prompt, human_prompt, options)]
+        cache_key, cached = self._lookup_cached_response(system_prompt, human_prompt, options, num_variants)
+        if cached is not None:
+            return list(cached)
+        fingerprint = cache_key or self._prompt_fingerprint(system_prompt, human_prompt, options, num_variants)
+        return await self._run_llm_call(
+            fingerprint, options, lambda: self._invoke_llm(system_prompt, human_prompt, options, cache_key, num_variants)
+        )
+
+    async def _invoke_llm(
+        self,
+        system_prompt: str,
+        human_prompt: str,
+        options: LLMCallOptions,
+        cache_key: Optional[str] = None,
+        num_variants: int = 1
+    ) -> List[str]:
+        """
+        Llamada efectiva al proveedor; devuelve las `num_variants` respuestas generadas.
+        Si se indica cache_key, guarda la respuesta en la caché.
         """
         try:
-            messages = self._prepare_messages(system_prompt_content=system_prompt, human_prompt_content=human_prompt)
-            
-            # --- INICIO: LÍNEA DE LOGGER SUGERIDA ---
-            # Aquí puedes loggear el contenido completo del SystemMessage
-            # messages[0] es el SystemMessage, messages[1] es el HumanMessage
-            if messages and len(messages) > 0 and hasattr(messages[0], 'content'):
-                logger.info(f"Contenido del SystemMessage enviado a ainvoke: '{messages[0].content}'")
-            else:
-                logger.warning("No se pudo loggear el SystemMessage: la lista de mensajes está vacía o el primer mensaje no tiene 'content'.")
-            # --- FIN: LÍNEA DE LOGGER SUGERIDA ---
-
-            logger.debug(f"Enviando mensajes al LLM: System: '{messages[0].content[:100]}...', Human: '{messages[1].content[:100]}...'")
+            system_content, human_content = self._prepare_messages(
+                system_prompt_content=system_prompt, human_prompt_content=human_prompt
+            )
+            logger.info(f"Contenido del SystemMessage enviado al LLM: '{system_content}'")
+            logger.debug(f"Enviando mensajes al LLM: System: '{system_content[:100]}...', Human: '{human_content[:100]}...'")
             
-            response = await self.llm.ainvoke(messages) # Usar ainvoke para async
-            logger.debug(f"Respuesta recibida del LLM: '{response.content[:100]}...'")
-            return response.content
+            backend = self._get_backend()
+            estimated_tokens = self._estimate_call_tokens(system_prompt, human_prompt, options, num_variants)
+            call_kwargs = self._provider_call_kwargs(system_content, options)
+            attempts = 0
+
+            async def attempt() -> LLMCompletion:
+                # Cada intento (incluidos reintentos y coberturas) pasa por el limitador y se mide por separado.
+                nonlocal attempts
+                attempts += 1
+                async with llm_rate_limiter.limit(options.model_name, estimated_tokens) as reservation, \
+                           llm_client_registry.track_call(options.model_name):
+                    # Con num_variants > 1 el proveedor devuelve n choices para el mismo prompt en una sola petición.
+                    completion = await backend.complete(
+                        options.model_name, system_content, human_content, call_kwargs, n=num_variants
+                    )
+                    reservation.settle(self._used_tokens(completion))
+                    return completion
+
+            started = time.perf_counter()
+            completion = await llm_resilience.call(options.model_name, attempt)
+            contents = completion.contents
+            record_llm_usage(
+                options.step, options.model_name, completion,
+                latency_ms=(time.perf_counter() - started) * 1000, attempts=attempts
+            )
+            logger.debug(f"Respuesta recibida del LLM ({len(contents)} variante(s)): '{contents[0][:100]}...'")
+            if cache_key:
+                llm_response_cache.set(cache_key, contents[0] if num_variants == 1 else contents)
+            return contents
             
         except Exception as e:
             logger.error(f"Error al llamar al LLM: {str(e)}", exc_info=True) # exc_info para traceback
             raise # Re-lanza la excepción para que sea manejada por el llamador
 
+    async def _stream_llm_with_prompts(
+        self,
+        system_prompt: str,
+        human_prompt: str,
+        options: Optional[LLMCallOptions] = None
+    ) -> AsyncIterator[str]:
+        """
+        Variante en streaming de _call_llm_with_prompts: emite los fragmentos de texto
+        a medida que llegan del modelo (astream) en lugar de esperar a la respuesta completa.
+        """
+        options = options or self.default_call_options
+        cache_key, cached = self._lookup_cached_response(system_prompt, human_prompt, options)
+        if cached is not None:
+            yield cached
+            return
+        system_content, human_content = self._prepare_messages(
+            system_prompt_content=system_prompt, human_prompt_content=human_prompt
+        )
+        logger.info(f"Contenido del SystemMessage enviado en streaming: '{system_content}'")
+        parts: List[str] = []
+        usage_chunk = None # Fragmento final con la metadata de uso
+        attempts = 0
+        started = time.perf_counter()
+        try:
+            backend = self._get_backend()
+            estimated_tokens = self._estimate_call_tokens(system_prompt, human_prompt, options)
+            call_kwargs = self._provider_call_kwargs(system_content, options)
+
+            async def attempt_stream():
+                nonlocal attempts
+                attempts += 1
+                async with llm_rate_limiter.limit(options.model_name, estimated_tokens) as reservation, \
+                           llm_client_registry.track_call(options.model_name):
+                    async for chunk in backend.stream(options.model_name, system_content, human_content, call_kwargs):
+                        if chunk.usage_metadata:
+                            reservation.settle(self._used_tokens(chunk))
+                        yield chunk
+
+            async for chunk in llm_resilience.stream(options.model_name, attempt_stream):
+                if chunk.usage_metadata:
+                    usage_chunk = chunk
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            logger.error(f"Error durante el streaming del LLM: {str(e)}", exc_info=True)
+            raise
+        record_llm_usage(
+            options.step, options.model_name, usage_chunk,
+            latency_ms=(time.perf_counter() - started) * 1000, attempts=attempts
+        )
+        if cache_key:
+            llm_response_cache.set(cache_key, "".join(parts))
+
     # _call_linkedin se elimina, ya que _call_llm_with_prompts es más genérico y directo.
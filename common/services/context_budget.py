@@ -0,0 +1,252 @@
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import tiktoken
+
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("context_budget")
+
+# Estimación conservadora (por exceso) cuando la codificación de tiktoken no está disponible:
+# el español tokeniza en torno a 3,5-4 caracteres por token.
+FALLBACK_CHARS_PER_TOKEN = 3
+FALLBACK_ENCODING = "o200k_base"
+
+
+@dataclass
+class ContextSegment:
+    """
+    Fragmento de contexto que compite por la ventana del modelo.
+    Los obligatorios (system prompt, prefijo de autor, petición del usuario) se incluyen siempre;
+    los opcionales (investigación, PDF...) se añaden por prioridad (menor = antes) y se recortan
+    si no caben completos.
+    """
+    name: str
+    text: str
+    priority: int = 0
+    required: bool = False
+    max_tokens: Optional[int] = None # Tope propio del segmento, además del presupuesto global
+    group: Optional[str] = None # Agrupa en el informe los trozos de una misma fuente (p. ej. "research")
+
+
+@dataclass
+class ContextBudgetReport:
+    model_name: str
+    context_window: int
+    reserved_output_tokens: int
+    input_budget: int
+    used_tokens: int = 0
+    dropped_tokens: Dict[str, int] = field(default_factory=dict) # Por grupo (o nombre) de segmento
+
+    @property
+    def total_dropped_tokens(self) -> int:
+        return sum(self.dropped_tokens.values())
+
+
+@dataclass
+class PackedContext:
+    texts: Dict[str, str] # Texto final de cada segmento (vacío si se descartó por completo)
+    report: ContextBudgetReport
+
+
+class ContextBudgetManager:
+    """
+    Presupuesto de tokens por llamada: conoce la ventana de contexto de cada modelo mapeado,
+    reserva los max_tokens de salida y reparte el resto entre los segmentos del prompt.
+    """
+
+    def __init__(
+        self,
+        context_windows: Dict[str, int] = settings.MODEL_CONTEXT_WINDOWS,
+        default_context_window: int = settings.DEFAULT_CONTEXT_WINDOW,
+        safety_margin_tokens: int = settings.CONTEXT_SAFETY_MARGIN_TOKENS,
+    ):
+        self.context_windows = context_windows
+        self.default_context_window = default_context_window
+        self.safety_margin_tokens = safety_margin_tokens
+        self._encodings: Dict[str, Any] = {}
+        self._encoding_unavailable = False
+        self._lock = threading.Lock()
+        self.packed_calls = 0
+        self.calls_with_drops = 0
+        self.dropped_tokens_total = 0
+        self.dropped_by_segment: Dict[str, int] = {}
+
+    @staticmethod
+    def _base_model_name(model_name: str) -> str:
+        # Los modelos fine-tuned ("ft:gpt-4o-2024-08-06:org:nombre:id") heredan la ventana del modelo base.
+        if model_name.startswith("ft:"):
+            return model_name.split(":")[1]
+        return model_name
+
+    def context_window(self, model_name: str) -> int:
+        base_model = self._base_model_name(model_name)
+        for candidate in (model_name, base_model):
+            if candidate in self.context_windows:
+                return self.context_windows[candidate]
+        # Coincidencia por prefijo: "gpt-4o-2024-08-06" usa la ventana de "gpt-4o"
+        matches = [name for name in self.context_windows if base_model.startswith(name)]
+        if matches:
+            return self.context_windows[max(matches, key=len)]
+        return self.default_context_window
+
+    def _get_encoding(self, model_name: str) -> Optional[Any]:
+        if self._encoding_unavailable:
+            return None
+        base_model = self._base_model_name(model_name)
+        with self._lock:
+            encoding = self._encodings.get(base_model)
+            if encoding is not None:
+                return encoding
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(base_model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+            except Exception as e:
+                # Sin acceso a los ficheros de codificación (p. ej. sin red ni TIKTOKEN_CACHE_DIR)
+                logger.warning(f"Codificación de tiktoken no disponible ({e}); se usa una estimación por caracteres.")
+                self._encoding_unavailable = True
+                return None
+            self._encodings[base_model] = encoding
+            return encoding
+
+    def count_tokens(self, text: str, model_name: str) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding(model_name)
+        if encoding is None:
+            return math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate_to_tokens(self, text: str, max_tokens: int, model_name: str) -> Tuple[str, int]:
+        """Recorta `text` a sus primeros `max_tokens` tokens. Devuelve (texto, tokens descartados)."""
+        if max_tokens <= 0:
+            return "", self.count_tokens(text, model_name)
+        encoding = self._get_encoding(model_name)
+        if encoding is None:
+            total = self.count_tokens(text, model_name)
+            if total <= max_tokens:
+                return text, 0
+            return text[:max_tokens * FALLBACK_CHARS_PER_TOKEN], total - max_tokens
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text, 0
+        return encoding.decode(tokens[:max_tokens]), len(tokens) - max_tokens
+
+    def split_to_tokens(self, text: str, max_tokens: int, model_name: str) -> List[str]:
+        """
+        Divide `text` en secciones consecutivas de como mucho `max_tokens` tokens, cortando entre párrafos
+        (o, si un párrafo no cabe, entre líneas) siempre que se pueda.
+        """
+        def pieces() -> Iterator[Tuple[str, int]]:
+            for paragraph in text.split("\n\n"):
+                tokens = self.count_tokens(paragraph, model_name)
+                if tokens <= max_tokens:
+                    yield paragraph, tokens
+                    continue
+                for line in paragraph.split("\n"):
+                    while line:
+                        head, _ = self.truncate_to_tokens(line, max_tokens, model_name)
+                        head = head or line[:1] # Siempre se avanza, aunque max_tokens sea diminuto
+                        yield head, self.count_tokens(head, model_name)
+                        line = line[len(head):]
+
+        sections: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+        for piece, tokens in pieces():
+            if current and current_tokens + tokens > max_tokens:
+                sections.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens + 1 # +1: separador entre párrafos
+        if current:
+            sections.append("\n\n".join(current))
+        return [section for section in sections if section.strip()]
+
+    def input_budget(self, model_name: str, max_output_tokens: int) -> int:
+        """Tokens disponibles para el prompt una vez reservada la salida y el margen de seguridad."""
+        return self.context_window(model_name) - max_output_tokens - self.safety_margin_tokens
+
+    def pack(
+        self,
+        model_name: str,
+        max_output_tokens: int,
+        segments: List[ContextSegment],
+        group_limits: Optional[Dict[str, int]] = None
+    ) -> PackedContext:
+        """
+        Reparte la ventana de contexto entre los segmentos. `group_limits` fija un tope conjunto
+        para los segmentos de un mismo grupo. Lanza ValueError si los segmentos obligatorios no
+        caben, en lugar de dejar que el proveedor rechace la llamada.
+        """
+        group_remaining = dict(group_limits or {})
+        report = ContextBudgetReport(
+            model_name=model_name,
+            context_window=self.context_window(model_name),
+            reserved_output_tokens=max_output_tokens,
+            input_budget=self.input_budget(model_name, max_output_tokens),
+        )
+        texts: Dict[str, str] = {}
+
+        for segment in segments:
+            if segment.required:
+                texts[segment.name] = segment.text
+                report.used_tokens += self.count_tokens(segment.text, model_name)
+        if report.used_tokens > report.input_budget:
+            raise ValueError(
+                f"El prompt ({report.used_tokens} tokens) no cabe en la ventana de contexto de '{model_name}' "
+                f"({report.context_window} tokens, {max_output_tokens} reservados para la respuesta)."
+            )
+
+        optional_segments = sorted(
+            (segment for segment in segments if not segment.required), key=lambda segment: segment.priority
+        )
+        for segment in optional_segments:
+            allowance = report.input_budget - report.used_tokens
+            if segment.max_tokens is not None:
+                allowance = min(allowance, segment.max_tokens)
+            if segment.group in group_remaining:
+                allowance = min(allowance, group_remaining[segment.group])
+            text, dropped = self.truncate_to_tokens(segment.text, allowance, model_name)
+            texts[segment.name] = text
+            used = self.count_tokens(text, model_name)
+            report.used_tokens += used
+            if segment.group in group_remaining:
+                group_remaining[segment.group] -= used
+            if dropped:
+                key = segment.group or segment.name
+                report.dropped_tokens[key] = report.dropped_tokens.get(key, 0) + dropped
+
+        self._record(report)
+        return PackedContext(texts=texts, report=report)
+
+    def _record(self, report: ContextBudgetReport) -> None:
+        with self._lock:
+            self.packed_calls += 1
+            if report.dropped_tokens:
+                self.calls_with_drops += 1
+                self.dropped_tokens_total += report.total_dropped_tokens
+                for key, dropped in report.dropped_tokens.items():
+                    self.dropped_by_segment[key] = self.dropped_by_segment.get(key, 0) + dropped
+        if report.dropped_tokens:
+            logger.info(
+                f"Presupuesto de contexto ({report.model_name}): {report.used_tokens}/{report.input_budget} tokens usados, "
+                f"{report.total_dropped_tokens} descartados {report.dropped_tokens}."
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tokenizer": "estimacion_por_caracteres" if self._encoding_unavailable else "tiktoken",
+            "packed_calls": self.packed_calls,
+            "calls_with_drops": self.calls_with_drops,
+            "dropped_tokens_total": self.dropped_tokens_total,
+            "dropped_tokens_by_segment": dict(self.dropped_by_segment),
+        }
+
+
+context_budget_manager = ContextBudgetManager()
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from common.utils.stats import percentile
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("event_loop_monitor")
+
+
+class EventLoopMonitor:
+    """
+    Mide el retardo del event loop: una tarea duerme `interval_ms` en bucle y anota cuánto tarda
+    de más en despertar. Un retardo alto indica trabajo síncrono (parseo, E/S bloqueante...) que
+    está frenando al resto de peticiones del mismo worker.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.EVENT_LOOP_MONITOR_ENABLED,
+        interval_ms: float = settings.EVENT_LOOP_MONITOR_INTERVAL_MS,
+        window: int = 20000
+    ):
+        self.enabled = enabled
+        self.interval_ms = interval_ms
+        self._lags_ms: Deque[float] = deque(maxlen=window)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.max_lag_ms = 0.0
+
+    def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Monitor de event loop iniciado (intervalo {self.interval_ms} ms).")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        interval = self.interval_ms / 1000
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag_ms = max(0.0, (time.perf_counter() - started - interval) * 1000)
+            self._lags_ms.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def reset(self) -> None:
+        self._lags_ms.clear()
+        self.max_lag_ms = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._lags_ms)
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "interval_ms": self.interval_ms,
+            "samples": len(ordered),
+            "lag_mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else None,
+            "lag_p50_ms": percentile(ordered, 50, ndigits=3),
+            "lag_p95_ms": percentile(ordered, 95, ndigits=3),
+            "lag_p99_ms": percentile(ordered, 99, ndigits=3),
+            "lag_max_ms": round(self.max_lag_ms, 3),
+        }
+
+
+event_loop_monitor = EventLoopMonitor()
@@ -0,0 +1,174 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from common.services.llm_client_registry import llm_client_registry
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_backends")
+
+
+@dataclass
+class LLMCompletion:
+    """Respuesta de una llamada no streaming: una entrada por variante (n choices)."""
+    contents: List[str]
+    # Mismo formato que AIMessage.usage_metadata de LangChain (input_tokens, output_tokens, input_token_details)
+    usage_metadata: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class LLMChunk:
+    """Fragmento de una llamada en streaming; el último trae usage_metadata si el proveedor la envía."""
+    content: str
+    usage_metadata: Optional[Dict[str, Any]] = None
+
+
+class LLMBackend(ABC):
+    """
+    Transporte de las llamadas de BaseAgent al proveedor. Recibe los prompts ya canónicos y
+    los parámetros por llamada (temperature, max_tokens, extra_body...). Rate limiting, reintentos,
+    caché y telemetría se aplican por encima, en BaseAgent, igual para todos los backends.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def complete(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int = 1
+    ) -> LLMCompletion:
+        pass
+
+    @abstractmethod
+    def stream(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[LLMChunk]:
+        pass
+
+
+class LangChainBackend(LLMBackend):
+    """Backend original: ChatOpenAI de LangChain (clientes compartidos del registro)."""
+
+    name = "langchain"
+
+    @staticmethod
+    def _messages(system_prompt: str, human_prompt: str) -> List[Any]:
+        from langchain_core.messages import SystemMessage, HumanMessage
+
+        return [SystemMessage(content=system_prompt), HumanMessage(content=human_prompt)]
+
+    async def complete(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int = 1
+    ) -> LLMCompletion:
+        llm = llm_client_registry.get_client(model_name)
+        messages = self._messages(system_prompt, human_prompt)
+        if n == 1:
+            response = await llm.ainvoke(messages, **call_kwargs)
+            return LLMCompletion(contents=[response.content], usage_metadata=getattr(response, "usage_metadata", None))
+        # Varias variantes en una sola petición: el proveedor devuelve n choices para el mismo prompt.
+        result = await llm.agenerate([messages], n=n, **call_kwargs)
+        generations = result.generations[0]
+        # El uso de tokens de la petición (todas las choices) viaja en el mensaje de la primera.
+        first_message = getattr(generations[0], "message", None)
+        return LLMCompletion(
+            contents=[generation.text for generation in generations],
+            usage_metadata=getattr(first_message, "usage_metadata", None)
+        )
+
+    async def stream(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[LLMChunk]:
+        llm = llm_client_registry.get_client(model_name)
+        async for chunk in llm.astream(self._messages(system_prompt, human_prompt), **call_kwargs):
+            yield LLMChunk(content=chunk.content or "", usage_metadata=getattr(chunk, "usage_metadata", None))
+
+
+def _usage_metadata_from_openai(usage: Any) -> Optional[Dict[str, Any]]:
+    """Convierte el `usage` de la API de OpenAI al formato usage_metadata de LangChain."""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens or 0,
+        "output_tokens": usage.completion_tokens or 0,
+        "total_tokens": usage.total_tokens or 0,
+        "input_token_details": {"cache_read": getattr(details, "cached_tokens", 0) or 0},
+    }
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Camino directo con el cliente asíncrono nativo de OpenAI: sin objetos de mensaje, callbacks
+    ni conversión de LangChain por llamada, y sin cargar LangChain al arrancar.
+    """
+
+    name = "openai"
+
+    @staticmethod
+    def _messages(system_prompt: str, human_prompt: str) -> List[Dict[str, str]]:
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": human_prompt}]
+
+    async def complete(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int = 1
+    ) -> LLMCompletion:
+        client = llm_client_registry.get_openai_client()
+        response = await client.chat.completions.create(
+            model=model_name,
+            messages=self._messages(system_prompt, human_prompt),
+            n=n,
+            **call_kwargs
+        )
+        choices = sorted(response.choices, key=lambda choice: choice.index)
+        return LLMCompletion(
+            contents=[choice.message.content or "" for choice in choices],
+            usage_metadata=_usage_metadata_from_openai(response.usage)
+        )
+
+    async def stream(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[LLMChunk]:
+        client = llm_client_registry.get_openai_client()
+        stream = await client.chat.completions.create(
+            model=model_name,
+            messages=self._messages(system_prompt, human_prompt),
+            stream=True,
+            stream_options={"include_usage": True}, # El último evento trae el uso de tokens
+            **call_kwargs
+        )
+        try:
+            async for event in stream:
+                content = event.choices[0].delta.content if event.choices else None
+                usage_metadata = _usage_metadata_from_openai(event.usage)
+                if content or usage_metadata:
+                    yield LLMChunk(content=content or "", usage_metadata=usage_metadata)
+        finally:
+            await stream.close()
+
+
+_BACKEND_CLASSES = {
+    LangChainBackend.name: LangChainBackend,
+    OpenAIBackend.name: OpenAIBackend,
+}
+# Backends para trabajo offline (grabación, reproducción y respuestas sintéticas), en llm_offline_backends
+OFFLINE_BACKENDS = ("record", "replay", "synthetic")
+_backends: Dict[str, LLMBackend] = {}
+
+
+def _create_backend(name: str) -> LLMBackend:
+    if name in _BACKEND_CLASSES:
+        return _BACKEND_CLASSES[name]()
+    if name in OFFLINE_BACKENDS:
+        from common.services.llm_offline_backends import create_offline_backend
+
+        return create_offline_backend(name, get_llm_backend)
+    raise ValueError(f"Backend LLM '{name}' no soportado. Disponibles: {sorted([*_BACKEND_CLASSES, *OFFLINE_BACKENDS])}")
+
+
+def get_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    """Devuelve el backend configurado (settings.LLM_BACKEND) o el indicado; uno compartido por nombre."""
+    name = name or settings.LLM_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        logger.info(f"Usando el backend LLM '{name}'.")
+        backend = _backends.setdefault(name, _create_backend(name))
+    return backend
@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, Deque, Dict, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    # Importaciones diferidas: con el backend "openai" la aplicación no llega a cargar LangChain.
+    from langchain_openai import ChatOpenAI
+    from openai import AsyncOpenAI
+
+from common.utils.stats import percentile
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_client_registry")
+
+
+class _ModelCallStats:
+    """Contadores de uso de un modelo concreto dentro del registro."""
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.first_token_ms: Deque[float] = deque(maxlen=window) # Tiempo hasta el primer fragmento (streaming)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+        ordered_first_token = sorted(self.first_token_ms)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "latency_p50_ms": percentile(ordered, 50),
+            "latency_p95_ms": percentile(ordered, 95),
+            "latency_samples": len(ordered),
+            "first_token_p50_ms": percentile(ordered_first_token, 50),
+            "first_token_p95_ms": percentile(ordered_first_token, 95),
+        }
+
+
+class LLMClientRegistry:
+    """
+    Registro de clientes LLM asíncronos de larga duración, uno por modelo.
+
+    Los agentes piden prestado el cliente de su modelo con `get_client` (LangChain) o el cliente
+    nativo con `get_openai_client` y nunca los construyen. Todos comparten un único
+    `httpx.AsyncClient` con keep-alive, de modo que las conexiones TLS hacia el proveedor se
+    reutilizan entre peticiones, entre modelos y entre backends.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+        request_timeout: float = settings.LLM_REQUEST_TIMEOUT,
+        stats_window: int = settings.LLM_POOL_STATS_WINDOW,
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._request_timeout = request_timeout
+        self._stats_window = stats_window
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._clients: Dict[str, "ChatOpenAI"] = {}
+        self._openai_client: Optional["AsyncOpenAI"] = None
+        self._stats: Dict[str, _ModelCallStats] = {}
+        self._clients_created = 0
+        self._borrows = 0
+        self._lock = threading.Lock()
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(limits=self._limits, timeout=self._request_timeout)
+        return self._http_client
+
+    def get_client(self, model_name: str) -> "ChatOpenAI":
+        """Devuelve el cliente compartido para `model_name`, creándolo la primera vez."""
+        from langchain_openai import ChatOpenAI
+
+        with self._lock:
+            self._borrows += 1
+            client = self._clients.get(model_name)
+            if client is not None:
+                return client
+
+            if not settings.OPENAI_API_KEY:
+                logger.error("API Key de OpenAI no configurada en settings.")
+                raise ValueError("API Key de OpenAI no configurada.")
+
+            logger.info(f"Creando cliente LLM compartido para el modelo: {model_name}")
+            client = ChatOpenAI(
+                model=model_name,
+                api_key=settings.OPENAI_API_KEY,
+                timeout=self._request_timeout,
+                max_retries=0, # Los reintentos los gestiona llm_resilience (backoff con jitter y presupuesto por modelo)
+                stream_usage=True, # Los streams también informan de los tokens consumidos (telemetría de uso)
+                http_async_client=self._get_http_client(),
+            )
+            self._clients[model_name] = client
+            self._clients_created += 1
+            return client
+
+    def get_openai_client(self) -> "AsyncOpenAI":
+        """
+        Devuelve el cliente asíncrono nativo de OpenAI (backend "openai"), creándolo la primera vez.
+        Es uno solo para todos los modelos: el modelo viaja en cada petición.
+        """
+        from openai import AsyncOpenAI
+
+        with self._lock:
+            self._borrows += 1
+            if self._openai_client is not None:
+                return self._openai_client
+
+            if not settings.OPENAI_API_KEY:
+                logger.error("API Key de OpenAI no configurada en settings.")
+                raise ValueError("API Key de OpenAI no configurada.")
+
+            logger.info("Creando cliente OpenAI nativo compartido.")
+            self._openai_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=self._request_timeout,
+                max_retries=0, # Los reintentos los gestiona llm_resilience
+                http_client=self._get_http_client(),
+            )
+            self._clients_created += 1
+            return self._openai_client
+
+    def _get_model_stats(self, model_name: str) -> _ModelCallStats:
+        stats = self._stats.get(model_name)
+        if stats is None:
+            stats = self._stats.setdefault(model_name, _ModelCallStats(self._stats_window))
+        return stats
+
+    @asynccontextmanager
+    async def track_call(self, model_name: str):
+        """Mide una llamada al LLM para las estadísticas del pool (latencia, errores, concurrencia)."""
+        stats = self._get_model_stats(model_name)
+        stats.calls += 1
+        stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            stats.errors += 1
+            raise
+        else:
+            stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+        finally:
+            stats.in_flight -= 1
+
+    def record_first_token(self, model_name: str, elapsed_ms: float) -> None:
+        """Registra el tiempo hasta el primer fragmento de una llamada en streaming."""
+        self._get_model_stats(model_name).first_token_ms.append(elapsed_ms)
+
+    def latency_percentile(
+        self, model_name: str, p: float, first_token: bool = False, min_samples: int = 1
+    ) -> Optional[float]:
+        """
+        Percentil de latencia observada (ms) del modelo: respuesta completa o, con first_token,
+        tiempo hasta el primer fragmento. None si aún no hay min_samples muestras.
+        """
+        stats = self._stats.get(model_name)
+        if stats is None:
+            return None
+        samples = stats.first_token_ms if first_token else stats.latencies_ms
+        if len(samples) < min_samples:
+            return None
+        return percentile(sorted(samples), p)
+
+    def _connection_stats(self) -> Dict[str, Any]:
+        # httpx no expone el pool públicamente; se inspecciona el pool de httpcore si está disponible.
+        pool = getattr(getattr(self._http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"open_connections": 0, "idle_connections": 0}
+        return {
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas del pool para verificar la reutilización de conexiones bajo carga."""
+        total_calls = sum(stats.calls for stats in self._stats.values())
+        connection_stats = self._connection_stats()
+        return {
+            "clients_created": self._clients_created,
+            "client_borrows": self._borrows,
+            "models": sorted(self._clients.keys()),
+            "openai_native_client": self._openai_client is not None,
+            "max_connections": self._limits.max_connections,
+            "max_keepalive_connections": self._limits.max_keepalive_connections,
+            **connection_stats,
+            "total_calls": total_calls,
+            "per_model": {model: stats.snapshot() for model, stats in self._stats.items()},
+        }
+
+    async def aclose(self) -> None:
+        """Cierra el pool HTTP compartido. Se llama al apagar la aplicación."""
+        with self._lock:
+            self._clients.clear()
+            self._openai_client = None
+            http_client, self._http_client = self._http_client, None
+        if http_client is not None and not http_client.is_closed:
+            await http_client.aclose()
+            logger.info("Pool HTTP de clientes LLM cerrado.")
+
+
+llm_client_registry = LLMClientRegistry()
@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import openai
+
+from common.services.llm_backends import LLMBackend, LLMChunk, LLMCompletion
+from common.services.context_budget import context_budget_manager
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_offline_backends")
+
+# Backends para trabajo de rendimiento sin red ni coste:
+#   record:    llama al backend real (LLM_RECORD_BACKEND) y guarda cada par prompt/respuesta en disco
+#   replay:    sirve de forma determinista las respuestas grabadas; sin grabación lanza LLMReplayMissError
+#   synthetic: genera texto con latencia, velocidad de tokens, troceado del stream y errores 429/500 configurables
+
+
+class LLMReplayMissError(ValueError):
+    """Se lanza en modo replay cuando no hay grabación para la llamada solicitada."""
+
+
+def recording_key(model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int) -> str:
+    """
+    Clave de una grabación: modelo, prompts, parámetros de generación y número de variantes.
+    extra_body (prompt_cache_key) se excluye porque se deriva de los propios prompts.
+    """
+    generation_params = {name: value for name, value in sorted(call_kwargs.items()) if name != "extra_body"}
+    fingerprint = json.dumps(
+        [model_name, system_prompt, human_prompt, generation_params, n], ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+class LLMRecordingStore:
+    """Grabaciones en disco, un fichero JSON por clave, con lectura cacheada en memoria."""
+
+    def __init__(self, directory: str = settings.LLM_RECORDINGS_DIR):
+        self.directory = directory
+        self._loaded: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as recording_file:
+                return json.load(recording_file)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, recording: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as recording_file:
+            json.dump(recording, recording_file, ensure_ascii=False, indent=2)
+        os.replace(temporary_path, self._path(key)) # Escritura atómica: replay nunca lee un fichero a medias
+
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        if key not in self._loaded:
+            self._loaded[key] = await asyncio.to_thread(self._read, key)
+        return self._loaded[key]
+
+    async def save(self, key: str, recording: Dict[str, Any]) -> None:
+        self._loaded[key] = recording
+        await asyncio.to_thread(self._write, key, recording)
+
+
+class RecordingBackend(LLMBackend):
+    """Delega en el backend real y graba cada respuesta (y los fragmentos de cada stream)."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, store: LLMRecordingStore):
+        self.inner = inner
+        self.store = store
+
+    async def complete(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int = 1
+    ) -> LLMCompletion:
+        started = asyncio.get_running_loop().time()
+        completion = await self.inner.complete(model_name, system_prompt, human_prompt, call_kwargs, n=n)
+        await self.store.save(recording_key(model_name, system_prompt, human_prompt, call_kwargs, n), {
+            "model_name": model_name,
+            "system_prompt": system_prompt,
+            "human_prompt": human_prompt,
+            "n": n,
+            "contents": completion.contents,
+            "usage_metadata": completion.usage_metadata,
+            "latency_ms": round((asyncio.get_running_loop().time() - started) * 1000, 1),
+        })
+        return completion
+
+    async def stream(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[LLMChunk]:
+        started = asyncio.get_running_loop().time()
+        chunks: List[str] = []
+        usage_metadata = None
+        first_chunk_ms = None
+        async for chunk in self.inner.stream(model_name, system_prompt, human_prompt, call_kwargs):
+            if first_chunk_ms is None:
+                first_chunk_ms = round((asyncio.get_running_loop().time() - started) * 1000, 1)
+            if chunk.content:
+                chunks.append(chunk.content)
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            yield chunk
+        await self.store.save(recording_key(model_name, system_prompt, human_prompt, call_kwargs, 1), {
+            "model_name": model_name,
+            "system_prompt": system_prompt,
+            "human_prompt": human_prompt,
+            "n": 1,
+            "contents": ["".join(chunks)],
+            "chunks": chunks,
+            "usage_metadata": usage_metadata,
+            "latency_ms": round((asyncio.get_running_loop().time() - started) * 1000, 1),
+            "first_chunk_ms": first_chunk_ms,
+        })
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Sirve las respuestas grabadas. Con LLM_REPLAY_WITH_LATENCY reproduce además la latencia
+    grabada (y, en streaming, el tiempo hasta el primer fragmento) para pruebas de carga realistas.
+    """
+
+    name = "replay"
+
+    def __init__(self, store: LLMRecordingStore, with_latency: bool = settings.LLM_REPLAY_WITH_LATENCY):
+        self.store = store
+        self.with_latency = with_latency
+
+    async def _recording(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int
+    ) -> Dict[str, Any]:
+        key = recording_key(model_name, system_prompt, human_prompt, call_kwargs, n)
+        recording = await self.store.load(key)
+        if recording is None:
+            raise LLMReplayMissError(
+                f"No hay grabación para esta llamada (modelo: {model_name}, clave: {key[:12]}). "
+                f"Grábala antes con LLM_BACKEND=record."
+            )
+        return recording
+
+    async def complete(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int = 1
+    ) -> LLMCompletion:
+        recording = await self._recording(model_name, system_prompt, human_prompt, call_kwargs, n)
+        if self.with_latency:
+            await asyncio.sleep(recording.get("latency_ms", 0) / 1000)
+        return LLMCompletion(contents=list(recording["contents"]), usage_metadata=recording.get("usage_metadata"))
+
+    async def stream(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[LLMChunk]:
+        recording = await self._recording(model_name, system_prompt, human_prompt, call_kwargs, 1)
+        # Una grabación no streaming también sirve: se trocea su texto por palabras.
+        chunks = recording.get("chunks") or _split_words(recording["contents"][0])
+        total_ms = recording.get("latency_ms", 0)
+        first_chunk_ms = recording.get("first_chunk_ms", total_ms)
+        if self.with_latency:
+            await asyncio.sleep(first_chunk_ms / 1000)
+        delay_per_chunk = max(0.0, total_ms - first_chunk_ms) / 1000 / max(1, len(chunks))
+        for index, content in enumerate(chunks):
+            if self.with_latency and index:
+                await asyncio.sleep(delay_per_chunk)
+            yield LLMChunk(content=content)
+        yield LLMChunk(content="", usage_metadata=recording.get("usage_metadata"))
+
+
+def _split_words(text: str) -> List[str]:
+    words = text.split(" ")
+    return [word if index == len(words) - 1 else f"{word} " for index, word in enumerate(words)]
+
+
+_SYNTHETIC_WORDS = (
+    "la empresa equipo proyecto cliente resultado datos estrategia crecimiento innovación "
+    "digital mercado valor solución experiencia liderazgo talento objetivo impacto proceso "
+    "transformación oportunidad tecnología calidad eficiencia de en con para que un una el "
+    "y a los las del por sobre hacia nuevo mejor clave real sostenible"
+).split()
+
+
+class SyntheticBackend(LLMBackend):
+    """
+    Genera respuestas sin proveedor. El texto es determinista para cada prompt; la latencia hasta
+    el primer token sigue una log-normal (p50/p95 configurables), la salida se emite a
+    LLM_SYNTHETIC_TOKENS_PER_SECOND en fragmentos de LLM_SYNTHETIC_CHUNK_TOKENS tokens, y una
+    fracción configurable de las llamadas falla con 429 o 500 (errores reales del SDK de OpenAI,
+    para que reintentos, AIMD y presupuestos se comporten como en producción).
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        first_token_p50_ms: float = settings.LLM_SYNTHETIC_FIRST_TOKEN_P50_MS,
+        first_token_p95_ms: float = settings.LLM_SYNTHETIC_FIRST_TOKEN_P95_MS,
+        tokens_per_second: float = settings.LLM_SYNTHETIC_TOKENS_PER_SECOND,
+        output_tokens: int = settings.LLM_SYNTHETIC_OUTPUT_TOKENS,
+        chunk_tokens: int = settings.LLM_SYNTHETIC_CHUNK_TOKENS,
+        rate_limit_error_rate: float = settings.LLM_SYNTHETIC_429_RATE,
+        server_error_rate: float = settings.LLM_SYNTHETIC_500_RATE,
+        seed: Optional[int] = settings.LLM_SYNTHETIC_SEED,
+    ):
+        self.first_token_p50_ms = first_token_p50_ms
+        # sigma de la log-normal a partir del cociente p95/p50 (z del p95 = 1,645)
+        self.sigma = math.log(max(first_token_p95_ms, first_token_p50_ms) / first_token_p50_ms) / 1.645 if first_token_p50_ms > 0 else 0.0
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.rate_limit_error_rate = rate_limit_error_rate
+        self.server_error_rate = server_error_rate
+        self._random = random.Random(seed)
+
+    def _first_token_seconds(self) -> float:
+        if self.first_token_p50_ms <= 0:
+            return 0.0
+        return self._random.lognormvariate(math.log(self.first_token_p50_ms), self.sigma) / 1000
+
+    def _maybe_fail(self) -> None:
+        draw = self._random.random()
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        if draw < self.rate_limit_error_rate:
+            response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+            raise openai.RateLimitError("Error 429 sintético", response=response, body=None)
+        if draw < self.rate_limit_error_rate + self.server_error_rate:
+            response = httpx.Response(500, request=request)
+            raise openai.InternalServerError("Error 500 sintético", response=response, body=None)
+
+    def _output_token_count(self, call_kwargs: Dict[str, Any]) -> int:
+        return max(1, min(self.output_tokens, call_kwargs.get("max_tokens") or self.output_tokens))
+
+    @staticmethod
+    def _text(system_prompt: str, human_prompt: str, variant: int, token_count: int) -> List[str]:
+        """Palabras deterministas para el prompt (aprox. una por token)."""
+        digest = hashlib.sha256(f"{variant}|{system_prompt}|{human_prompt}".encode("utf-8")).digest()
+        text_random = random.Random(digest)
+        words = [text_random.choice(_SYNTHETIC_WORDS) for _ in range(token_count)]
+        words[0] = words[0].capitalize()
+        return [f"{word} " if index < token_count - 1 else f"{word}." for index, word in enumerate(words)]
+
+    def _usage_metadata(self, model_name: str, system_prompt: str, human_prompt: str, output_tokens: int) -> Dict[str, Any]:
+        input_tokens = context_budget_manager.count_tokens(system_prompt + human_prompt, model_name)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": 0},
+        }
+
+    def _generation_seconds(self, token_count: int) -> float:
+        return token_count / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    async def complete(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any], n: int = 1
+    ) -> LLMCompletion:
+        token_count = self._output_token_count(call_kwargs)
+        await asyncio.sleep(self._first_token_seconds())
+        self._maybe_fail()
+        # Las n variantes se generan en paralelo en el proveedor: el tiempo es el de una.
+        await asyncio.sleep(self._generation_seconds(token_count))
+        return LLMCompletion(
+            contents=["".join(self._text(system_prompt, human_prompt, variant, token_count)) for variant in range(n)],
+            usage_metadata=self._usage_metadata(model_name, system_prompt, human_prompt, token_count * n),
+        )
+
+    async def stream(
+        self, model_name: str, system_prompt: str, human_prompt: str, call_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[LLMChunk]:
+        token_count = self._output_token_count(call_kwargs)
+        await asyncio.sleep(self._first_token_seconds())
+        self._maybe_fail()
+        words = self._text(system_prompt, human_prompt, 0, token_count)
+        chunk_seconds = self._generation_seconds(self.chunk_tokens)
+        for start in range(0, len(words), self.chunk_tokens):
+            if start:
+                await asyncio.sleep(chunk_seconds)
+            yield LLMChunk(content="".join(words[start:start + self.chunk_tokens]))
+        yield LLMChunk(content="", usage_metadata=self._usage_metadata(model_name, system_prompt, human_prompt, token_count))
+
+
+def create_offline_backend(name: str, real_backend_factory) -> LLMBackend:
+    """Construye el backend offline `name`; `real_backend_factory(nombre)` da el backend real para grabar."""
+    if name == RecordingBackend.name:
+        return RecordingBackend(real_backend_factory(settings.LLM_RECORD_BACKEND), LLMRecordingStore())
+    if name == ReplayBackend.name:
+        return ReplayBackend(LLMRecordingStore())
+    return SyntheticBackend()
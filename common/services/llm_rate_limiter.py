@@ -0,0 +1,439 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+import openai
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_rate_limiter")
+
+
+class LLMRateLimitTimeoutError(Exception):
+    """
+    Se lanza cuando una llamada espera en cola más de LLM_RATE_LIMIT_MAX_WAIT_SECONDS (bucket) o de
+    LLM_AIMD_ACQUIRE_TIMEOUT_SECONDS (hueco de concurrencia).
+    """
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Límites de un modelo: peticiones por minuto y tokens por minuto."""
+    rpm: int
+    tpm: int
+
+
+@dataclass
+class TokenReservation:
+    """
+    Tokens reservados en el bucket TPM para una llamada (prompt + salida máxima). Tras la llamada se
+    liquida con el uso real que informa el proveedor y la diferencia se devuelve al bucket.
+    """
+    model_name: str
+    reserved_tokens: int
+    actual_tokens: Optional[int] = None
+
+    def settle(self, actual_tokens: int) -> None:
+        """Registra los tokens consumidos de verdad; sin uso informado (0) se mantiene la reserva completa."""
+        if actual_tokens > 0:
+            self.actual_tokens = actual_tokens
+
+
+def get_rate_limit(model_name: str) -> RateLimit:
+    """Límites configurados para un modelo (LLM_RATE_LIMITS) o los valores por defecto."""
+    configured = settings.LLM_RATE_LIMITS.get(model_name, {})
+    return RateLimit(
+        rpm=int(configured.get("rpm", settings.LLM_DEFAULT_RPM)),
+        tpm=int(configured.get("tpm", settings.LLM_DEFAULT_TPM)),
+    )
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """Señales de sobrecarga del proveedor ante las que hay que reducir la concurrencia: 429 y timeouts."""
+    return isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, asyncio.TimeoutError, httpx.TimeoutException))
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Lee la cabecera Retry-After de un error del proveedor, si existe."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _take_from_bucket(
+    request_tokens: float,
+    token_tokens: float,
+    elapsed: float,
+    limits: RateLimit,
+    tokens_needed: int,
+) -> Tuple[float, float, float]:
+    """
+    Recarga ambos buckets según el tiempo transcurrido e intenta consumir una petición y
+    `tokens_needed` tokens. Devuelve (peticiones, tokens, espera); espera 0 significa concedido.
+    """
+    request_rate = limits.rpm / 60.0
+    token_rate = limits.tpm / 60.0
+    request_tokens = min(limits.rpm, request_tokens + elapsed * request_rate)
+    token_tokens = min(limits.tpm, token_tokens + elapsed * token_rate)
+    # Una petición mayor que la capacidad del bucket se limita a la capacidad para no bloquearse para siempre
+    tokens_needed = min(tokens_needed, limits.tpm)
+
+    if request_tokens >= 1 and token_tokens >= tokens_needed:
+        return request_tokens - 1, token_tokens - tokens_needed, 0.0
+
+    wait = max(
+        (1 - request_tokens) / request_rate if request_tokens < 1 else 0.0,
+        (tokens_needed - token_tokens) / token_rate if token_tokens < tokens_needed else 0.0,
+    )
+    return request_tokens, token_tokens, wait
+
+
+class LocalBucketBackend:
+    """Token buckets en memoria del proceso (un worker)."""
+
+    name = "local"
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, model_name: str, limits: RateLimit, tokens_needed: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            request_tokens, token_tokens, updated_at, blocked_until = self._buckets.get(
+                model_name, (float(limits.rpm), float(limits.tpm), now, 0.0)
+            )
+            if blocked_until > now:
+                self._buckets[model_name] = (request_tokens, token_tokens, updated_at, blocked_until)
+                return blocked_until - now
+            request_tokens, token_tokens, wait = _take_from_bucket(
+                request_tokens, token_tokens, now - updated_at, limits, tokens_needed
+            )
+            self._buckets[model_name] = (request_tokens, token_tokens, now, blocked_until)
+            return wait
+
+    def block(self, model_name: str, limits: RateLimit, seconds: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            request_tokens, token_tokens, updated_at, blocked_until = self._buckets.get(
+                model_name, (float(limits.rpm), float(limits.tpm), now, 0.0)
+            )
+            self._buckets[model_name] = (request_tokens, token_tokens, updated_at, max(blocked_until, now + seconds))
+
+    def return_tokens(self, model_name: str, limits: RateLimit, tokens: float) -> None:
+        """Devuelve al bucket `tokens` reservados de más (negativo: cobra los consumidos de menos)."""
+        with self._lock:
+            if model_name not in self._buckets:
+                return
+            request_tokens, token_tokens, updated_at, blocked_until = self._buckets[model_name]
+            self._buckets[model_name] = (
+                request_tokens, min(float(limits.tpm), token_tokens + tokens), updated_at, blocked_until
+            )
+
+
+class PostgresBucketBackend:
+    """
+    Token buckets compartidos entre workers y nodos en la tabla llm_rate_limit_buckets.
+    Cada intento bloquea la fila del modelo (SELECT ... FOR UPDATE), la recarga con el reloj
+    de la base de datos y consume en la misma transacción.
+    """
+
+    name = "postgres"
+
+    def _ensure_bucket(self, db, model_name: str, limits: RateLimit) -> None:
+        from core.models import LLMRateLimitBucket
+        db.execute(
+            pg_insert(LLMRateLimitBucket.__table__)
+            .values(model_name=model_name, request_tokens=limits.rpm, token_tokens=limits.tpm)
+            .on_conflict_do_nothing(index_elements=["model_name"])
+        )
+
+    def _locked_bucket(self, db, model_name: str):
+        from core.models import LLMRateLimitBucket
+        now = db.execute(select(func.now())).scalar_one()
+        bucket = db.query(LLMRateLimitBucket)\
+                   .filter(LLMRateLimitBucket.model_name == model_name)\
+                   .with_for_update()\
+                   .one()
+        return bucket, now
+
+    def try_acquire(self, model_name: str, limits: RateLimit, tokens_needed: int) -> float:
+        from core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            self._ensure_bucket(db, model_name, limits)
+            bucket, now = self._locked_bucket(db, model_name)
+            if bucket.blocked_until and bucket.blocked_until > now:
+                db.commit()
+                return (bucket.blocked_until - now).total_seconds()
+            elapsed = max(0.0, (now - bucket.updated_at).total_seconds())
+            bucket.request_tokens, bucket.token_tokens, wait = _take_from_bucket(
+                bucket.request_tokens, bucket.token_tokens, elapsed, limits, tokens_needed
+            )
+            bucket.updated_at = now
+            db.commit()
+            return wait
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def block(self, model_name: str, limits: RateLimit, seconds: float) -> None:
+        from core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            self._ensure_bucket(db, model_name, limits)
+            bucket, now = self._locked_bucket(db, model_name)
+            until = now + timedelta(seconds=seconds)
+            if not bucket.blocked_until or bucket.blocked_until < until:
+                bucket.blocked_until = until
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def return_tokens(self, model_name: str, limits: RateLimit, tokens: float) -> None:
+        from core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            self._ensure_bucket(db, model_name, limits)
+            bucket, _ = self._locked_bucket(db, model_name)
+            bucket.token_tokens = min(float(limits.tpm), bucket.token_tokens + tokens)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class AdaptiveConcurrency:
+    """
+    Límite de concurrencia AIMD de un modelo en este worker: crece de forma aditiva
+    (+1 por cada "ventana" de llamadas correctas) y se reduce de forma multiplicativa
+    ante 429 o timeouts.
+    """
+
+    def __init__(
+        self,
+        initial: int = settings.LLM_AIMD_INITIAL_CONCURRENCY,
+        minimum: int = settings.LLM_AIMD_MIN_CONCURRENCY,
+        maximum: int = settings.LLM_AIMD_MAX_CONCURRENCY,
+        decrease_factor: float = settings.LLM_AIMD_DECREASE_FACTOR,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.minimum, int(math.floor(self.limit)))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """Espera un hueco de concurrencia; lanza asyncio.TimeoutError si no llega en `timeout` segundos."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self.in_flight >= self.current_limit:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(waiter, remaining)
+            except BaseException:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    # Se le despertó para un hueco que ya no va a usar (cancelado o sin tiempo): pasa al siguiente
+                    self._wake_waiters()
+                raise
+        self.in_flight += 1
+
+    def release(self, overloaded: bool) -> None:
+        self.in_flight -= 1
+        if overloaded:
+            self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        free_slots = self.current_limit - self.in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free_slots -= 1
+
+
+class _ModelLimiterStats:
+    def __init__(self):
+        self.acquired = 0
+        self.throttled = 0
+        self.overloads = 0
+        self.timeouts = 0
+        self.tokens_returned = 0
+
+
+class LLMRateLimiter:
+    """
+    Gobernador de las llamadas LLM: token bucket por modelo (RPM y TPM) en el backend configurado
+    (en memoria del worker, o compartido entre workers con "postgres"), más concurrencia adaptativa
+    AIMD por modelo, que es siempre local a cada worker. Un 429 bloquea además el bucket del modelo
+    durante Retry-After (para todos los workers solo con el backend compartido).
+    """
+
+    def __init__(self, enabled: bool = settings.LLM_RATE_LIMIT_ENABLED, backend_name: str = settings.LLM_RATE_LIMIT_BACKEND):
+        self.enabled = enabled
+        self.local_backend = LocalBucketBackend()
+        self.backend = PostgresBucketBackend() if backend_name == "postgres" else self.local_backend
+        self.max_wait_seconds = settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS
+        self.concurrency_timeout = settings.LLM_AIMD_ACQUIRE_TIMEOUT_SECONDS
+        self._concurrency: Dict[str, AdaptiveConcurrency] = {}
+        self._stats: Dict[str, _ModelLimiterStats] = {}
+
+    def _get_concurrency(self, model_name: str) -> AdaptiveConcurrency:
+        concurrency = self._concurrency.get(model_name)
+        if concurrency is None:
+            concurrency = self._concurrency.setdefault(model_name, AdaptiveConcurrency())
+        return concurrency
+
+    def _get_stats(self, model_name: str) -> _ModelLimiterStats:
+        return self._stats.setdefault(model_name, _ModelLimiterStats())
+
+    async def _backend_call(self, method: str, *args) -> Any:
+        if self.backend is self.local_backend:
+            return getattr(self.local_backend, method)(*args)
+        try:
+            # El backend compartido usa la base de datos (síncrona): se ejecuta fuera del event loop.
+            return await asyncio.to_thread(getattr(self.backend, method), *args)
+        except Exception as e:
+            logger.warning(f"Backend '{self.backend.name}' del limitador no disponible ({e}); usando el limitador local.")
+            return getattr(self.local_backend, method)(*args)
+
+    async def _acquire_bucket(self, model_name: str, tokens_needed: int) -> None:
+        limits = get_rate_limit(model_name)
+        stats = self._get_stats(model_name)
+        deadline = time.monotonic() + self.max_wait_seconds
+        throttled = False
+        while True:
+            wait = await self._backend_call("try_acquire", model_name, limits, tokens_needed)
+            if wait <= 0:
+                return
+            if not throttled:
+                stats.throttled += 1
+                throttled = True
+            if time.monotonic() + wait > deadline:
+                stats.timeouts += 1
+                raise LLMRateLimitTimeoutError(
+                    f"Límite de tasa del modelo '{model_name}' alcanzado: la espera supera {self.max_wait_seconds}s."
+                )
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def limit(self, model_name: str, tokens_needed: int):
+        """
+        Espera turno (bucket RPM/TPM y hueco de concurrencia) antes de una llamada al modelo
+        y ajusta la concurrencia según el resultado. Devuelve la reserva de tokens, que el llamador
+        liquida con el uso real (`settle`) para que el bucket no pierda los tokens no consumidos.
+        """
+        limits = get_rate_limit(model_name)
+        # El bucket limita una petición mayor que su capacidad a la capacidad (ver _take_from_bucket)
+        reservation = TokenReservation(model_name=model_name, reserved_tokens=min(tokens_needed, limits.tpm))
+        if not self.enabled:
+            yield reservation
+            return
+        await self._acquire_bucket(model_name, tokens_needed)
+        concurrency = self._get_concurrency(model_name)
+        try:
+            await concurrency.acquire(self.concurrency_timeout)
+        except asyncio.TimeoutError:
+            self._get_stats(model_name).timeouts += 1
+            raise LLMRateLimitTimeoutError(
+                f"Sin hueco de concurrencia para el modelo '{model_name}' tras {self.concurrency_timeout}s en cola."
+            )
+        self._get_stats(model_name).acquired += 1
+        overloaded = False
+        try:
+            yield reservation
+        except BaseException as e:
+            overloaded = is_overload_error(e)
+            if overloaded:
+                await self.report_overload(model_name, retry_after_seconds(e))
+            raise
+        finally:
+            concurrency.release(overloaded)
+            if reservation.actual_tokens is not None:
+                await self._reconcile(reservation, limits)
+
+    async def _reconcile(self, reservation: TokenReservation, limits: RateLimit) -> None:
+        """Devuelve al bucket la diferencia entre lo reservado y lo consumido (o cobra el exceso)."""
+        difference = reservation.reserved_tokens - reservation.actual_tokens
+        if not difference:
+            return
+        try:
+            await self._backend_call("return_tokens", reservation.model_name, limits, difference)
+        except Exception as e:
+            logger.warning(f"No se pudo liquidar la reserva de tokens de '{reservation.model_name}': {e}")
+            return
+        self._get_stats(reservation.model_name).tokens_returned += difference
+
+    async def report_overload(self, model_name: str, retry_after: Optional[float] = None) -> None:
+        """Registra un 429/timeout: bloquea el bucket compartido del modelo durante el cooldown."""
+        self._get_stats(model_name).overloads += 1
+        cooldown = retry_after or settings.LLM_RATE_LIMIT_COOLDOWN_SECONDS
+        logger.warning(f"Sobrecarga del proveedor para '{model_name}': pausa de {cooldown}s y reducción de concurrencia.")
+        await self._backend_call("block", model_name, get_rate_limit(model_name), cooldown)
+
+    def get_stats(self) -> Dict[str, Any]:
+        per_model = {}
+        for model_name in set(self._concurrency) | set(self._stats):
+            concurrency = self._get_concurrency(model_name)
+            stats = self._get_stats(model_name)
+            limits = get_rate_limit(model_name)
+            per_model[model_name] = {
+                "rpm": limits.rpm,
+                "tpm": limits.tpm,
+                "concurrency_limit": concurrency.current_limit,
+                "in_flight": concurrency.in_flight,
+                "queued": concurrency.queued,
+                "acquired": stats.acquired,
+                "throttled": stats.throttled,
+                "overloads": stats.overloads,
+                "queue_timeouts": stats.timeouts,
+                "tokens_returned": stats.tokens_returned,
+            }
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "per_model": per_model,
+        }
+
+
+llm_rate_limiter = LLMRateLimiter()
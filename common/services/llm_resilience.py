@@ -0,0 +1,304 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple, TypeVar
+
+import httpx
+import openai
+
+from common.services.llm_client_registry import llm_client_registry
+from common.services.llm_rate_limiter import retry_after_seconds
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_resilience")
+
+T = TypeVar("T")
+
+_END_OF_STREAM = object()
+
+# Errores transitorios del proveedor: 429, 5xx, timeouts y fallos de conexión.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    asyncio.TimeoutError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+)
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+class _Budget:
+    """
+    Presupuesto de intentos extra de un modelo. Cada llamada primaria deposita `ratio` créditos
+    y cada reintento o cobertura gasta uno, de modo que los intentos extra no superan esa fracción
+    del tráfico. Una pequeña recarga por segundo permite reintentar aunque haya poco tráfico.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, capacity: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.balance = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.balance = min(self.capacity, self.balance + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        return False
+
+
+class _ModelResilienceStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.retry_budget_exhausted = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedge_budget_exhausted = 0
+
+
+class LLMResilience:
+    """
+    Reintentos con backoff exponencial y jitter completo para errores transitorios, y
+    peticiones de cobertura (hedging): si el primer intento no ha devuelto nada al llegar
+    al p95 observado del modelo, se lanza un segundo intento y se usa el primero que termine.
+    Reintentos y coberturas tienen cada uno su presupuesto por modelo.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = settings.LLM_RETRY_MAX_ATTEMPTS,
+        base_delay: float = settings.LLM_RETRY_BASE_DELAY_SECONDS,
+        max_delay: float = settings.LLM_RETRY_MAX_DELAY_SECONDS,
+        hedging_enabled: bool = settings.LLM_HEDGING_ENABLED,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedging_enabled = hedging_enabled
+        self._retry_budgets: Dict[str, _Budget] = {}
+        self._hedge_budgets: Dict[str, _Budget] = {}
+        self._stats: Dict[str, _ModelResilienceStats] = {}
+
+    def _get_retry_budget(self, model_name: str) -> _Budget:
+        return self._retry_budgets.setdefault(
+            model_name, _Budget(settings.LLM_RETRY_BUDGET_RATIO, settings.LLM_RESILIENCE_BUDGET_MIN_PER_SECOND)
+        )
+
+    def _get_hedge_budget(self, model_name: str) -> _Budget:
+        return self._hedge_budgets.setdefault(
+            model_name, _Budget(settings.LLM_HEDGE_BUDGET_RATIO, settings.LLM_RESILIENCE_BUDGET_MIN_PER_SECOND)
+        )
+
+    def _get_stats(self, model_name: str) -> _ModelResilienceStats:
+        return self._stats.setdefault(model_name, _ModelResilienceStats())
+
+    def backoff_delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """Espera antes del reintento `attempt` (1 = primer reintento): full jitter, respetando Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        retry_after = retry_after_seconds(exc) if exc is not None else None
+        return max(delay, retry_after or 0.0)
+
+    def hedge_delay(self, model_name: str, first_token: bool = False) -> Optional[float]:
+        """Segundos tras los que se lanza la cobertura (p95 observado), o None si no procede."""
+        if not self.hedging_enabled:
+            return None
+        p95_ms = llm_client_registry.latency_percentile(
+            model_name, 95, first_token=first_token, min_samples=settings.LLM_HEDGE_MIN_SAMPLES
+        )
+        if p95_ms is None:
+            return None
+        return max(p95_ms, settings.LLM_HEDGE_MIN_DELAY_MS) / 1000
+
+    def _start_calls(self, model_name: str) -> None:
+        self._get_stats(model_name).calls += 1
+        self._get_retry_budget(model_name).deposit()
+        self._get_hedge_budget(model_name).deposit()
+
+    async def _should_retry(self, model_name: str, attempt: int, exc: BaseException) -> bool:
+        """Decide si se reintenta tras el intento fallido `attempt` y, en ese caso, espera el backoff."""
+        if not is_retryable_error(exc) or attempt >= self.max_attempts:
+            return False
+        stats = self._get_stats(model_name)
+        if not self._get_retry_budget(model_name).try_spend():
+            stats.retry_budget_exhausted += 1
+            logger.warning(f"Presupuesto de reintentos agotado para '{model_name}'; no se reintenta.")
+            return False
+        stats.retries += 1
+        delay = self.backoff_delay(attempt, exc)
+        logger.warning(
+            f"Error transitorio del LLM '{model_name}' ({type(exc).__name__}) en el intento {attempt}; "
+            f"reintentando en {delay:.2f}s."
+        )
+        await asyncio.sleep(delay)
+        return True
+
+    def _try_hedge(self, model_name: str) -> bool:
+        stats = self._get_stats(model_name)
+        if not self._get_hedge_budget(model_name).try_spend():
+            stats.hedge_budget_exhausted += 1
+            return False
+        stats.hedges += 1
+        logger.info(f"Lanzando petición de cobertura para '{model_name}' (primer intento por encima del p95).")
+        return True
+
+    async def _race(
+        self, model_name: str, primary: "asyncio.Task", start_hedge: Callable[[], "asyncio.Task"], delay: Optional[float]
+    ) -> Tuple["asyncio.Task", Set["asyncio.Task"]]:
+        """
+        Espera al intento principal y, si supera `delay`, lanza una cobertura. Devuelve la tarea
+        ganadora (la primera en terminar con éxito, o la última en fallar) y las que siguen en curso.
+        """
+        pending: Set[asyncio.Task] = {primary}
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and self._try_hedge(model_name):
+                pending.add(start_hedge())
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in done if not task.cancelled() and task.exception() is None]
+            if succeeded or not pending:
+                winner = succeeded[0] if succeeded else done.pop()
+                if winner is not primary:
+                    self._get_stats(model_name).hedge_wins += 1
+                return winner, pending
+
+    @staticmethod
+    async def _cancel(tasks: Set["asyncio.Task"]) -> None:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _hedged_call(self, model_name: str, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        tasks: Set[asyncio.Task] = set()
+
+        def start() -> asyncio.Task:
+            task = asyncio.ensure_future(attempt_fn())
+            tasks.add(task)
+            return task
+
+        try:
+            winner, pending = await self._race(model_name, start(), start, self.hedge_delay(model_name))
+        except BaseException:
+            await self._cancel(tasks)
+            raise
+        await self._cancel(pending)
+        return winner.result()
+
+    async def call(self, model_name: str, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        """Ejecuta `attempt_fn` (un intento completo contra el proveedor) con reintentos y cobertura."""
+        self._start_calls(model_name)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self._hedged_call(model_name, attempt_fn)
+            except Exception as e:
+                if not await self._should_retry(model_name, attempt, e):
+                    raise
+
+    async def _open_stream(
+        self, model_name: str, stream_fn: Callable[[], AsyncIterator[Any]]
+    ) -> Tuple[AsyncIterator[Any], Any]:
+        """Abre el stream y espera su primer fragmento, cubriéndolo con un segundo stream si tarda más del p95."""
+        streams: Dict[asyncio.Task, AsyncIterator[Any]] = {}
+
+        async def first_chunk(stream: AsyncIterator[Any]) -> Any:
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return _END_OF_STREAM
+
+        def start() -> asyncio.Task:
+            stream = stream_fn()
+            task = asyncio.ensure_future(first_chunk(stream))
+            streams[task] = stream
+            return task
+
+        primary = start()
+        started = time.perf_counter()
+        try:
+            winner, pending = await self._race(model_name, primary, start, self.hedge_delay(model_name, first_token=True))
+        except BaseException:
+            await self._cancel(set(streams))
+            await self._close_streams(streams.values())
+            raise
+        await self._cancel(pending)
+        await self._close_streams(stream for task, stream in streams.items() if task is not winner)
+        first = winner.result()
+        llm_client_registry.record_first_token(model_name, (time.perf_counter() - started) * 1000)
+        return streams[winner], first
+
+    @staticmethod
+    async def _close_streams(streams) -> None:
+        for stream in streams:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+
+    async def stream(self, model_name: str, stream_fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Itera un stream del proveedor con reintentos y cobertura hasta el primer fragmento.
+        Una vez emitido el primer fragmento ya no se reintenta: el cliente ha recibido texto.
+        """
+        self._start_calls(model_name)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                stream, first = await self._open_stream(model_name, stream_fn)
+                break
+            except Exception as e:
+                if not await self._should_retry(model_name, attempt, e):
+                    raise
+        if first is _END_OF_STREAM:
+            return
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await self._close_streams([stream])
+
+    def get_stats(self) -> Dict[str, Any]:
+        per_model = {}
+        for model_name, stats in self._stats.items():
+            hedge_delay = self.hedge_delay(model_name)
+            per_model[model_name] = {
+                "calls": stats.calls,
+                "retries": stats.retries,
+                "retry_budget_exhausted": stats.retry_budget_exhausted,
+                "hedges": stats.hedges,
+                "hedge_wins": stats.hedge_wins,
+                "hedge_budget_exhausted": stats.hedge_budget_exhausted,
+                "hedge_delay_ms": hedge_delay * 1000 if hedge_delay is not None else None,
+            }
+        return {
+            "max_attempts": self.max_attempts,
+            "hedging_enabled": self.hedging_enabled,
+            "per_model": per_model,
+        }
+
+
+llm_resilience = LLMResilience()
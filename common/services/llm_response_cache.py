@@ -0,0 +1,116 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_response_cache")
+
+# bypass: no se lee ni se escribe la caché
+# prefer: se sirve de la caché si hay acierto; si no, se llama al LLM y se guarda la respuesta
+# only:   solo se sirve de la caché; un fallo no llama al LLM y lanza LLMCacheMissError
+CacheMode = Literal["bypass", "prefer", "only"]
+
+# Una respuesta, o la lista de variantes de una llamada con n > 1
+CachedResponse = Union[str, List[str]]
+
+
+class LLMCacheMissError(ValueError):
+    """Se lanza cuando una llamada con cache='only' no encuentra respuesta en la caché."""
+
+
+class LLMResponseCache:
+    """
+    Caché en memoria de coincidencia exacta para respuestas del LLM, con expulsión LRU
+    por tamaño y expiración por TTL. La clave es el hash SHA-256 del modelo resuelto,
+    la temperatura, max_tokens, el número de variantes y el texto exacto de los prompts system y human.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.LLM_CACHE_TTL_SECONDS,
+        enabled: bool = settings.LLM_CACHE_ENABLED,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        temperature: float,
+        max_tokens: int,
+        system_prompt: str,
+        human_prompt: str,
+        num_variants: int = 1,
+    ) -> str:
+        parts: List[Any] = [model_name, temperature, max_tokens, system_prompt, human_prompt]
+        if num_variants > 1:
+            # Solo se añade con varias variantes, para que las claves de una sola respuesta no cambien.
+            parts.append(num_variants)
+        fingerprint = json.dumps(
+            parts,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        if not self.enabled or not value:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+llm_response_cache = LLMResponseCache()
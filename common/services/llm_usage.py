@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from schemas.usage_schemas import LLMCallUsage, StepUsageSummary
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("llm_usage")
+
+
+def estimate_cost_usd(model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    Coste estimado según LLM_PRICING_PER_MILLION (USD por millón de tokens). Se usa la entrada
+    exacta del modelo o, si no existe, la de prefijo más largo ("ft:gpt-4o" para los fine-tuned).
+    """
+    pricing = settings.LLM_PRICING_PER_MILLION
+    prices = pricing.get(model_name)
+    if prices is None:
+        matches = [name for name in pricing if model_name.startswith(name)]
+        if not matches:
+            return 0.0
+        prices = pricing[max(matches, key=len)]
+    uncached_prompt_tokens = max(0, prompt_tokens - cached_tokens)
+    cost = (
+        uncached_prompt_tokens * prices.get("input", 0.0)
+        + cached_tokens * prices.get("cached_input", prices.get("input", 0.0))
+        + completion_tokens * prices.get("output", 0.0)
+    )
+    return round(cost / 1_000_000, 6)
+
+
+def usage_from_message(message: Any) -> Dict[str, int]:
+    """Extrae los tokens del usage_metadata (formato LangChain) de un mensaje o respuesta; vacío si el proveedor no lo envía."""
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+    input_details = usage_metadata.get("input_token_details") or {}
+    return {
+        "prompt_tokens": usage_metadata.get("input_tokens", 0) or 0,
+        "completion_tokens": usage_metadata.get("output_tokens", 0) or 0,
+        "cached_tokens": input_details.get("cache_read", 0) or 0,
+    }
+
+
+class UsageCollector:
+    """Acumula el uso de todas las llamadas al LLM de una generación."""
+
+    def __init__(self):
+        self.calls: List[LLMCallUsage] = []
+
+    def add(self, usage: LLMCallUsage) -> None:
+        self.calls.append(usage)
+
+    def cached_token_ratio(self) -> Optional[float]:
+        """Fracción de los tokens de prompt enviados al proveedor que este sirvió desde su caché de prompts."""
+        prompt_tokens = sum(call.prompt_tokens for call in self.calls)
+        if not prompt_tokens:
+            return None
+        return round(sum(call.cached_tokens for call in self.calls) / prompt_tokens, 4)
+
+    def per_step(self) -> List[StepUsageSummary]:
+        steps: Dict[str, StepUsageSummary] = {}
+        for call in self.calls:
+            summary = steps.setdefault(call.step, StepUsageSummary(
+                step=call.step, calls=0, prompt_tokens=0, completion_tokens=0, cached_tokens=0, latency_ms=0.0, cost_usd=0.0
+            ))
+            summary.calls += 1
+            summary.prompt_tokens += call.prompt_tokens
+            summary.completion_tokens += call.completion_tokens
+            summary.cached_tokens += call.cached_tokens
+            summary.latency_ms += call.latency_ms
+            summary.cost_usd = round(summary.cost_usd + call.cost_usd, 6)
+        return list(steps.values())
+
+
+_current_collector: ContextVar[Optional[UsageCollector]] = ContextVar("llm_usage_collector", default=None)
+
+
+@contextmanager
+def collect_llm_usage() -> Iterator[UsageCollector]:
+    """
+    Recoge el uso de las llamadas al LLM hechas dentro del bloque, incluidas las de tareas hijas
+    (asyncio.gather, single-flight), que heredan el contexto de quien las crea.
+    """
+    collector = UsageCollector()
+    token = _current_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_collector.reset(token)
+
+
+def record_llm_usage(
+    step: str,
+    model_name: str,
+    message: Any = None,
+    latency_ms: float = 0.0,
+    attempts: int = 1,
+    cache_hit: bool = False,
+) -> None:
+    """Registra una llamada en el colector activo (si no hay ninguno, no hace nada)."""
+    collector = _current_collector.get()
+    if collector is None:
+        return
+    tokens = usage_from_message(message) if message is not None else {}
+    usage = LLMCallUsage(
+        step=step,
+        model_name=model_name,
+        latency_ms=round(latency_ms, 2),
+        attempts=attempts,
+        cache_hit=cache_hit,
+        **tokens,
+    )
+    usage.cost_usd = estimate_cost_usd(model_name, usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens)
+    if usage.prompt_tokens:
+        logger.info(
+            f"Uso LLM ({step}, {model_name}): {usage.prompt_tokens} tokens de prompt, {usage.cached_tokens} cacheados "
+            f"({usage.cached_tokens / usage.prompt_tokens:.0%}), {usage.completion_tokens} de salida, {usage.latency_ms:.0f} ms."
+        )
+    collector.add(usage)
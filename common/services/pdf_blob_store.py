@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import UploadFile
+
+from common.services.pdf_extractor import PdfTooLargeError
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("pdf_blob_store")
+
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PdfBlobNotFoundError(LookupError):
+    """No hay ningún PDF almacenado con ese hash (nunca se subió o ya se expulsó)."""
+
+
+@dataclass
+class StoredPdf:
+    pdf_hash: str
+    size_bytes: int
+    filename: Optional[str] = None # Nombre con el que lo subió el usuario que pregunta (para su historial)
+    already_stored: bool = False # El mismo contenido ya estaba en el almacén: no se ha escrito nada
+
+
+class PdfBlobStore:
+    """
+    Almacén en disco de PDFs direccionado por contenido: cada documento se guarda una sola vez como
+    `<sha256>.pdf` (más un `<sha256>.json` con el nombre con el que lo subió cada usuario) y las peticiones
+    de caso de éxito lo referencian por hash en lugar de volver a enviarlo. La subida se copia por trozos de
+    `chunk_size` bytes, calculando el hash a la vez, así que la memoria por petición no depende del
+    tamaño del fichero. El tamaño total se acota expulsando los PDFs usados hace más tiempo.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.PDF_BLOB_STORE_DIR,
+        max_bytes: int = settings.PDF_BLOB_STORE_MAX_BYTES,
+        max_file_bytes: int = settings.PDF_MAX_BYTES,
+        chunk_size: int = settings.PDF_UPLOAD_CHUNK_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.chunk_size = chunk_size
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None # hash -> (bytes, último uso)
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_valid_hash(pdf_hash: str) -> bool:
+        return bool(_HASH_PATTERN.match(pdf_hash or ""))
+
+    def _blob_path(self, pdf_hash: str) -> str:
+        return os.path.join(self.directory, f"{pdf_hash}.pdf")
+
+    def _metadata_path(self, pdf_hash: str) -> str:
+        return os.path.join(self.directory, f"{pdf_hash}.json")
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        if self._index is None:
+            index = {}
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".pdf"):
+                        stat = entry.stat()
+                        index[entry.name[:-4]] = (stat.st_size, stat.st_mtime)
+            self._index = index
+        return self._index
+
+    def _touch(self, pdf_hash: str) -> None:
+        now = time.time()
+        with self._lock:
+            try:
+                os.utime(self._blob_path(pdf_hash), (now, now)) # Marca de uso para la expulsión LRU
+            except FileNotFoundError:
+                pass
+            index = self._load_index()
+            if pdf_hash in index:
+                index[pdf_hash] = (index[pdf_hash][0], now)
+
+    def _evict(self, index: Dict[str, Tuple[int, float]], keep: str) -> None:
+        if sum(size for size, _ in index.values()) <= self.max_bytes:
+            return
+        # El índice en memoria solo ve los usos de este worker: se rehace desde el disco, donde
+        # todos los workers marcan cada uso (mtime), antes de elegir qué expulsar.
+        self._index = None
+        index = self._load_index()
+        total_bytes = sum(size for size, _ in index.values())
+        for pdf_hash, (size, last_used) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total_bytes <= self.max_bytes:
+                break
+            if pdf_hash == keep:
+                continue
+            try:
+                disk_last_used = os.path.getmtime(self._blob_path(pdf_hash))
+            except FileNotFoundError: # Ya expulsado por otro worker
+                disk_last_used = None
+            if disk_last_used is not None and disk_last_used > last_used:
+                # Otro worker lo ha entregado después de leer el índice: se conserva
+                index[pdf_hash] = (size, disk_last_used)
+                continue
+            for path in (self._blob_path(pdf_hash), self._metadata_path(pdf_hash)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            del index[pdf_hash]
+            total_bytes -= size
+            self.evictions += 1
+
+    def _read_metadata(self, pdf_hash: str) -> Dict[str, Any]:
+        try:
+            with open(self._metadata_path(pdf_hash), encoding="utf-8") as metadata_file:
+                metadata = json.load(metadata_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return metadata if isinstance(metadata, dict) else {}
+
+    def _commit(self, temporary_path: str, pdf_hash: str, size_bytes: int, owner: str, filename: Optional[str]) -> bool:
+        """Mueve la subida a su ruta definitiva; devuelve False si ese contenido ya estaba almacenado."""
+        with self._lock:
+            index = self._load_index()
+            if os.path.exists(self._blob_path(pdf_hash)):
+                os.remove(temporary_path)
+                already_stored = True
+            else:
+                os.replace(temporary_path, self._blob_path(pdf_hash)) # Atómico: nadie ve un PDF a medias
+                already_stored = False
+            # El nombre del fichero es de quien lo sube: se guarda por usuario y solo se le devuelve a él
+            metadata = self._read_metadata(pdf_hash)
+            filenames = metadata.get("filenames") if isinstance(metadata.get("filenames"), dict) else {}
+            filenames[owner] = filename
+            metadata_path = self._metadata_path(pdf_hash)
+            temporary_metadata_path = f"{metadata_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_metadata_path, "w", encoding="utf-8") as metadata_file:
+                json.dump({"size_bytes": size_bytes, "filenames": filenames}, metadata_file, ensure_ascii=False)
+            os.replace(temporary_metadata_path, metadata_path)
+            index[pdf_hash] = (size_bytes, time.time())
+            self._evict(index, keep=pdf_hash)
+        if already_stored:
+            self._touch(pdf_hash)
+        return not already_stored
+
+    async def save_upload(self, upload: UploadFile, owner: str) -> StoredPdf:
+        """
+        Copia `upload` al almacén por trozos y devuelve su hash; su nombre queda asociado a `owner`.
+        Lanza PdfTooLargeError si supera `max_file_bytes` y ValueError si no es un PDF.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = os.path.join(self.directory, f".upload.{os.getpid()}.{id(upload)}.{time.monotonic_ns()}.tmp")
+        digest = hashlib.sha256()
+        size_bytes = 0
+        try:
+            with open(temporary_path, "wb") as blob_file:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if size_bytes == 0 and not chunk.startswith(b"%PDF-"):
+                        raise ValueError("El fichero subido no es un PDF.")
+                    size_bytes += len(chunk)
+                    if size_bytes > self.max_file_bytes:
+                        raise PdfTooLargeError(
+                            f"El PDF supera el máximo admitido de {self.max_file_bytes / 1024 / 1024:.0f} MB."
+                        )
+                    digest.update(chunk)
+                    await asyncio.to_thread(blob_file.write, chunk)
+            if not size_bytes:
+                raise ValueError("El fichero subido está vacío.")
+            pdf_hash = digest.hexdigest()
+            written = await asyncio.to_thread(self._commit, temporary_path, pdf_hash, size_bytes, owner, upload.filename)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self.uploads += 1
+        if written:
+            self.bytes_written += size_bytes
+            logger.info(f"PDF '{upload.filename}' almacenado como {pdf_hash[:12]} ({size_bytes} bytes).")
+        else:
+            self.deduplicated += 1
+            logger.info(f"PDF '{upload.filename}' ya estaba almacenado como {pdf_hash[:12]}: no se escribe de nuevo.")
+        return StoredPdf(pdf_hash=pdf_hash, size_bytes=size_bytes, filename=upload.filename, already_stored=not written)
+
+    def _owners(self, pdf_hash: str) -> Dict[str, Optional[str]]:
+        filenames = self._read_metadata(pdf_hash).get("filenames")
+        return filenames if isinstance(filenames, dict) else {}
+
+    def locate(self, pdf_hash: str, owner: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Devuelve (ruta, bytes) del PDF almacenado con `pdf_hash` o lanza PdfBlobNotFoundError. Con `owner`,
+        solo se entrega si ese usuario lo ha subido; para cualquier otro el PDF no existe.
+        """
+        if not self.is_valid_hash(pdf_hash):
+            raise PdfBlobNotFoundError(f"Referencia de PDF no válida: {pdf_hash}")
+        not_found = PdfBlobNotFoundError(f"No hay ningún PDF almacenado con el hash {pdf_hash}. Súbelo de nuevo.")
+        if owner is not None and owner not in self._owners(pdf_hash):
+            raise not_found # Mismo error que si no existiera: el hash no revela PDFs de otros usuarios
+        path = self._blob_path(pdf_hash)
+        try:
+            size_bytes = os.path.getsize(path)
+        except FileNotFoundError:
+            raise not_found
+        self._touch(pdf_hash)
+        return path, size_bytes
+
+    def describe(self, pdf_hash: str, owner: str) -> StoredPdf:
+        """
+        Metadatos del PDF almacenado con el nombre con el que lo subió `owner`. Lanza PdfBlobNotFoundError
+        si no existe o si `owner` no lo ha subido nunca.
+        """
+        _, size_bytes = self.locate(pdf_hash, owner)
+        filename = self._owners(pdf_hash).get(owner)
+        return StoredPdf(pdf_hash=pdf_hash, size_bytes=size_bytes, filename=filename, already_stored=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = dict(self._index or {})
+        return {
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "bytes_written": self.bytes_written,
+            "evictions": self.evictions,
+            "blobs": len(index) if self._index is not None else None,
+            "bytes": sum(size for size, _ in index.values()) if self._index is not None else None,
+            "max_bytes": self.max_bytes,
+            "chunk_size": self.chunk_size,
+        }
+
+
+pdf_blob_store = PdfBlobStore()
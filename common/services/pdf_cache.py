@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("pdf_cache")
+
+
+class PdfResultCache:
+    """
+    Caché persistente y direccionada por contenido de los resultados de procesar un PDF de caso de
+    éxito: el texto extraído (clave: hash del PDF + versión de la normalización) y el borrador
+    narrativo de la transformación (clave: hash del PDF + versión de la transformación, que cambia
+    con los prompts, el modelo o los parámetros de la transformación). Un fichero JSON por entrada en
+    `directory`, compartido entre workers y reinicios; las entradas no caducan (el contenido de una
+    clave no cambia) y el tamaño total se acota expulsando las usadas hace más tiempo.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.PDF_CACHE_DIR,
+        max_bytes: int = settings.PDF_CACHE_MAX_BYTES,
+        enabled: bool = settings.PDF_CACHE_ENABLED,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None # fichero -> (bytes, último uso)
+        self.text_hits = 0
+        self.text_misses = 0
+        self.transform_hits = 0
+        self.transform_misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock() # Las lecturas y escrituras corren en hilos (asyncio.to_thread)
+
+    @staticmethod
+    def _text_filename(pdf_hash: str, version: str) -> str:
+        return f"{pdf_hash}.text.{version}.json"
+
+    @staticmethod
+    def _transform_filename(pdf_hash: str, version: str) -> str:
+        return f"{pdf_hash}.transform.{version}.json"
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        if self._index is None:
+            index = {}
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        index[entry.name] = (stat.st_size, stat.st_mtime)
+            self._index = index
+        return self._index
+
+    def _read(self, filename: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(filename), encoding="utf-8") as cache_file:
+                entry = json.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Entrada de caché de PDF ilegible ({filename}): {e}")
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                os.utime(self._path(filename), (now, now)) # Marca de uso para la expulsión LRU
+            except FileNotFoundError: # Expulsada por otro worker entre la lectura y la marca
+                pass
+            index = self._load_index()
+            if filename in index:
+                index[filename] = (index[filename][0], now)
+        return entry
+
+    def _write(self, filename: str, entry: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = f"{self._path(filename)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(entry, cache_file, ensure_ascii=False)
+        with self._lock:
+            os.replace(temporary_path, self._path(filename)) # Escritura atómica: otro worker nunca lee un fichero a medias
+            index = self._load_index()
+            index[filename] = (os.path.getsize(self._path(filename)), time.time())
+            self._evict(index)
+
+    def _evict(self, index: Dict[str, Tuple[int, float]]) -> None:
+        total_bytes = sum(size for size, _ in index.values())
+        for filename, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(filename))
+            except FileNotFoundError:
+                pass
+            del index[filename]
+            total_bytes -= size
+            self.evictions += 1
+
+    async def _get(self, filename: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        entry = await asyncio.to_thread(self._read, filename)
+        return entry if entry and isinstance(entry.get("text"), str) else None
+
+    async def _put(self, filename: str, entry: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._write, filename, {**entry, "created_at": time.time()})
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en la caché de PDFs ({filename}): {e}")
+
+    async def get_text(self, pdf_hash: str, version: str) -> Optional[Dict[str, Any]]:
+        """Entrada del texto extraído: "text" y las métricas guardadas con él (páginas, ahorro de la normalización)."""
+        entry = await self._get(self._text_filename(pdf_hash, version))
+        if self.enabled:
+            if entry is None:
+                self.text_misses += 1
+            else:
+                self.text_hits += 1
+        return entry
+
+    async def put_text(self, pdf_hash: str, version: str, text: str, metrics: Dict[str, int]) -> None:
+        await self._put(self._text_filename(pdf_hash, version), {**metrics, "text": text})
+
+    async def get_transformation(self, pdf_hash: str, version: str) -> Optional[str]:
+        entry = await self._get(self._transform_filename(pdf_hash, version))
+        if self.enabled:
+            if entry is None:
+                self.transform_misses += 1
+            else:
+                self.transform_hits += 1
+        return entry["text"] if entry else None
+
+    async def put_transformation(self, pdf_hash: str, version: str, text: str) -> None:
+        await self._put(self._transform_filename(pdf_hash, version), {"text": text, "version": version})
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = dict(self._index or {})
+        return {
+            "enabled": self.enabled,
+            "text_hits": self.text_hits,
+            "text_misses": self.text_misses,
+            "transform_hits": self.transform_hits,
+            "transform_misses": self.transform_misses,
+            "evictions": self.evictions,
+            "entries": len(index) if self._index is not None else None,
+            "bytes": sum(size for size, _ in index.values()) if self._index is not None else None,
+            "max_bytes": self.max_bytes,
+        }
+
+
+pdf_result_cache = PdfResultCache()
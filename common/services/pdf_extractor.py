@@ -0,0 +1,266 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.services.context_budget import context_budget_manager
+from common.utils.pdf_normalization import NormalizedPdfText, normalize_pdf_pages
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("pdf_extractor")
+
+
+class PdfTooLargeError(ValueError):
+    """El PDF supera PDF_MAX_BYTES."""
+
+
+class PdfExtractionOverloadedError(RuntimeError):
+    """No hay memoria de parseo disponible dentro del plazo de admisión: el servidor está saturado de PDFs."""
+
+
+@dataclass
+class PdfExtractionResult:
+    text: str
+    page_count: int # Páginas del documento
+    pages_extracted: int # Páginas extraídas (menos que page_count si se aplicó PDF_MAX_PAGES)
+    raw_chars: int = 0 # Caracteres antes de la normalización
+    removed_lines: int = 0 # Cabeceras, pies y números de página eliminados por la normalización
+    dehyphenated: int = 0 # Palabras cortadas con guion unidas por la normalización
+    tokens_saved: Optional[int] = None # Tokens ahorrados por la normalización (si se indicó un modelo)
+
+    @property
+    def truncated(self) -> bool:
+        return self.pages_extracted < self.page_count
+
+    @property
+    def chars_saved(self) -> int:
+        return max(0, self.raw_chars - len(self.text))
+
+
+# Funciones ejecutadas en los procesos del pool: reciben la ruta del PDF (no sus bytes) para no copiar
+# el documento entero en cada tarea; el fichero se lee desde la caché de páginas del sistema operativo.
+def _count_pdf_pages(path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_pdf_page_range(path: str, start: int, end: int) -> List[str]:
+    from PyPDF2 import PdfReader
+
+    pages = PdfReader(path).pages
+    return [pages[index].extract_text() or "" for index in range(start, end)]
+
+
+class _MemoryAdmission:
+    """Semáforo ponderado por bytes: cada parseo reserva su memoria estimada y espera (o se rechaza) si no cabe."""
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.in_use_bytes = 0
+        self.waiting = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, size: int, timeout: float) -> int:
+        # Un documento mayor que el límite entero se admite solo, cuando no hay ningún otro en curso
+        size = min(size, self.limit_bytes)
+        condition = self._get_condition()
+        async with condition:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.in_use_bytes + size <= self.limit_bytes), timeout
+                )
+            finally:
+                self.waiting -= 1
+            self.in_use_bytes += size
+        return size
+
+    async def release(self, size: int) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_use_bytes -= size
+            condition.notify_all()
+
+
+class PdfExtractor:
+    """
+    Extracción de texto de PDFs fuera del event loop, en un pool de procesos acotado: el documento se
+    escribe una vez en un fichero temporal y sus páginas se reparten en rangos que se extraen en
+    paralelo; el texto se une al final con un único join. Antes de parsear, cada PDF reserva memoria
+    estimada (bytes x PDF_PARSE_MEMORY_FACTOR); si no cabe en PDF_MAX_INFLIGHT_MEMORY_MB espera su turno
+    hasta PDF_ADMISSION_TIMEOUT_SECONDS y después se rechaza.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PDF_PROCESS_POOL_WORKERS,
+        pages_per_task: int = settings.PDF_PAGES_PER_TASK,
+        max_pages: int = settings.PDF_MAX_PAGES,
+        max_bytes: int = settings.PDF_MAX_BYTES,
+        memory_factor: float = settings.PDF_PARSE_MEMORY_FACTOR,
+        max_inflight_memory_mb: int = settings.PDF_MAX_INFLIGHT_MEMORY_MB,
+        admission_timeout: float = settings.PDF_ADMISSION_TIMEOUT_SECONDS,
+        normalize: bool = settings.PDF_NORMALIZE_TEXT,
+    ):
+        self.workers = workers
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.memory_factor = memory_factor
+        self.admission_timeout = admission_timeout
+        self.normalize = normalize
+        self._admission = _MemoryAdmission(max_inflight_memory_mb * 1024 * 1024)
+        self._executor: Optional[Executor] = None
+        self.documents = 0
+        self.pages = 0
+        self.truncated_documents = 0
+        self.rejected_too_large = 0
+        self.rejected_overloaded = 0
+        self.chars_saved = 0
+        self.tokens_saved = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                # "spawn": los procesos no heredan hilos ni conexiones del servidor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf")
+            logger.info(f"Pool de extracción de PDF creado ({self.workers or 'hilos'} workers).")
+        return self._executor
+
+    async def _run(self, func: Any, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+
+    def _check_size(self, size_bytes: int) -> None:
+        if size_bytes > self.max_bytes:
+            self.rejected_too_large += 1
+            raise PdfTooLargeError(
+                f"El PDF ocupa {size_bytes / 1024 / 1024:.1f} MB; el máximo admitido es {self.max_bytes / 1024 / 1024:.0f} MB."
+            )
+
+    async def _normalize(
+        self, page_texts: List[str], token_model: Optional[str]
+    ) -> Tuple[NormalizedPdfText, Optional[int]]:
+        """Normaliza el texto (en el pool: necesita todas las páginas) y mide los tokens ahorrados."""
+        normalized = await self._run(normalize_pdf_pages, page_texts)
+        if not token_model:
+            return normalized, None
+        raw_text = "\n".join(page_texts)
+        tokens_saved = await asyncio.to_thread(
+            lambda: context_budget_manager.count_tokens(raw_text, token_model)
+            - context_budget_manager.count_tokens(normalized.text, token_model)
+        )
+        return normalized, tokens_saved
+
+    async def extract_text_from_path(
+        self, path: str, size_bytes: int, token_model: Optional[str] = None
+    ) -> PdfExtractionResult:
+        """
+        Extrae el texto de un PDF ya en disco, con admisión por memoria. Con `token_model` se mide
+        también el ahorro de tokens de la normalización para ese modelo.
+        """
+        self._check_size(size_bytes)
+        try:
+            reserved = await self._admission.acquire(int(size_bytes * self.memory_factor), self.admission_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_overloaded += 1
+            raise PdfExtractionOverloadedError(
+                "Demasiados PDFs en proceso en este momento. Inténtalo de nuevo en unos segundos."
+            )
+        try:
+            page_count = await self._run(_count_pdf_pages, path)
+            pages_to_extract = min(page_count, self.max_pages)
+            ranges = [
+                (start, min(start + self.pages_per_task, pages_to_extract))
+                for start in range(0, pages_to_extract, self.pages_per_task)
+            ]
+            page_groups = await asyncio.gather(*(self._run(_extract_pdf_page_range, path, start, end) for start, end in ranges))
+        finally:
+            await self._admission.release(reserved)
+
+        page_texts = [page_text for group in page_groups for page_text in group]
+        if self.normalize:
+            normalized, tokens_saved = await self._normalize(page_texts, token_model)
+            result = PdfExtractionResult(
+                text=normalized.text,
+                page_count=page_count,
+                pages_extracted=pages_to_extract,
+                raw_chars=normalized.raw_chars,
+                removed_lines=normalized.removed_lines,
+                dehyphenated=normalized.dehyphenated,
+                tokens_saved=tokens_saved,
+            )
+            self.chars_saved += result.chars_saved
+            self.tokens_saved += result.tokens_saved or 0
+            saved_percent = 100 * result.chars_saved / max(result.raw_chars, 1)
+            logger.info(
+                f"Normalización del PDF: {result.chars_saved} caracteres ({saved_percent:.1f}%) y "
+                f"{result.tokens_saved if result.tokens_saved is not None else '?'} tokens ahorrados; "
+                f"{result.removed_lines} líneas de cabecera/pie eliminadas, {result.dehyphenated} guiones de corte unidos."
+            )
+        else:
+            text = "\n".join(page_text for page_text in page_texts if page_text).strip()
+            result = PdfExtractionResult(
+                text=text, page_count=page_count, pages_extracted=pages_to_extract, raw_chars=len(text)
+            )
+        self.documents += 1
+        self.pages += pages_to_extract
+        if result.truncated:
+            self.truncated_documents += 1
+            logger.warning(f"PDF de {page_count} páginas: solo se extraen las primeras {pages_to_extract} (PDF_MAX_PAGES).")
+        logger.info(f"Texto extraído de PDF con {page_count} páginas en {len(ranges)} tarea(s).")
+        return result
+
+    async def extract_text(self, pdf_bytes: bytes, token_model: Optional[str] = None) -> PdfExtractionResult:
+        """Extrae el texto de un PDF recibido en memoria (se vuelca a un fichero temporal para los workers)."""
+        self._check_size(len(pdf_bytes))
+        path = await asyncio.to_thread(self._write_temporary, pdf_bytes)
+        try:
+            return await self.extract_text_from_path(path, len(pdf_bytes), token_model)
+        finally:
+            await asyncio.to_thread(os.remove, path)
+
+    @staticmethod
+    def _write_temporary(pdf_bytes: bytes) -> str:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temporary_file:
+            temporary_file.write(pdf_bytes)
+            return temporary_file.name
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pages_per_task": self.pages_per_task,
+            "max_pages": self.max_pages,
+            "documents": self.documents,
+            "pages": self.pages,
+            "truncated_documents": self.truncated_documents,
+            "normalize": self.normalize,
+            "chars_saved": self.chars_saved,
+            "tokens_saved": self.tokens_saved,
+            "rejected_too_large": self.rejected_too_large,
+            "rejected_overloaded": self.rejected_overloaded,
+            "inflight_memory_mb": round(self._admission.in_use_bytes / 1024 / 1024, 2),
+            "inflight_memory_limit_mb": round(self._admission.limit_bytes / 1024 / 1024, 2),
+            "waiting": self._admission.waiting,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_extractor = PdfExtractor()
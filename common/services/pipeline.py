@@ -0,0 +1,147 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from common.utils.stats import percentile
+from core.logger import get_logger
+
+logger = get_logger("pipeline")
+
+
+@dataclass
+class PipelineStep:
+    """Paso del pipeline: recibe como argumentos con nombre los resultados de los pasos de los que depende."""
+    name: str
+    func: Callable[..., Any]
+    depends_on: Tuple[str, ...] = ()
+    blocking: bool = False # Función síncrona costosa (E/S, parseo): se ejecuta en un hilo para no bloquear el event loop
+
+
+@dataclass
+class PipelineResult:
+    results: Dict[str, Any]
+    timings_ms: Dict[str, float] # Duración de cada paso ejecutado
+    total_ms: float
+    reused: List[str] = field(default_factory=list) # Pasos no ejecutados porque su resultado ya se aportó
+
+
+class Pipeline:
+    """
+    Ejecutor de pasos con dependencias (grafo acíclico). Cada paso arranca en cuanto terminan
+    los pasos de los que depende, así que los pasos independientes corren en paralelo sin que el
+    agente tenga que orquestarlos. Cada paso se cronometra y los resultados intermedios quedan
+    disponibles en el resultado; los que se pasan ya calculados a `run` no se repiten.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps: Dict[str, PipelineStep] = {}
+
+    def add(
+        self, name: str, func: Callable[..., Any], depends_on: Iterable[str] = (), blocking: bool = False
+    ) -> "Pipeline":
+        if name in self.steps:
+            raise ValueError(f"[{self.name}] Paso '{name}' duplicado en el pipeline.")
+        self.steps[name] = PipelineStep(name=name, func=func, depends_on=tuple(depends_on), blocking=blocking)
+        return self
+
+    def _validate(self, available: Iterable[str]) -> None:
+        known = set(self.steps) | set(available)
+        for step in self.steps.values():
+            missing = [dependency for dependency in step.depends_on if dependency not in known]
+            if missing:
+                raise ValueError(f"[{self.name}] El paso '{step.name}' depende de pasos inexistentes: {missing}")
+        # Detección de ciclos: se van retirando los pasos cuyas dependencias ya están resueltas
+        resolved = set(available)
+        remaining = {name: step for name, step in self.steps.items() if name not in resolved}
+        while remaining:
+            ready = [name for name, step in remaining.items() if all(dep in resolved for dep in step.depends_on)]
+            if not ready:
+                raise ValueError(f"[{self.name}] Dependencias cíclicas entre los pasos: {sorted(remaining)}")
+            resolved.update(ready)
+            for name in ready:
+                del remaining[name]
+
+    async def _run_step(self, step: PipelineStep, results: Dict[str, Any]) -> Tuple[Any, float]:
+        kwargs = {dependency: results[dependency] for dependency in step.depends_on}
+        started = time.perf_counter()
+        if step.blocking:
+            value = await asyncio.to_thread(step.func, **kwargs)
+        else:
+            value = step.func(**kwargs)
+            if inspect.isawaitable(value):
+                value = await value
+        return value, (time.perf_counter() - started) * 1000
+
+    async def run(self, results: Optional[Dict[str, Any]] = None) -> PipelineResult:
+        """Ejecuta los pasos pendientes. `results` aporta resultados ya calculados (se reutilizan, no se repiten)."""
+        results = dict(results or {})
+        self._validate(results)
+        reused = [name for name in self.steps if name in results]
+        pending = {name: step for name, step in self.steps.items() if name not in results}
+        running: Dict["asyncio.Task[Tuple[Any, float]]", str] = {}
+        timings_ms: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        try:
+            while pending or running:
+                for name in [name for name, step in pending.items() if all(dep in results for dep in step.depends_on)]:
+                    running[asyncio.ensure_future(self._run_step(pending.pop(name), results))] = name
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    results[name], timings_ms[name] = task.result() # Relanza la excepción del paso si falló
+                    pipeline_stats.record(self.name, name, timings_ms[name])
+        finally:
+            # Si un paso falla (o se cancela la petición), los que siguen en curso no deben quedar huérfanos
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        total_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"[{self.name}] Pipeline completado en {total_ms:.0f} ms. Pasos: "
+            + ", ".join(f"{name}={elapsed:.0f}ms" for name, elapsed in timings_ms.items())
+            + (f". Reutilizados: {reused}" if reused else "")
+        )
+        return PipelineResult(
+            results=results,
+            timings_ms={name: round(elapsed, 2) for name, elapsed in timings_ms.items()},
+            total_ms=round(total_ms, 2),
+            reused=reused
+        )
+
+
+class PipelineStats:
+    """Duraciones recientes de cada paso, por pipeline, para localizar dónde se va el tiempo."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._durations_ms: Dict[str, Dict[str, Deque[float]]] = {}
+        self._runs: Dict[str, Dict[str, int]] = {}
+
+    def record(self, pipeline_name: str, step_name: str, elapsed_ms: float) -> None:
+        durations = self._durations_ms.setdefault(pipeline_name, {})
+        durations.setdefault(step_name, deque(maxlen=self.window)).append(elapsed_ms)
+        runs = self._runs.setdefault(pipeline_name, {})
+        runs[step_name] = runs.get(step_name, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        for pipeline_name, steps in self._durations_ms.items():
+            stats[pipeline_name] = {}
+            for step_name, durations in steps.items():
+                ordered = sorted(durations)
+                stats[pipeline_name][step_name] = {
+                    "runs": self._runs[pipeline_name][step_name],
+                    "p50_ms": percentile(ordered, 50, ndigits=2),
+                    "p95_ms": percentile(ordered, 95, ndigits=2),
+                }
+        return stats
+
+
+pipeline_stats = PipelineStats()
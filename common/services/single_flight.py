@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("single_flight")
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas idénticas en curso ("single-flight").
+
+    La primera corrutina que pide una clave lanza la operación; las que llegan mientras
+    sigue en curso esperan ese mismo resultado (o excepción) en lugar de repetirla.
+    La operación compartida corre en su propia tarea, así que la cancelación de un
+    solicitante no cancela la operación para el resto.
+    """
+
+    def __init__(self, name: str, enabled: bool = settings.SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._in_flight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, operation: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await operation()
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(operation())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _task: self._forget(key, _task))
+        else:
+            self.coalesced += 1
+            logger.info(f"[{self.name}] Petición idéntica en curso: esperando el resultado compartido.")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Consumir la excepción si ya no queda nadie esperando, para evitar avisos de asyncio
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# Coalescencia de llamadas idénticas al LLM (misma huella de prompt y parámetros)
+llm_single_flight = SingleFlight("llm")
+# Coalescencia de generaciones idénticas del mismo usuario (evita filas duplicadas en el historial)
+generation_single_flight = SingleFlight("generation")
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("url_cache")
+
+
+@dataclass
+class CachedPage:
+    url: str
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0 # Última descarga completa
+    validated_at: float = 0.0 # Última vez que el origen confirmó el contenido (descarga o 304)
+
+    def is_fresh(self, ttl_seconds: float) -> bool:
+        return time.time() - self.validated_at < ttl_seconds
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Cabeceras para revalidar con un GET condicional (respuesta 304 si no ha cambiado)."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class UrlContentCache:
+    """
+    Caché persistente del texto limpio de las URLs de investigación: un fichero JSON por URL en
+    `directory`, compartido entre workers y reinicios. Dentro del TTL la entrada se sirve sin red;
+    después se revalida con If-None-Match/If-Modified-Since y un 304 la renueva sin volver a
+    descargar ni parsear. El tamaño total se acota expulsando las entradas usadas hace más tiempo
+    (la fecha de modificación del fichero se actualiza en cada acierto).
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.URL_CACHE_DIR,
+        ttl_seconds: float = settings.URL_CACHE_TTL_SECONDS,
+        max_bytes: int = settings.URL_CACHE_MAX_BYTES,
+        enabled: bool = settings.URL_CACHE_ENABLED,
+    ):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None # fichero -> (bytes, último uso)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.evictions = 0
+        self._lock = threading.Lock() # Las lecturas y escrituras corren en hilos (asyncio.to_thread)
+
+    @staticmethod
+    def _filename(url: str) -> str:
+        return f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        if self._index is None:
+            index = {}
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        index[entry.name] = (stat.st_size, stat.st_mtime)
+            self._index = index
+        return self._index
+
+    def _read(self, url: str) -> Optional[CachedPage]:
+        filename = self._filename(url)
+        try:
+            with open(self._path(filename), encoding="utf-8") as cache_file:
+                page = CachedPage(**json.load(cache_file))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Entrada de caché de URL ilegible para {url}: {e}")
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                os.utime(self._path(filename), (now, now)) # Marca de uso para la expulsión LRU
+            except FileNotFoundError: # Expulsada por otro worker entre la lectura y la marca
+                pass
+            index = self._load_index()
+            if filename in index:
+                index[filename] = (index[filename][0], now)
+        return page
+
+    def _write(self, page: CachedPage) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self._filename(page.url)
+        temporary_path = f"{self._path(filename)}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(asdict(page), cache_file, ensure_ascii=False)
+        with self._lock:
+            os.replace(temporary_path, self._path(filename)) # Escritura atómica: otro worker nunca lee un fichero a medias
+            index = self._load_index()
+            index[filename] = (os.path.getsize(self._path(filename)), time.time())
+            self._evict(index)
+
+    def _evict(self, index: Dict[str, Tuple[int, float]]) -> None:
+        total_bytes = sum(size for size, _ in index.values())
+        for filename, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(filename))
+            except FileNotFoundError:
+                pass
+            del index[filename]
+            total_bytes -= size
+            self.evictions += 1
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._read, url)
+
+    async def put(self, url: str, text: str, headers: Any) -> None:
+        """Guarda el texto extraído con los validadores de la respuesta (salvo Cache-Control: no-store)."""
+        if not self.enabled or "no-store" in (headers.get("cache-control") or "").lower():
+            return
+        now = time.time()
+        page = CachedPage(
+            url=url,
+            text=text,
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            fetched_at=now,
+            validated_at=now,
+        )
+        try:
+            await asyncio.to_thread(self._write, page)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en caché el contenido de {url}: {e}")
+
+    async def mark_revalidated(self, page: CachedPage, headers: Any) -> None:
+        """El origen respondió 304: se renueva la entrada (y sus validadores, si vienen) sin tocar el texto."""
+        page.validated_at = time.time()
+        page.etag = headers.get("etag") or page.etag
+        page.last_modified = headers.get("last-modified") or page.last_modified
+        try:
+            await asyncio.to_thread(self._write, page)
+        except OSError as e:
+            logger.warning(f"No se pudo renovar la entrada de caché de {page.url}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = dict(self._index or {})
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "evictions": self.evictions,
+            "entries": len(index) if self._index is not None else None,
+            "bytes": sum(size for size, _ in index.values()) if self._index is not None else None,
+            "max_bytes": self.max_bytes,
+        }
+
+
+url_content_cache = UrlContentCache()
@@ -0,0 +1,251 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from common.services.url_cache import UrlContentCache, url_content_cache
+from common.utils.helpers import extract_text_from_html
+from core.logger import get_logger
+from core.config import settings
+
+logger = get_logger("url_fetcher")
+
+_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/91.0.4472.124 Safari/537.36"
+)
+_TEXT_CONTENT_TYPES = ("html", "xml", "text/plain")
+
+
+class UrlFetchError(Exception):
+    """La URL no se pudo descargar como página de texto (red, estado HTTP, tipo de contenido, redirecciones...)."""
+
+
+@dataclass
+class FetchedPage:
+    url: str # URL pedida
+    final_url: str # URL tras las redirecciones
+    status_code: int
+    headers: httpx.Headers
+    body: bytes
+    truncated: bool # El cuerpo superaba max_bytes y se cortó
+    charset: Optional[str] = None
+
+
+def _decode_and_extract(body: bytes, charset: Optional[str], source: str) -> Optional[str]:
+    """Decodifica y limpia el HTML (CPU): se ejecuta en un hilo para no bloquear el event loop."""
+    try:
+        content = body.decode(charset or "utf-8")
+    except (UnicodeDecodeError, LookupError):
+        content = body.decode("utf-8", errors="replace")
+    return extract_text_from_html(content, source)
+
+
+class UrlFetcher:
+    """
+    Descarga asíncrona de páginas para la investigación web, sobre un único `httpx.AsyncClient`
+    (HTTP/2 y keep-alive) compartido por todas las peticiones. Limita las descargas simultáneas
+    por host, aplica un plazo por URL (y opcionalmente uno global de la petición), corta el cuerpo
+    al superar `max_bytes` mientras se recibe y sigue como mucho `max_redirects` redirecciones.
+    El parseo del HTML se hace en un hilo.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = settings.URL_FETCH_TIMEOUT_SECONDS,
+        max_bytes: int = settings.URL_FETCH_MAX_BYTES,
+        max_redirects: int = settings.URL_FETCH_MAX_REDIRECTS,
+        per_host_limit: int = settings.URL_FETCH_PER_HOST_LIMIT,
+        max_connections: int = settings.URL_FETCH_MAX_CONNECTIONS,
+        http2: bool = settings.URL_FETCH_HTTP2,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.per_host_limit = per_host_limit
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self.fetches = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.truncated = 0
+        self.redirects = 0
+        self.bytes_downloaded = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            http2 = self._http2
+            if http2:
+                try:
+                    import h2 # noqa: F401  (requisito de httpx para HTTP/2)
+                except ImportError:
+                    logger.warning("Paquete 'h2' no instalado: las descargas de URLs usarán HTTP/1.1.")
+                    http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                limits=self._limits,
+                timeout=self.timeout_seconds,
+                follow_redirects=False, # Las redirecciones se siguen a mano, respetando el límite por host en cada salto
+                headers={"User-Agent": _USER_AGENT},
+            )
+        return self._client
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphore
+
+    async def _read_limited(self, response: httpx.Response) -> "tuple[bytes, bool]":
+        body = bytearray()
+        async for data in response.aiter_bytes():
+            body += data
+            if len(body) > self.max_bytes:
+                return bytes(body[:self.max_bytes]), True
+        return bytes(body), False
+
+    async def _download(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchedPage:
+        client = self._get_client()
+        current = httpx.URL(url)
+        for _ in range(self.max_redirects + 1):
+            if current.scheme not in ("http", "https"):
+                raise UrlFetchError(f"Esquema no soportado: {current.scheme}")
+            host = current.host
+            async with self._host_semaphore(host):
+                self._in_flight[host] = self._in_flight.get(host, 0) + 1
+                try:
+                    response = await client.send(client.build_request("GET", current, headers=headers), stream=True)
+                    try:
+                        if response.is_redirect and response.headers.get("location"):
+                            self.redirects += 1
+                            current = current.join(response.headers["location"])
+                            continue
+                        if response.status_code != 304:
+                            response.raise_for_status()
+                            content_type = response.headers.get("content-type", "").lower()
+                            if content_type and not any(kind in content_type for kind in _TEXT_CONTENT_TYPES):
+                                raise UrlFetchError(f"Tipo de contenido no soportado: {content_type}")
+                        body, truncated = await self._read_limited(response)
+                        self.bytes_downloaded += len(body)
+                        return FetchedPage(
+                            url=url,
+                            final_url=str(current),
+                            status_code=response.status_code,
+                            headers=response.headers,
+                            body=body,
+                            truncated=truncated,
+                            charset=response.charset_encoding,
+                        )
+                    finally:
+                        await response.aclose()
+                finally:
+                    self._in_flight[host] -= 1
+                    if not self._in_flight[host]:
+                        del self._in_flight[host]
+        raise UrlFetchError(f"Demasiadas redirecciones (más de {self.max_redirects})")
+
+    def _timeout_for(self, deadline: Optional[float]) -> float:
+        if deadline is None:
+            return self.timeout_seconds
+        return max(0.0, min(self.timeout_seconds, deadline - time.monotonic()))
+
+    async def fetch(
+        self, url: str, deadline: Optional[float] = None, headers: Optional[Dict[str, str]] = None
+    ) -> FetchedPage:
+        """
+        Descarga `url` dentro del plazo por URL y, si se indica, del plazo global `deadline`
+        (instante de time.monotonic()). Lanza UrlFetchError o asyncio.TimeoutError si no lo consigue.
+        """
+        timeout = self._timeout_for(deadline)
+        if timeout <= 0:
+            self.timeouts += 1
+            raise asyncio.TimeoutError(f"Plazo de descarga agotado antes de empezar con {url}")
+        self.fetches += 1
+        try:
+            page = await asyncio.wait_for(self._download(url, headers), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except httpx.HTTPError as e:
+            self.errors += 1
+            raise UrlFetchError(str(e) or type(e).__name__) from e
+        except UrlFetchError:
+            self.errors += 1
+            raise
+        if page.truncated:
+            self.truncated += 1
+            logger.warning(f"Página de {url} recortada a {self.max_bytes} bytes.")
+        return page
+
+    async def extract_text(self, page: FetchedPage) -> Optional[str]:
+        return await asyncio.to_thread(_decode_and_extract, page.body, page.charset, page.final_url)
+
+    async def fetch_text(
+        self, url: str, deadline: Optional[float] = None, cache: Optional[UrlContentCache] = url_content_cache
+    ) -> Optional[str]:
+        """
+        Devuelve el texto limpio de `url`, o None si falla (el error se registra). Con caché: dentro del TTL
+        no hay red; después se revalida con un GET condicional y un 304 reutiliza el texto guardado.
+        """
+        cached = await cache.get(url) if cache is not None else None
+        if cached is not None and cached.is_fresh(cache.ttl_seconds):
+            cache.hits += 1
+            logger.info(f"Contenido de {url} servido desde la caché de URLs.")
+            return cached.text
+
+        try:
+            page = await self.fetch(url, deadline, cached.conditional_headers() if cached is not None else None)
+        except (asyncio.TimeoutError, UrlFetchError) as e:
+            reason = "tiempo agotado" if isinstance(e, asyncio.TimeoutError) else str(e).splitlines()[0]
+            if cached is not None and settings.URL_CACHE_STALE_IF_ERROR:
+                cache.stale_served += 1
+                logger.warning(f"Fallo al descargar la URL {url} ({reason}); se usa la copia caducada de la caché.")
+                return cached.text
+            logger.error(f"Fallo al descargar la URL {url} ({reason})")
+            return None
+
+        if page.status_code == 304 and cached is not None:
+            cache.revalidated += 1
+            await cache.mark_revalidated(cached, page.headers)
+            logger.info(f"Contenido de {url} revalidado (304): se reutiliza la copia de la caché.")
+            return cached.text
+
+        try:
+            text = await self.extract_text(page)
+        except Exception as e:
+            logger.error(f"Error al extraer el contenido de la URL {url}: {e}", exc_info=True)
+            return None
+        if cache is not None:
+            cache.misses += 1
+            # Una página recortada no se guarda: sus validadores describen el cuerpo completo, así que un
+            # 304 posterior daría por buena para siempre una copia incompleta.
+            if text and not page.truncated:
+                await cache.put(url, text, page.headers)
+        return text
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self._http2,
+            "per_host_limit": self.per_host_limit,
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "truncated": self.truncated,
+            "redirects": self.redirects,
+            "bytes_downloaded": self.bytes_downloaded,
+            "in_flight_by_host": dict(self._in_flight),
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_semaphores.clear()
+
+
+url_fetcher = UrlFetcher()
@@ -2,17 +2,19 @@
 # (El resto de funciones se mantienen como estaban)
 
 import requests
-from typing import List, Optional # Dict, Any ya no se usan aquí
-# import json # No se usa
+from typing import Any, List, Optional, Tuple # Dict ya no se usa aquí
+import json
 from io import BytesIO
 import re
+import unicodedata
 # from pathlib import Path # No se usa
 # import tempfile # No se usa directamente save_temp_file
 # import os # No se usa directamente clean_temp_file
 
 from PyPDF2 import PdfReader # Corregido el import si era PdfReader
+from common.utils.html_extraction import extract_main_text
 from core.logger import get_logger
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.config import settings
 
 logger = get_logger("helpers")
 
@@ -22,14 +24,14 @@ def extract_text_from_pdf(pdf_bytes: bytes) -> str:
         pdf_file = BytesIO(pdf_bytes)
         pdf_reader = PdfReader(pdf_file) # Usar PdfReader
         
-        text = ""
+        page_texts = []
         for page in pdf_reader.pages:
             page_text = page.extract_text()
             if page_text: # Asegurarse que hay texto antes de añadir
-                text += page_text + "\n"
+                page_texts.append(page_text)
         
         logger.info(f"Texto extraído de PDF con {len(pdf_reader.pages)} páginas.")
-        return text.strip() # Quitar saltos de línea extra al final
+        return "\n".join(page_texts).strip() # Un único join: concatenar en el bucle es cuadrático
     except Exception as e:
         logger.error(f"Error al extraer texto del PDF: {str(e)}", exc_info=True)
         raise # Re-lanzar la excepción para que el llamador la maneje
@@ -44,6 +46,9 @@ def format_content_for_readability(content: str) -> str:
 
 
 def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    # Importación diferida (y del paquete ligero, no de `langchain`): solo la necesita la investigación web.
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
@@ -57,8 +62,80 @@ def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> L
     return text_splitter.split_text(text)
 
 
+def _relevance_terms(text: str) -> set:
+    """Términos significativos (4+ letras, sin tildes ni mayúsculas) para puntuar relevancia léxica."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return set(re.findall(r"\w{4,}", text))
+
+
+def select_relevant_chunks(query: str, chunks_per_source: List[List[str]], limit: int) -> List[Tuple[int, int, str]]:
+    """
+    Elige hasta `limit` trozos (índice de fuente, índice de trozo, texto) por solapamiento de términos con
+    `query`. El mejor trozo de cada fuente entra siempre (cobertura de todas las fuentes); el resto se
+    reparte por puntuación y, a igualdad, por posición en la fuente. Se devuelven en orden de fuente y trozo.
+    """
+    query_terms = _relevance_terms(query)
+    scored = [
+        (len(query_terms & _relevance_terms(chunk)), source_index, chunk_index, chunk)
+        for source_index, chunks in enumerate(chunks_per_source)
+        for chunk_index, chunk in enumerate(chunks)
+    ]
+    ranked = sorted(scored, key=lambda item: (-item[0], item[2], item[1]))
+    selected = {}
+    covered_sources = set()
+    for score, source_index, chunk_index, chunk in ranked: # Primero el mejor trozo de cada fuente
+        if len(selected) < limit and source_index not in covered_sources:
+            covered_sources.add(source_index)
+            selected[(source_index, chunk_index)] = chunk
+    for score, source_index, chunk_index, chunk in ranked:
+        if len(selected) >= limit:
+            break
+        selected.setdefault((source_index, chunk_index), chunk)
+    return [(source_index, chunk_index, chunk) for (source_index, chunk_index), chunk in sorted(selected.items())]
+
+
+def _extract_text_bs4(content: str) -> str:
+    """Extractor original con BeautifulSoup (html.parser): se mantiene como alternativa y referencia del benchmark."""
+    from bs4 import BeautifulSoup # Importar aquí para no hacerla dependencia dura si no se usa siempre
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Extraer texto de etiquetas comunes de contenido
+    text_parts = []
+    for tag in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'article', 'section']):
+        text_parts.append(tag.get_text(separator=' ', strip=True))
+    
+    clean_text = ' '.join(text_parts)
+    return re.sub(r'\s+', ' ', clean_text).strip() # Normalizar espacios
+
+
+def extract_text_from_html(content: str, source: str = "", engine: Optional[str] = None) -> Optional[str]:
+    """
+    Limpia el HTML de una página y devuelve su texto (síncrono y costoso en CPU: llamar fuera del event loop).
+    `engine` (por defecto settings.HTML_EXTRACTOR): "readability" (contenido principal, sin navegación
+    ni bloques repetidos) o "bs4" (extractor original). Ambos se recortan a HTML_EXTRACT_MAX_CHARS.
+    """
+    if (engine or settings.HTML_EXTRACTOR) == "bs4":
+        clean_text = _extract_text_bs4(content)[:settings.HTML_EXTRACT_MAX_CHARS]
+    else:
+        clean_text = extract_main_text(content, max_chars=settings.HTML_EXTRACT_MAX_CHARS)
+    
+    if not clean_text: # Si no se extrajo texto, intentar con regex como fallback (menos ideal)
+        logger.warning(f"El extractor HTML obtuvo poco texto de {source}, intentando regex fallback.")
+        clean_text = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
+        clean_text = re.sub(r'<style[^>]*>.*?</style>', '', clean_text, flags=re.DOTALL | re.IGNORECASE)
+        clean_text = re.sub(r'<[^>]+>', ' ', clean_text)
+        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+
+    logger.info(f"Contenido extraído (longitud: {len(clean_text)}) de URL: {source}")
+    return clean_text if clean_text else None
+
+
 def extract_content_from_url(url: str, timeout: int = 10) -> Optional[str]:
-    """Extrae y limpia el contenido de texto de una URL."""
+    """
+    Extrae y limpia el contenido de texto de una URL (versión síncrona y bloqueante).
+    Desde código asíncrono usar `url_fetcher.fetch_text` (common.services.url_fetcher).
+    """
     try:
         headers = { # Añadir User-Agent para evitar bloqueos simples
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -72,29 +149,7 @@ def extract_content_from_url(url: str, timeout: int = 10) -> Optional[str]:
         except UnicodeDecodeError:
             content = response.text # requests intenta adivinar la codificación
 
-        # Placeholder para una extracción de contenido más sofisticada (ej. usando BeautifulSoup)
-        # Por ahora, una limpieza muy básica de HTML y normalización de espacios.
-        # Esta parte es la más propensa a necesitar mejoras para contenido web real.
-        from bs4 import BeautifulSoup # Importar aquí para no hacerla dependencia dura si no se usa siempre
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Extraer texto de etiquetas comunes de contenido
-        text_parts = []
-        for tag in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'article', 'section']):
-            text_parts.append(tag.get_text(separator=' ', strip=True))
-        
-        clean_text = ' '.join(text_parts)
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip() # Normalizar espacios
-        
-        if not clean_text: # Si BeautifulSoup no extrajo mucho, intentar con regex como fallback (menos ideal)
-            logger.warning(f"BeautifulSoup extrajo poco texto de {url}, intentando regex fallback.")
-            clean_text = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
-            clean_text = re.sub(r'<style[^>]*>.*?</style>', '', clean_text, flags=re.DOTALL | re.IGNORECASE)
-            clean_text = re.sub(r'<[^>]+>', ' ', clean_text)
-            clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-
-        logger.info(f"Contenido extraído (longitud: {len(clean_text)}) de URL: {url}")
-        return clean_text if clean_text else None
+        return extract_text_from_html(content, url)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error de red al extraer contenido de URL {url}: {str(e)}")
     except Exception as e:
@@ -104,4 +159,29 @@ def extract_content_from_url(url: str, timeout: int = 10) -> Optional[str]:
 
 def extract_hashtags(text: str) -> List[str]:
     hashtags = re.findall(r'#(\w+)', text)
-    return hashtags
\ No newline at end of file
+    return hashtags
+
+
+def format_sse_event(event: str, data: Any) -> str:
+    """Serializa un evento Server-Sent Events (text/event-stream) con datos JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def canonicalize_prompt_text(text: str) -> str:
+    """
+    Forma canónica y estable byte a byte de un prompt: Unicode NFC, saltos de línea LF, sin espacios
+    al final de cada línea ni en los extremos. Dos textos que solo difieren en esos detalles
+    (p. ej. una plantilla copiada desde Windows) producen el mismo prefijo para la caché del proveedor.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def compose_static_prefix(*parts: Optional[str]) -> str:
+    """
+    Une en orden las partes estáticas de un prompt (prefijo de autor, texto de plantilla...)
+    con un separador fijo, ignorando las vacías, para que el prefijo resultante sea siempre el mismo.
+    """
+    return "\n\n".join(canonical for canonical in (canonicalize_prompt_text(part or "") for part in parts) if canonical)
@@ -0,0 +1,218 @@
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+# Extracción del contenido principal de una página (estilo "readability") en una sola pasada con el
+# tokenizador de la biblioteca estándar, sin construir el árbol completo como BeautifulSoup:
+#   - se descartan scripts, estilos, navegación, pies, barras laterales y bloques cuyo class/id indica
+#     publicidad, menús, comentarios, etc.;
+#   - el texto se asigna solo al bloque más interno abierto, así que los bloques anidados
+#     (article > section > p) no duplican texto;
+#   - cada bloque de texto puntúa para su contenedor (y la mitad para el abuelo) según longitud y comas,
+#     penalizando la densidad de enlaces, y se devuelve solo el contenido del mejor contenedor;
+#   - el parseo se detiene en cuanto se ha reunido suficiente texto.
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "form", "button",
+    "select", "textarea", "nav", "aside", "footer", "head", "title", "dialog", "menu",
+}
+_BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "td", "th", "dd", "dt",
+    "figcaption", "caption", "div", "section", "article", "main", "body", "ul", "ol", "dl", "table",
+    "tr", "tbody", "thead", "figure", "header", "address",
+}
+_AUTO_CLOSE_TAGS = {"p", "li", "dd", "dt", "td", "th", "tr"}
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_CONTENT_ROOT_TAGS = {"article", "main"}
+_NEGATIVE_PATTERN = re.compile(
+    r"nav|menu|footer|sidebar|comment|cookie|consent|banner|share|social|related|advert|\bads?\b|promo|"
+    r"breadcrumb|newsletter|subscribe|popup|modal|sponsor|masthead|skip|pagination|author-bio",
+    re.IGNORECASE
+)
+_POSITIVE_PATTERN = re.compile(r"article|content|main|post|entry|story|body|text|blog", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_FEED_SLICE = 32 * 1024 # El HTML se alimenta por trozos para poder parar en cuanto hay texto suficiente
+
+
+@dataclass
+class _Block:
+    text: str
+    link_chars: int
+    tag: str
+    ancestors: Tuple[int, ...] # Contenedores abiertos (ids) de fuera hacia dentro
+
+
+class _MainContentParser(HTMLParser):
+    def __init__(self, stop_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.stop_chars = stop_chars
+        self.done = False
+        self.blocks: List[_Block] = []
+        self.collected_chars = 0
+        self._stack: List[Tuple[str, int, bool]] = [] # (tag, id, descarta su contenido)
+        self._block_ids: List[int] = [] # ids de los bloques abiertos (subconjunto de la pila)
+        self._block_tags: List[str] = []
+        self._next_id = 0
+        self._skip_depth = 0
+        self._link_depth = 0
+        self._content_root_depth = 0
+        self._parts: List[str] = []
+        self._part_link_chars = 0
+
+    def _flush(self) -> None:
+        if not self._parts:
+            return
+        text = _WHITESPACE.sub(" ", "".join(self._parts)).strip()
+        self._parts = []
+        link_chars, self._part_link_chars = self._part_link_chars, 0
+        if not text:
+            return
+        self.blocks.append(_Block(
+            text=text,
+            link_chars=min(link_chars, len(text)),
+            tag=self._block_tags[-1] if self._block_tags else "body",
+            ancestors=tuple(self._block_ids),
+        ))
+        self.collected_chars += len(text)
+        if self.collected_chars >= self.stop_chars:
+            self.done = True
+
+    def _is_boilerplate(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        if tag in _SKIP_TAGS:
+            return True
+        if tag == "header" and not self._content_root_depth: # La cabecera de un <article> sí suele traer el título
+            return True
+        if tag in ("body", "html", "article", "main"):
+            return False
+        attributes = dict(attrs)
+        if attributes.get("hidden") is not None or attributes.get("aria-hidden") == "true":
+            return True
+        if attributes.get("role") in ("navigation", "banner", "contentinfo", "complementary"):
+            return True
+        names = f"{attributes.get('class') or ''} {attributes.get('id') or ''}"
+        return bool(names.strip()) and bool(_NEGATIVE_PATTERN.search(names)) and not _POSITIVE_PATTERN.search(names)
+
+    def _pop_to(self, index: int) -> None:
+        while len(self._stack) > index:
+            tag, node_id, skip = self._stack.pop()
+            if skip:
+                self._skip_depth -= 1
+            if tag == "a":
+                self._link_depth -= 1
+            if tag in _CONTENT_ROOT_TAGS:
+                self._content_root_depth -= 1
+            if self._block_ids and self._block_ids[-1] == node_id:
+                if not self._skip_depth:
+                    self._flush()
+                self._block_ids.pop()
+                self._block_tags.pop()
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in _VOID_TAGS:
+            if tag == "br" and not self._skip_depth:
+                self._parts.append(" ")
+            return
+        if tag in _AUTO_CLOSE_TAGS or tag in _BLOCK_TAGS:
+            # Cierres implícitos del HTML: un <p>/<li> nuevo cierra el anterior y un bloque cierra el <p> abierto
+            if self._block_tags and (self._block_tags[-1] == tag and tag in _AUTO_CLOSE_TAGS or self._block_tags[-1] == "p"):
+                for index in range(len(self._stack) - 1, -1, -1):
+                    if self._stack[index][1] == self._block_ids[-1]:
+                        self._pop_to(index)
+                        break
+        skip = not self._skip_depth and self._is_boilerplate(tag, attrs)
+        self._next_id += 1
+        self._stack.append((tag, self._next_id, skip))
+        if skip:
+            self._skip_depth += 1
+        if tag == "a":
+            self._link_depth += 1
+        if tag in _CONTENT_ROOT_TAGS:
+            self._content_root_depth += 1
+        if tag in _BLOCK_TAGS:
+            if not self._skip_depth:
+                self._flush() # El texto previo del bloque padre queda como bloque propio: sin duplicados
+            self._block_ids.append(self._next_id)
+            self._block_tags.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                self._pop_to(index)
+                return
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_depth:
+            return
+        self._parts.append(data)
+        if self._link_depth:
+            self._part_link_chars += len(data.strip())
+
+    def close(self) -> None:
+        super().close()
+        self._pop_to(0)
+        self._flush()
+
+
+def _select_main_blocks(blocks: List[_Block]) -> List[_Block]:
+    scores: Dict[int, float] = {}
+    text_chars: Dict[int, int] = {}
+    link_chars: Dict[int, int] = {}
+    for block in blocks:
+        for ancestor in block.ancestors:
+            text_chars[ancestor] = text_chars.get(ancestor, 0) + len(block.text)
+            link_chars[ancestor] = link_chars.get(ancestor, 0) + block.link_chars
+        if len(block.text) < 25 or block.tag in _HEADING_TAGS or len(block.ancestors) < 2:
+            continue
+        score = 1 + block.text.count(",") + min(len(block.text) / 100, 3)
+        parent, grandparent = block.ancestors[-2], block.ancestors[-3] if len(block.ancestors) > 2 else None
+        scores[parent] = scores.get(parent, 0.0) + score
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0.0) + score / 2
+
+    if not scores:
+        return [block for block in blocks if block.link_chars <= len(block.text) / 2]
+    weighted = {
+        node_id: score * (1 - link_chars[node_id] / max(text_chars[node_id], 1)) for node_id, score in scores.items()
+    }
+    best = max(weighted, key=weighted.get)
+    # Como en readability, también entran los hermanos del mejor contenedor con puntuación suficiente
+    # y los párrafos largos con pocos enlaces que cuelgan del mismo padre.
+    best_path = next(block.ancestors for block in blocks if best in block.ancestors)
+    best_depth = best_path.index(best)
+    parent = best_path[best_depth - 1] if best_depth > 0 else None
+    sibling_threshold = max(10.0, weighted[best] * 0.2)
+
+    def in_content(block: _Block) -> bool:
+        if best in block.ancestors:
+            return block.tag in _HEADING_TAGS or block.link_chars <= len(block.text) / 2
+        if parent is None or parent not in block.ancestors:
+            return False
+        sibling = block.ancestors[block.ancestors.index(parent) + 1] if block.ancestors[-1] != parent else None
+        if sibling is not None and weighted.get(sibling, 0.0) >= sibling_threshold:
+            return block.link_chars <= len(block.text) / 2
+        return block.tag in ("p", "li") and len(block.text) > 80 and block.link_chars < len(block.text) / 4
+
+    selected = [block for block in blocks if in_content(block)]
+    # El título (primer h1) suele quedar fuera del contenedor del cuerpo del artículo
+    title = next((block for block in blocks if block.tag == "h1"), None)
+    if title is not None and title not in selected:
+        selected.insert(0, title)
+    return selected
+
+
+def extract_main_text(html: str, max_chars: Optional[int] = None) -> str:
+    """
+    Devuelve el texto del contenido principal de `html`, un bloque por línea. Con `max_chars`
+    el parseo se detiene al reunir suficiente texto y el resultado se recorta a ese tamaño.
+    """
+    parser = _MainContentParser(stop_chars=max_chars * 2 if max_chars else float("inf"))
+    for start in range(0, len(html), _FEED_SLICE):
+        parser.feed(html[start:start + _FEED_SLICE])
+        if parser.done:
+            break
+    parser.close()
+    text = "\n".join(block.text for block in _select_main_blocks(parser.blocks))
+    return text[:max_chars] if max_chars else text
@@ -0,0 +1,132 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Set, Tuple
+
+# Limpieza del texto que PyPDF2 extrae de documentos técnicos antes de enviarlo al LLM:
+#   - se eliminan las líneas que se repiten en las cabeceras o pies de muchas páginas (título del
+#     documento, nombre de la empresa...), comparándolas con los dígitos normalizados para que la
+#     numeración no impida detectarlas, y los números de página ("7", "Página 3 de 12") solo si siguen
+#     la numeración de las páginas: un "2023" o un total suelto en el borde de una página se conserva;
+#   - se unen las palabras cortadas con guion al final de línea ("implemen-\ntación"), salvo los
+#     compuestos ("machine-\nlearning") cuyas dos partes aparecen como palabras en el propio documento;
+#   - se colapsan los espacios repetidos y las líneas en blanco sobrantes.
+
+# Versión de la normalización: forma parte de la clave del texto en la caché de PDFs
+NORMALIZATION_VERSION = "2"
+
+_EDGE_LINES = 3 # Líneas del principio y del final de cada página donde se buscan cabeceras y pies
+_MIN_PAGES = 3 # Con menos páginas no hay repetición fiable
+_REPEAT_RATIO = 0.5 # Fracción de páginas en las que debe aparecer una línea para considerarla cabecera/pie
+_MAX_FURNITURE_CHARS = 120 # Las líneas más largas se consideran contenido aunque se repitan
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+_PAGE_NUMBER = re.compile(
+    r"^(?:-\s*)?(?:p[áa]g(?:ina)?\.?|page|p\.)?\s*(\d{1,4})(?:\s*(?:de|of|/)\s*\d{1,4})?(?:\s*-)?$", re.IGNORECASE
+)
+_HYPHENATED_BREAK = re.compile(r"(\w+)([-\u00ad])\n([a-záéíóúüñ]\w*)")
+_WORDS = re.compile(r"\w+")
+_COMPOUNDS = re.compile(r"\w+-\w+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@dataclass
+class NormalizedPdfText:
+    text: str
+    raw_chars: int # Caracteres del texto sin normalizar (páginas unidas con saltos de línea)
+    removed_lines: int # Líneas de cabecera, pie o número de página eliminadas
+    dehyphenated: int # Palabras cortadas con guion que se han unido
+
+    @property
+    def chars_saved(self) -> int:
+        return max(0, self.raw_chars - len(self.text))
+
+
+def _line_key(line: str) -> str:
+    return _DIGITS.sub("#", line.lower())
+
+
+def _edge_indexes(lines: List[str]) -> Set[int]:
+    content = [index for index, line in enumerate(lines) if line]
+    return set(content[:_EDGE_LINES] + content[-_EDGE_LINES:])
+
+
+def _page_number_offsets(pages: List[List[str]], threshold: float) -> Set[int]:
+    """
+    Desplazamientos (número impreso - índice de la página) que se repiten en al menos `threshold`
+    páginas: los números de los bordes que siguen uno de ellos son la numeración del documento.
+    """
+    counts = Counter(
+        offset
+        for page_index, lines in enumerate(pages)
+        for offset in {
+            int(match.group(1)) - page_index
+            for match in (_PAGE_NUMBER.match(lines[index]) for index in _edge_indexes(lines))
+            if match
+        }
+    )
+    return {offset for offset, count in counts.items() if count >= threshold}
+
+
+def _join_hyphenated_breaks(text: str) -> Tuple[str, int]:
+    """
+    Une las palabras cortadas con guion al final de línea. Se conserva el guion (sin el salto) si la
+    palabra unida no aparece en el documento y el compuesto sí, o ambas partes aparecen como palabras.
+    """
+    unbroken = _HYPHENATED_BREAK.sub(" ", text).lower()
+    words = set(_WORDS.findall(unbroken))
+    compounds = set(_COMPOUNDS.findall(unbroken))
+    joined = 0
+
+    def join(match: "re.Match[str]") -> str:
+        nonlocal joined
+        left, hyphen, right = match.groups()
+        if hyphen == "-" and (left + right).lower() not in words:
+            if f"{left}-{right}".lower() in compounds or (left.lower() in words and right.lower() in words):
+                return f"{left}-{right}"
+        joined += 1
+        return left + right
+
+    return _HYPHENATED_BREAK.sub(join, text), joined
+
+
+def normalize_pdf_pages(page_texts: List[str]) -> NormalizedPdfText:
+    """Normaliza el texto de un PDF a partir del texto de cada página (en orden)."""
+    pages = [[_SPACES.sub(" ", line).strip() for line in (page or "").splitlines()] for page in page_texts]
+    raw_chars = sum(len(page or "") for page in page_texts) + max(0, len(page_texts) - 1)
+
+    furniture: Set[str] = set()
+    page_offsets: Set[int] = set()
+    if len(pages) >= _MIN_PAGES:
+        threshold = max(_MIN_PAGES, len(pages) * _REPEAT_RATIO)
+        # Cada línea cuenta una vez por página y solo si está en la zona de cabecera o pie
+        counts = Counter(
+            key
+            for lines in pages
+            for key in {_line_key(lines[index]) for index in _edge_indexes(lines) if len(lines[index]) <= _MAX_FURNITURE_CHARS}
+        )
+        furniture = {key for key, count in counts.items() if count >= threshold}
+        page_offsets = _page_number_offsets(pages, threshold)
+
+    removed_lines = 0
+    kept_pages = []
+    for page_index, lines in enumerate(pages):
+        edges = _edge_indexes(lines)
+        kept = []
+        for index, line in enumerate(lines):
+            if index in edges:
+                # Las líneas numéricas solo se eliminan si siguen la numeración de las páginas
+                page_number = _PAGE_NUMBER.match(line)
+                if (
+                    int(page_number.group(1)) - page_index in page_offsets
+                    if page_number else _line_key(line) in furniture
+                ):
+                    removed_lines += 1
+                    continue
+            kept.append(line)
+        kept_pages.append("\n".join(kept))
+
+    text, dehyphenated = _join_hyphenated_breaks("\n".join(kept_pages))
+    text = _BLANK_LINES.sub("\n\n", text).strip()
+    return NormalizedPdfText(text=text, raw_chars=raw_chars, removed_lines=removed_lines, dehyphenated=dehyphenated)
@@ -0,0 +1,12 @@
+from typing import Optional, Sequence
+
+
+def percentile(sorted_values: Sequence[float], p: float, ndigits: Optional[int] = None) -> Optional[float]:
+    """
+    Percentil `p` (0-100) por rango más cercano sobre una lista ya ordenada; None si está vacía.
+    Con `ndigits` el resultado se redondea a esos decimales.
+    """
+    if not sorted_values:
+        return None
+    value = sorted_values[max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))]
+    return value if ndigits is None else round(value, ndigits)
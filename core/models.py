@@ -105,18 +105,41 @@ class GeneratedContent(Base):
     generated_text_main = Column(Text, nullable=False)
     generated_text_summary = Column(Text, nullable=True)
     researched_content_summary = Column(Text, nullable=True)
+    generation_group_id = Column(PG_UUID(as_uuid=True), nullable=True, index=True) # Variantes hermanas de una misma generación
+    variant_index = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     is_deleted = Column(Boolean, default=False, nullable=False)
 
     user = relationship("User", back_populates="generated_contents")
     tags = relationship("Tag", secondary=content_tags_association, back_populates="contents")
+    llm_usage = relationship("GenerationLLMUsage", back_populates="content", cascade="all, delete-orphan")
 
     __table_args__ = (
         CheckConstraint(content_type.in_(['linkedin_post', 'blog_general_interest', 'blog_success_case'])),
     )
 
 
+class GenerationLLMUsage(Base):
+    """Uso de una llamada al LLM (paso del pipeline) dentro de una generación guardada en el historial."""
+    __tablename__ = "generation_llm_usage"
+
+    usage_id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_id = Column(PG_UUID(as_uuid=True), ForeignKey("generated_content.content_id", ondelete="CASCADE"), nullable=False, index=True)
+    step = Column(String(50), nullable=False) # 'linkedin_post', 'web_research', 'pdf_transform', 'article', 'summary'...
+    model_name = Column(String(100), nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=1) # Intentos al proveedor (reintentos y coberturas incluidos)
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    cost_usd = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    content = relationship("GeneratedContent", back_populates="llm_usage")
+
+
 class Tag(Base):
     __tablename__ = "tags"
 
@@ -130,4 +153,15 @@ class Tag(Base):
 
     __table_args__ = (
         # UniqueConstraint('user_id', 'tag_name', name='uq_tags_user_tag_name'), # Ya definido
-    )
\ No newline at end of file
+    )
+
+
+class LLMRateLimitBucket(Base):
+    """Estado compartido del token bucket por modelo LLM (coordinado entre workers y nodos)."""
+    __tablename__ = "llm_rate_limit_buckets"
+
+    model_name = Column(String(100), primary_key=True)
+    request_tokens = Column(Float, nullable=False)
+    token_tokens = Column(Float, nullable=False)
+    blocked_until = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
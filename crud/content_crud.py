@@ -1,5 +1,6 @@
 # MODIFICADO: Ajustar funciones y añadir nuevas para el historial
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import Optional, List
 import uuid 
@@ -14,14 +15,45 @@ def create_generated_content(
     content_data: content_schemas.GeneratedContentCreate
 ) -> db_models.GeneratedContent:
     db_content = db_models.GeneratedContent(
-        **content_data.model_dump(exclude_none=True), # Excluir Nones para campos opcionales
+        **content_data.model_dump(exclude_none=True, exclude={"llm_usage"}), # Excluir Nones para campos opcionales
         user_id=user_id
     )
+    db_content.llm_usage = [
+        db_models.GenerationLLMUsage(**usage.model_dump()) for usage in content_data.llm_usage or []
+    ]
     db.add(db_content)
     db.commit()
     db.refresh(db_content)
     return db_content
 
+def create_generated_contents_bulk(
+    db: Session,
+    user_id: uuid.UUID,
+    contents_data: List[content_schemas.GeneratedContentCreate]
+) -> List[uuid.UUID]:
+    """
+    Inserta varios contenidos en una sola sentencia INSERT y un único commit (sin refresh por fila),
+    junto con sus filas de uso de LLM (otra sentencia INSERT en la misma transacción).
+    Devuelve los content_id generados, en el mismo orden que contents_data.
+    """
+    if not contents_data:
+        return []
+    content_ids = [uuid.uuid4() for _ in contents_data]
+    rows = [
+        {**content_data.model_dump(exclude_none=True, exclude={"llm_usage"}), "content_id": content_id, "user_id": user_id}
+        for content_id, content_data in zip(content_ids, contents_data)
+    ]
+    usage_rows = [
+        {**usage.model_dump(), "usage_id": uuid.uuid4(), "content_id": content_id}
+        for content_id, content_data in zip(content_ids, contents_data)
+        for usage in content_data.llm_usage or []
+    ]
+    db.execute(insert(db_models.GeneratedContent), rows)
+    if usage_rows:
+        db.execute(insert(db_models.GenerationLLMUsage), usage_rows)
+    db.commit()
+    return content_ids
+
 def get_generated_content_by_id_for_user( # Renombrado para claridad
     db: Session, 
     content_id: uuid.UUID, 
@@ -0,0 +1,70 @@
+# NUEVO ARCHIVO para consultas agregadas del uso de LLM por generación
+
+from sqlalchemy import func, distinct, case
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import uuid
+from datetime import datetime
+
+from core import models as db_models
+from schemas import usage_schemas
+
+def get_usage_aggregates(
+    db: Session,
+    user_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    group_by_user: bool = True,
+    group_by_content_type: bool = False
+) -> List[usage_schemas.UsageAggregateItem]:
+    """
+    Agrega el uso de LLM por modelo (y opcionalmente por usuario y tipo de contenido),
+    filtrando por usuario y rango de fechas de la generación.
+    """
+    usage = db_models.GenerationLLMUsage
+    content = db_models.GeneratedContent
+    group_columns = [usage.model_name]
+    if group_by_user:
+        group_columns.append(content.user_id)
+    if group_by_content_type:
+        group_columns.append(content.content_type)
+
+    query = db.query(
+        *group_columns,
+        func.count(distinct(usage.content_id)).label("generations"),
+        func.count(usage.usage_id).label("llm_calls"),
+        func.sum(case((usage.cache_hit == True, 1), else_=0)).label("cache_hits"),
+        func.sum(func.greatest(usage.attempts - 1, 0)).label("retries"),
+        func.sum(usage.prompt_tokens).label("prompt_tokens"),
+        func.sum(usage.completion_tokens).label("completion_tokens"),
+        func.sum(usage.cached_tokens).label("cached_tokens"),
+        func.sum(usage.cost_usd).label("cost_usd"),
+        func.avg(case((usage.cache_hit == False, usage.latency_ms))).label("avg_latency_ms"),
+    ).join(content, content.content_id == usage.content_id)
+
+    if user_id:
+        query = query.filter(content.user_id == user_id)
+    if since:
+        query = query.filter(content.created_at >= since)
+    if until:
+        query = query.filter(content.created_at < until)
+
+    rows = query.group_by(*group_columns).order_by(func.sum(usage.cost_usd).desc()).all()
+    return [
+        usage_schemas.UsageAggregateItem(
+            user_id=row.user_id if group_by_user else None,
+            model_name=row.model_name,
+            content_type=row.content_type if group_by_content_type else None,
+            generations=row.generations,
+            llm_calls=row.llm_calls,
+            cache_hits=row.cache_hits or 0,
+            retries=row.retries or 0,
+            prompt_tokens=row.prompt_tokens or 0,
+            completion_tokens=row.completion_tokens or 0,
+            cached_tokens=row.cached_tokens or 0,
+            cached_token_ratio=round((row.cached_tokens or 0) / row.prompt_tokens, 4) if row.prompt_tokens else None,
+            cost_usd=round(row.cost_usd or 0.0, 6),
+            avg_latency_ms=round(row.avg_latency_ms, 2) if row.avg_latency_ms is not None else None,
+        )
+        for row in rows
+    ]
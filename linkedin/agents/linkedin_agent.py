@@ -1,10 +1,12 @@
 # MODIFICADO: Añadir la implementación de generate_content.
 
-from common.base_agent import BaseAgent
+from common.base_agent import BaseAgent, LLMCallOptions
+from common.services.context_budget import ContextSegment
+from common.utils.helpers import compose_static_prefix
 from linkedin.models.linkedin_models import LinkedInPostRequestRefactored, LinkedInPostResponseRefactored
 from core.logger import get_logger
 from core.config import settings 
-from typing import Optional, Any # Any añadido para el tipo de retorno de generate_content
+from typing import Optional, Any, AsyncIterator, List, Tuple, Union # Any añadido para el tipo de retorno de generate_content
 
 logger = get_logger("linkedin_agent")
 
@@ -62,18 +64,19 @@ class LinkedInAgent(BaseAgent):
             )
 
     def _apply_author_prefix_to_system_prompt(self, system_prompt: str, model_key: Optional[str] = None) -> str:
+        # Prefijo de autor y plantilla son estáticos: se unen en forma canónica para que el system prompt
+        # sea idéntico byte a byte entre peticiones y lo aproveche la caché de prompts del proveedor.
         key_to_check = model_key if model_key else self.model_identifier_key
         if key_to_check == "Pablo":
             logger.info("Aplicando prefijo de Pablo para LinkedIn.")
-            return PABLO_LINKEDIN_SYSTEM_PROMPT_PREFIX + system_prompt
+            return compose_static_prefix(PABLO_LINKEDIN_SYSTEM_PROMPT_PREFIX, system_prompt)
         elif key_to_check == "Aitor":
             logger.info("Aplicando prefijo de Aitor para LinkedIn.")
-            return AITOR_LINKEDIN_SYSTEM_PROMPT_PREFIX + system_prompt
-        return system_prompt
+            return compose_static_prefix(AITOR_LINKEDIN_SYSTEM_PROMPT_PREFIX, system_prompt)
+        return compose_static_prefix(system_prompt)
 
-    async def generate_post_refactored(self, request: LinkedInPostRequestRefactored) -> LinkedInPostResponseRefactored:
-        logger.info(f"Solicitud para generar post de LinkedIn: Tema='{request.human_prompt[:50]}...', Modelo/Estilo='{request.model}', Temp='{request.temperature}'")
-        
+    def _prepare_post_call(self, request: LinkedInPostRequestRefactored) -> Tuple[str, LLMCallOptions]:
+        """Resuelve el system prompt final y las opciones de llamada para una solicitud de post."""
         effective_system_prompt = self._apply_author_prefix_to_system_prompt(request.system_prompt, request.model)
         
         logger.debug(f"System Prompt final a usar para LinkedIn: '{effective_system_prompt[:200]}...'") 
@@ -85,23 +88,73 @@ class LinkedInAgent(BaseAgent):
             logger.error(error_msg)
             raise ValueError(error_msg)
 
-        if self.model_name != target_actual_llm_model_name or self.temperature != request.temperature:
-            logger.info(f"Actualizando configuración del LLM para esta solicitud LinkedIn: Modelo de '{self.model_name}' a '{target_actual_llm_model_name}', Temperatura de '{self.temperature}' a '{request.temperature}'")
-            self.update_llm_config(
-                model_name=target_actual_llm_model_name,
-                temperature=request.temperature
-            )
+        # Opciones inmutables de esta llamada: el agente no se reconfigura y puede compartirse entre peticiones.
+        call_options = self._build_call_options(
+            model_name=target_actual_llm_model_name,
+            temperature=request.temperature,
+            cache_mode=request.cache,
+            step="linkedin_post"
+        )
+        # Ambos prompts son obligatorios: si no caben en la ventana del modelo se rechaza antes de llamar al proveedor.
+        self._pack_context(call_options, [
+            ContextSegment(name="system", text=effective_system_prompt, required=True),
+            ContextSegment(name="human_prompt", text=request.human_prompt, required=True),
+        ])
+        return effective_system_prompt, call_options
+
+    async def generate_post_refactored(self, request: LinkedInPostRequestRefactored) -> LinkedInPostResponseRefactored:
+        logger.info(f"Solicitud para generar post de LinkedIn: Tema='{request.human_prompt[:50]}...', Modelo/Estilo='{request.model}', Temp='{request.temperature}'")
         
-        generated_text = await self._call_llm_with_prompts(
+        effective_system_prompt, call_options = self._prepare_post_call(request)
+        
+        # Con num_variants > 1 todas las versiones salen de una única llamada (n choices).
+        variants = await self._call_llm_variants(
             system_prompt=effective_system_prompt, 
-            human_prompt=request.human_prompt
+            human_prompt=request.human_prompt,
+            options=call_options,
+            num_variants=request.num_variants
         )
         
-        logger.info(f"Post de LinkedIn generado exitosamente para el tema: '{request.human_prompt[:50]}...'")
+        logger.info(f"Post de LinkedIn generado exitosamente ({len(variants)} variante(s)) para el tema: '{request.human_prompt[:50]}...'")
 
         return LinkedInPostResponseRefactored(
-            generated_post=generated_text,
+            generated_post=variants[0],
+            model_used=request.model, 
+            actual_model_name_used=call_options.model_name, 
+            temperature_used=call_options.temperature,
+            variants=variants
+        )
+
+    async def stream_post_refactored(
+        self, request: LinkedInPostRequestRefactored
+    ) -> AsyncIterator[Union[str, LinkedInPostResponseRefactored]]:
+        """
+        Genera el post en streaming. Emite los fragmentos de texto (str) según llegan y,
+        al terminar, un LinkedInPostResponseRefactored con el texto completo y sus metadatos.
+        """
+        logger.info(f"Solicitud de streaming de post de LinkedIn: Tema='{request.human_prompt[:50]}...', Modelo/Estilo='{request.model}', Temp='{request.temperature}'")
+        
+        if request.num_variants > 1:
+            raise ValueError("El streaming genera una sola versión del post: num_variants debe ser 1.")
+
+        effective_system_prompt, call_options = self._prepare_post_call(request)
+        
+        parts: List[str] = []
+        async for token in self._stream_llm_with_prompts(
+            system_prompt=effective_system_prompt,
+            human_prompt=request.human_prompt,
+            options=call_options
+        ):
+            parts.append(token)
+            yield token
+        
+        logger.info(f"Streaming de post de LinkedIn completado para el tema: '{request.human_prompt[:50]}...'")
+
+        generated_post = "".join(parts)
+        yield LinkedInPostResponseRefactored(
+            generated_post=generated_post,
             model_used=request.model, 
-            actual_model_name_used=self.model_name, 
-            temperature_used=self.temperature
-        )
\ No newline at end of file
+            actual_model_name_used=call_options.model_name, 
+            temperature_used=call_options.temperature,
+            variants=[generated_post]
+        )
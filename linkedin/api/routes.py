@@ -1,12 +1,15 @@
 # MODIFICADO: Para pasar db session y current_user al servicio
 
 from fastapi import APIRouter, Depends, HTTPException, status, Body 
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session # Importar Session
 import uuid # Para el tipo UUID
 
 from linkedin.models.linkedin_models import (
     LinkedInPostRequestRefactored,  
-    LinkedInPostResponseRefactored  
+    LinkedInPostResponseRefactored,
+    LinkedInBatchPostRequest,
+    LinkedInBatchPostResponse
 )
 from linkedin.services.linkedin_service import LinkedInService 
 from core.logger import get_logger
@@ -18,8 +21,11 @@ logger = get_logger("linkedin_api_routes")
 
 router = APIRouter(prefix="/linkedin", tags=["LinkedIn Refactored"])
 
+# Servicio compartido por todas las peticiones (su agente es seguro ante concurrencia).
+linkedin_service = LinkedInService()
+
 def get_linkedin_service() -> LinkedInService:
-    return LinkedInService() 
+    return linkedin_service
 
 @router.post("/generate_post_refactored", response_model=LinkedInPostResponseRefactored) 
 async def generate_linkedin_post_refactored_endpoint(
@@ -43,4 +49,45 @@ async def generate_linkedin_post_refactored_endpoint(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor al generar el post: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/generate_post_refactored/batch", response_model=LinkedInBatchPostResponse)
+async def generate_linkedin_posts_batch_endpoint(
+    request: LinkedInBatchPostRequest = Body(...),
+    service: LinkedInService = Depends(get_linkedin_service),
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Genera varios posts en una sola petición. Devuelve un resultado por elemento (post generado
+    o error); los fallos parciales no hacen fallar el lote completo.
+    """
+    try:
+        logger.info(f"API LinkedIn: Recibido lote de {len(request.items)} posts de {current_user.email}")
+        return await service.generate_posts_batch_service_method(request=request, db=db, user_id=current_user.user_id)
+    except Exception as e:
+        logger.error(f"API LinkedIn: Error interno al generar el lote de posts: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor al guardar el lote de posts: {str(e)}"
+        )
+
+
+@router.post("/generate_post_refactored/stream")
+async def stream_linkedin_post_refactored_endpoint(
+    request: LinkedInPostRequestRefactored = Body(...), 
+    service: LinkedInService = Depends(get_linkedin_service),
+    current_user: db_models.User = Depends(get_current_active_user)
+):
+    """
+    Variante en streaming (Server-Sent Events) de /generate_post_refactored.
+    Emite eventos 'token' con cada fragmento generado y un evento final 'done' con los
+    mismos metadatos que LinkedInPostResponseRefactored (o 'error' si la generación falla).
+    """
+    logger.info(f"API LinkedIn: Recibida solicitud de streaming de {current_user.email}: {request.model_dump_json(indent=2)}")
+    return StreamingResponse(
+        service.stream_post_service_method(request=request, user_id=current_user.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,7 +1,8 @@
 # --- backend/linkedin/models/linkedin_models.py ---
 # (Refactorizado para usar los campos directos: human_prompt, model, system_prompt, temperature)
 
-from typing import Literal, List # List es para el response
+from typing import Literal, List, Optional # List es para el response
+import uuid
 from pydantic import BaseModel, Field
 from core.config import settings
 # from common.models.base_models import ContentRequestBase, ContentResponseBase # Usaremos nuestros propios modelos aquí
@@ -37,6 +38,16 @@ class LinkedInPostRequestRefactored(BaseModel):
         description="Temperatura para la generación del contenido (0.0 a 1.0). Proviene del campo 'Temperatura' del frontend.",
         examples=[0.5]
     )
+    cache: Literal["bypass", "prefer", "only"] = Field(
+        default="bypass",
+        description="Uso de la caché exacta de respuestas: 'bypass' (no usar), 'prefer' (usar si hay acierto) u 'only' (solo caché)."
+    )
+    num_variants: int = Field(
+        default=1,
+        ge=1,
+        le=settings.MAX_NUM_VARIANTS,
+        description="Número de versiones alternativas del post. Se generan en una sola llamada al modelo."
+    )
 
     class Config:
         json_schema_extra = {
@@ -54,6 +65,9 @@ class LinkedInPostResponseRefactored(BaseModel):
     model_used: str = Field(description="El identificador del modelo que se utilizó (e.g., 'Default', 'Pablo', 'Aitor').")
     actual_model_name_used: str = Field(description="El nombre/ID real del modelo LLM que se invocó.")
     temperature_used: float = Field(description="La temperatura que se utilizó para la generación.")
+    variants: List[str] = Field(default_factory=list, description="Todas las versiones generadas (la primera coincide con generated_post).")
+    generation_group_id: Optional[uuid.UUID] = Field(default=None, description="Grupo del historial que enlaza las variantes hermanas.")
+    cached_token_ratio: Optional[float] = Field(default=None, description="Fracción de los tokens de prompt servidos desde la caché de prompts del proveedor.")
     # hashtags: List[str] = Field(default_factory=list, description="Hashtags sugeridos (opcional, podría añadirse post-procesamiento)")
 
     class Config:
@@ -66,6 +80,34 @@ class LinkedInPostResponseRefactored(BaseModel):
             }
         }
 
+class LinkedInBatchPostRequest(BaseModel):
+    """Solicitud de generación por lotes: varios posts independientes en una sola petición HTTP."""
+    items: List[LinkedInPostRequestRefactored] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.LINKEDIN_BATCH_MAX_ITEMS,
+        description="Posts a generar. Cada elemento es una solicitud completa de /generate_post_refactored."
+    )
+
+class LinkedInBatchItemResult(BaseModel):
+    """Resultado de un elemento del lote: la respuesta generada o el error que impidió generarla."""
+    index: int = Field(description="Posición del elemento en la lista 'items' de la solicitud.")
+    success: bool
+    result: Optional[LinkedInPostResponseRefactored] = None
+    content_id: Optional[uuid.UUID] = Field(default=None, description="ID del contenido guardado en el historial.")
+    error: Optional[str] = None
+    history_error: Optional[str] = Field(
+        default=None,
+        description="Error al guardar en el historial: el post se generó (result) pero no quedó registrado (content_id es None)."
+    )
+
+class LinkedInBatchPostResponse(BaseModel):
+    """Respuesta de la generación por lotes. Un fallo parcial no invalida el resto de elementos."""
+    total: int
+    succeeded: int
+    failed: int
+    results: List[LinkedInBatchItemResult]
+
 # Los modelos LinkedInSystemPromptConfig, LinkedInPostRequest (antiguo), LinkedInPostResponse (antiguo)
 # y LinkedInStyleConfigRequest pueden ser eliminados o archivados si ya no se usan.
 # Por ahora, los dejo comentados para referencia.
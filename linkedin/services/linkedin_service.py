@@ -2,21 +2,83 @@
 
 from sqlalchemy.orm import Session # Para type hinting
 import uuid # Para type hinting del user_id
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
 
 from linkedin.agents.linkedin_agent import LinkedInAgent
-from linkedin.models.linkedin_models import LinkedInPostRequestRefactored, LinkedInPostResponseRefactored
+from linkedin.models.linkedin_models import (
+    LinkedInPostRequestRefactored,
+    LinkedInPostResponseRefactored,
+    LinkedInBatchPostRequest,
+    LinkedInBatchItemResult,
+    LinkedInBatchPostResponse
+)
 from core.logger import get_logger
 from core.config import settings
+from core.database import SessionLocal
+from common.utils.helpers import format_sse_event
+from common.services.single_flight import generation_single_flight
+from common.services.llm_usage import collect_llm_usage
 # Nuevas importaciones
 from crud import content_crud # Para guardar el historial
 from schemas.content_schemas import GeneratedContentCreate # Para el payload del historial
+from schemas.usage_schemas import LLMCallUsage
 
 logger = get_logger("linkedin_service")
 
 class LinkedInService:
     def __init__(self):
+        # Un único agente compartido: modelo y temperatura viajan por llamada (LLMCallOptions),
+        # por lo que es seguro usarlo desde corrutinas concurrentes.
+        self.agent = LinkedInAgent(
+            model_identifier="Default",
+            temperature=settings.DEFAULT_TEMPERATURE
+        )
         logger.info("LinkedInService inicializado.")
-        # El agente se instancia por solicitud ahora
+
+    def _build_history_entry(
+        self,
+        request: LinkedInPostRequestRefactored,
+        response_data: LinkedInPostResponseRefactored,
+        llm_usage: Optional[List[LLMCallUsage]] = None
+    ) -> GeneratedContentCreate:
+        return GeneratedContentCreate(
+            content_type='linkedin_post',
+            custom_title=request.human_prompt[:100], # Usar el inicio del prompt como título por defecto
+            human_prompt_used=request.human_prompt,
+            system_prompt_used=self.agent._apply_author_prefix_to_system_prompt(request.system_prompt, request.model), # El system prompt final usado
+            model_key_selected=request.model,
+            actual_llm_model_name_used=response_data.actual_model_name_used, # El modelo real del LLM usado en esta llamada
+            temperature_used=response_data.temperature_used,
+            generated_text_main=response_data.generated_post,
+            llm_usage=llm_usage
+            # Otros campos opcionales (urls_researched, etc.) son None por defecto
+        )
+
+    def _build_history_entries(
+        self,
+        request: LinkedInPostRequestRefactored,
+        response_data: LinkedInPostResponseRefactored,
+        llm_usage: Optional[List[LLMCallUsage]] = None
+    ) -> List[GeneratedContentCreate]:
+        """
+        Una entrada de historial por variante. Si hay varias, se asigna a la respuesta un
+        generation_group_id común y cada entrada hermana guarda su variant_index.
+        El uso de LLM (una sola llamada para todas las variantes) se imputa a la variante 0.
+        """
+        base_entry = self._build_history_entry(request, response_data, llm_usage)
+        if len(response_data.variants) <= 1:
+            return [base_entry]
+        response_data.generation_group_id = uuid.uuid4()
+        return [
+            base_entry.model_copy(update={
+                "generated_text_main": variant,
+                "generation_group_id": response_data.generation_group_id,
+                "variant_index": variant_index,
+                "llm_usage": llm_usage if variant_index == 0 else None
+            })
+            for variant_index, variant in enumerate(response_data.variants)
+        ]
 
     async def generate_post_service_method(
         self, 
@@ -26,36 +88,126 @@ class LinkedInService:
     ) -> LinkedInPostResponseRefactored:
         logger.info(f"Servicio: Generando post de LinkedIn. Tema='{request.human_prompt[:50]}...', Modelo='{request.model}'")
         try:
-            agent = LinkedInAgent(
-                model_identifier=request.model,
-                temperature=request.temperature
-                # max_tokens no es un param directo en LinkedInPostRequestRefactored, se usa el default del agente
-            )
-            
-            # El método del agente ahora se llama generate_post_refactored
-            # y espera LinkedInPostRequestRefactored
-            response_data = await agent.generate_post_refactored(request) # El agente ya devuelve el response_model
-
-            # Guardar en el historial
-            content_to_save = GeneratedContentCreate(
-                content_type='linkedin_post',
-                custom_title=request.human_prompt[:100], # Usar el inicio del prompt como título por defecto
-                human_prompt_used=request.human_prompt,
-                system_prompt_used=agent._apply_author_prefix_to_system_prompt(request.system_prompt), # El system prompt final usado
-                model_key_selected=request.model,
-                actual_llm_model_name_used=agent.model_name, # El modelo real del LLM usado por el agente
-                temperature_used=agent.temperature,
-                generated_text_main=response_data.generated_post
-                # Otros campos opcionales (urls_researched, etc.) son None por defecto
-            )
-            content_crud.create_generated_content(db=db, user_id=user_id, content_data=content_to_save)
-            logger.info(f"Post de LinkedIn guardado en el historial para el usuario {user_id}")
-
-            return response_data # Devolver la respuesta original del agente
+            async def generate_and_save() -> LinkedInPostResponseRefactored:
+                # El método del agente ahora se llama generate_post_refactored
+                # y espera LinkedInPostRequestRefactored
+                with collect_llm_usage() as usage:
+                    response_data = await self.agent.generate_post_refactored(request) # El agente ya devuelve el response_model
+                response_data.cached_token_ratio = usage.cached_token_ratio()
+
+                # Guardar en el historial (una fila por variante, insertadas juntas) con el uso de LLM de la generación
+                contents_to_save = self._build_history_entries(request, response_data, usage.calls)
+                content_crud.create_generated_contents_bulk(db=db, user_id=user_id, contents_data=contents_to_save)
+                logger.info(f"Post de LinkedIn ({len(contents_to_save)} variante(s)) guardado en el historial para el usuario {user_id}")
+                return response_data
+
+            # Solicitudes idénticas y simultáneas del mismo usuario (doble clic, reintentos del frontend)
+            # comparten una sola generación y una sola fila en el historial.
+            flight_key = ("linkedin_post", user_id, request.model_dump_json())
+            return await generation_single_flight.run(flight_key, generate_and_save) # Devolver la respuesta original del agente
             
         except ValueError as ve:
              logger.error(f"Servicio LinkedIn: Error de configuración al generar post: {str(ve)}", exc_info=True)
              raise 
         except Exception as e:
             logger.error(f"Servicio LinkedIn: Error al generar post: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
+
+    async def generate_posts_batch_service_method(
+        self,
+        request: LinkedInBatchPostRequest,
+        db: Session,
+        user_id: uuid.UUID
+    ) -> LinkedInBatchPostResponse:
+        """
+        Genera varios posts en paralelo (como máximo LINKEDIN_BATCH_CONCURRENCY a la vez) y guarda
+        todos los generados con un único INSERT. Un elemento que falla se informa en su resultado
+        sin afectar al resto del lote; si falla el guardado, los posts generados se devuelven igualmente
+        con content_id None y history_error.
+        """
+        logger.info(f"Servicio: Generando lote de {len(request.items)} posts de LinkedIn para el usuario {user_id}")
+        semaphore = asyncio.Semaphore(settings.LINKEDIN_BATCH_CONCURRENCY)
+        usage_per_item: Dict[int, List[LLMCallUsage]] = {}
+
+        async def generate_item(index: int, item: LinkedInPostRequestRefactored) -> LinkedInBatchItemResult:
+            async with semaphore:
+                try:
+                    # Cada elemento corre en su propia tarea (gather), con su propio colector de uso.
+                    with collect_llm_usage() as usage:
+                        response_data = await self.agent.generate_post_refactored(item)
+                    usage_per_item[index] = usage.calls
+                    response_data.cached_token_ratio = usage.cached_token_ratio()
+                    return LinkedInBatchItemResult(index=index, success=True, result=response_data)
+                except Exception as e:
+                    logger.error(f"Servicio LinkedIn: Error en el elemento {index} del lote: {str(e)}", exc_info=True)
+                    return LinkedInBatchItemResult(index=index, success=False, error=str(e))
+
+        results: List[LinkedInBatchItemResult] = await asyncio.gather(
+            *(generate_item(index, item) for index, item in enumerate(request.items))
+        )
+
+        succeeded = [result for result in results if result.success]
+        if succeeded:
+            entries_per_result = [
+                self._build_history_entries(request.items[result.index], result.result, usage_per_item.get(result.index))
+                for result in succeeded
+            ]
+            try:
+                content_ids = content_crud.create_generated_contents_bulk(
+                    db=db,
+                    user_id=user_id,
+                    contents_data=[entry for entries in entries_per_result for entry in entries]
+                )
+            except Exception as e:
+                # Los posts ya están generados (y pagados): se devuelven igualmente, sin content_id.
+                db.rollback()
+                logger.error(f"Lote de LinkedIn: error al guardar en el historial para el usuario {user_id}: {str(e)}", exc_info=True)
+                for result in succeeded:
+                    result.history_error = f"No se pudo guardar en el historial: {str(e)}"
+            else:
+                # content_id de cada elemento: el de su primera variante
+                position = 0
+                for result, entries in zip(succeeded, entries_per_result):
+                    result.content_id = content_ids[position]
+                    position += len(entries)
+                logger.info(f"Lote de LinkedIn: {len(succeeded)} posts guardados en el historial para el usuario {user_id}")
+
+        return LinkedInBatchPostResponse(
+            total=len(results),
+            succeeded=len(succeeded),
+            failed=len(results) - len(succeeded),
+            results=results
+        )
+
+    async def stream_post_service_method(
+        self,
+        request: LinkedInPostRequestRefactored,
+        user_id: uuid.UUID
+    ) -> AsyncIterator[str]:
+        """
+        Genera el post en streaming y emite eventos SSE: 'token' por cada fragmento,
+        'done' con los metadatos de LinkedInPostResponseRefactored al terminar, o 'error'.
+        El texto completo se guarda en el historial antes de emitir 'done'.
+        """
+        logger.info(f"Servicio: Streaming de post de LinkedIn. Tema='{request.human_prompt[:50]}...', Modelo='{request.model}'")
+        try:
+            with collect_llm_usage() as usage:
+                async for item in self.agent.stream_post_refactored(request):
+                    if isinstance(item, LinkedInPostResponseRefactored):
+                        item.cached_token_ratio = usage.cached_token_ratio()
+                        # La sesión de la petición (get_db) ya se ha cerrado cuando se consume el stream,
+                        # así que el guardado usa su propia sesión.
+                        db = SessionLocal()
+                        try:
+                            content_crud.create_generated_content(
+                                db=db, user_id=user_id, content_data=self._build_history_entry(request, item, usage.calls)
+                            )
+                        finally:
+                            db.close()
+                        logger.info(f"Post de LinkedIn (streaming) guardado en el historial para el usuario {user_id}")
+                        yield format_sse_event("done", item.model_dump(mode="json"))
+                    else:
+                        yield format_sse_event("token", {"text": item})
+        except Exception as e:
+            logger.error(f"Servicio LinkedIn: Error durante el streaming del post: {str(e)}", exc_info=True)
+            yield format_sse_event("error", {"detail": str(e)})
@@ -71,6 +71,8 @@ CREATE TABLE IF NOT EXISTS generated_content (
     generated_text_main TEXT NOT NULL,
     generated_text_summary TEXT,
     researched_content_summary TEXT,
+    generation_group_id UUID,
+    variant_index INTEGER,
 
     created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
     updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
@@ -94,6 +96,31 @@ CREATE TABLE IF NOT EXISTS content_tags (
     PRIMARY KEY (content_id, tag_id)
 );
 
+-- Uso de cada llamada al LLM (tokens, latencia, intentos y coste) por generación guardada
+CREATE TABLE IF NOT EXISTS generation_llm_usage (
+    usage_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    content_id UUID NOT NULL REFERENCES generated_content(content_id) ON DELETE CASCADE,
+    step VARCHAR(50) NOT NULL, -- 'linkedin_post', 'web_research', 'pdf_transform', 'article', 'summary'...
+    model_name VARCHAR(100) NOT NULL,
+    prompt_tokens INTEGER DEFAULT 0 NOT NULL,
+    completion_tokens INTEGER DEFAULT 0 NOT NULL,
+    cached_tokens INTEGER DEFAULT 0 NOT NULL,
+    latency_ms FLOAT DEFAULT 0 NOT NULL,
+    attempts INTEGER DEFAULT 1 NOT NULL, -- Intentos al proveedor (reintentos y coberturas incluidos)
+    cache_hit BOOLEAN DEFAULT FALSE NOT NULL,
+    cost_usd FLOAT DEFAULT 0 NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+-- Tabla de estado compartido del limitador de tasa de llamadas LLM (token bucket por modelo)
+CREATE TABLE IF NOT EXISTS llm_rate_limit_buckets (
+    model_name VARCHAR(100) PRIMARY KEY,
+    request_tokens FLOAT NOT NULL,
+    token_tokens FLOAT NOT NULL,
+    blocked_until TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
 -- Índices para mejorar el rendimiento de las búsquedas comunes
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_user_preferences_user_id ON user_preferences(user_id);
@@ -102,6 +129,8 @@ CREATE INDEX IF NOT EXISTS idx_system_prompt_templates_module_style ON system_pr
 CREATE INDEX IF NOT EXISTS idx_user_custom_prompts_user_id ON user_custom_prompts(user_id);
 CREATE INDEX IF NOT EXISTS idx_generated_content_user_id ON generated_content(user_id);
 CREATE INDEX IF NOT EXISTS idx_generated_content_content_type ON generated_content(content_type);
+CREATE INDEX IF NOT EXISTS idx_generated_content_generation_group_id ON generated_content(generation_group_id);
+CREATE INDEX IF NOT EXISTS idx_generation_llm_usage_content_id ON generation_llm_usage(content_id);
 CREATE INDEX IF NOT EXISTS idx_tags_user_id_tag_name ON tags(user_id, tag_name);
 CREATE INDEX IF NOT EXISTS idx_content_tags_content_id ON content_tags(content_id);
 CREATE INDEX IF NOT EXISTS idx_content_tags_tag_id ON content_tags(tag_id);
@@ -167,4 +196,4 @@ COMMENT ON COLUMN generated_content.custom_title IS 'Título opcional que el usu
 COMMENT ON COLUMN generated_content.urls_researched IS 'Lista de URLs usadas para investigación en blogs de interés general (formato JSON).';
 COMMENT ON TABLE tags IS 'Almacena las etiquetas creadas por los usuarios para organizar su contenido.';
 COMMENT ON TABLE content_tags IS 'Tabla de unión para la relación muchos-a-muchos entre contenido generado y etiquetas.';
-
+COMMENT ON TABLE llm_rate_limit_buckets IS 'Estado compartido entre workers y nodos del token bucket (RPM/TPM) por modelo LLM.';
@@ -13,5 +13,7 @@ GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE user_custom_prompts TO app_user;
 GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE generated_content TO app_user;
 GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE tags TO app_user;
 GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE content_tags TO app_user;
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE generation_llm_usage TO app_user;
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE llm_rate_limit_buckets TO app_user;
 
 GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO app_user;
\ No newline at end of file
@@ -5,6 +5,8 @@ from typing import Optional, List, Dict, Any
 import uuid
 from datetime import datetime
 
+from schemas.usage_schemas import LLMCallUsage
+
 # Si WebResearchOptions se define en blog.models.blog_models y se usa en el payload de entrada,
 # es mejor importarlo desde allí. Si solo se usa para el tipo de web_research_options_used,
 # un Dict[str, Any] es suficiente para el schema de historial.
@@ -31,9 +33,12 @@ class GeneratedContentBase(BaseModel):
     generated_text_main: str
     generated_text_summary: Optional[str] = None
     researched_content_summary: Optional[str] = None
+    generation_group_id: Optional[uuid.UUID] = None
+    variant_index: Optional[int] = None
 
 class GeneratedContentCreate(GeneratedContentBase):
-    pass 
+    # Uso de LLM de la generación por paso; se guarda en generation_llm_usage, no en generated_content
+    llm_usage: Optional[List[LLMCallUsage]] = None
 
 class GeneratedContentResponse(GeneratedContentBase):
     content_id: uuid.UUID
@@ -41,6 +46,7 @@ class GeneratedContentResponse(GeneratedContentBase):
     created_at: datetime
     updated_at: datetime
     is_deleted: bool
+    llm_usage: List[LLMCallUsage] = [] # Vacío en las variantes hermanas: el uso se imputa a la variante 0
     class Config:
         from_attributes = True
 
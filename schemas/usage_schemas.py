@@ -0,0 +1,53 @@
+# NUEVO ARCHIVO para la telemetría de uso de LLM (tokens, latencia, coste) por generación
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+import uuid
+from datetime import datetime
+
+class LLMCallUsage(BaseModel):
+    """Uso de una llamada al LLM dentro de una generación (un paso del pipeline)."""
+    step: str = Field(description="Paso del pipeline: 'linkedin_post', 'web_research', 'pdf_transform', 'article', 'summary'...")
+    model_name: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_ms: float = 0.0
+    attempts: int = Field(default=1, description="Intentos al proveedor, incluidos reintentos y coberturas (0 si se sirvió de caché).")
+    cache_hit: bool = False
+    cost_usd: float = 0.0
+
+    class Config:
+        from_attributes = True
+
+class StepUsageSummary(BaseModel):
+    """Uso agregado de un paso (puede haber varias llamadas, p. ej. un resumen por variante)."""
+    step: str
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    latency_ms: float
+    cost_usd: float
+
+class UsageAggregateItem(BaseModel):
+    """Uso agregado por usuario y modelo (y opcionalmente por tipo de contenido)."""
+    user_id: Optional[uuid.UUID] = None
+    model_name: str
+    content_type: Optional[str] = None
+    generations: int
+    llm_calls: int
+    cache_hits: int
+    retries: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    cached_token_ratio: Optional[float] = None # cached_tokens / prompt_tokens (aciertos de la caché de prompts del proveedor)
+    cost_usd: float
+    avg_latency_ms: Optional[float] = None
+
+class UsageReportResponse(BaseModel):
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    items: List[UsageAggregateItem]
+    total_cost_usd: float
@@ -0,0 +1,66 @@
+import asyncio
+import random
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from common.services.llm_client_registry import llm_client_registry
+from common.services.llm_response_cache import llm_response_cache
+from common.services.llm_rate_limiter import llm_rate_limiter, LocalBucketBackend
+from core.config import settings
+
+
+FAKE_USAGE = {"input_tokens": 40, "output_tokens": 10}
+
+
+class FakeChatModel:
+    """
+    Sustituto de ChatOpenAI que responde con los parámetros recibidos en la llamada (y un uso fijo
+    de tokens), tras una espera aleatoria para que las corrutinas concurrentes se entrelacen.
+    """
+
+    def __init__(self, model_name: str, calls: List[Dict[str, Any]]):
+        self.model_name = model_name
+        self.calls = calls
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(random.uniform(0, 0.01))
+        call = {"model": self.model_name, "messages": messages, **kwargs}
+        self.calls.append(call)
+        content = f"model={self.model_name}|temperature={kwargs.get('temperature')}|max_tokens={kwargs.get('max_tokens')}"
+        return SimpleNamespace(content=content, usage_metadata=dict(FAKE_USAGE))
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    """Evita que las respuestas cacheadas en un test afecten a otro."""
+    llm_response_cache.clear()
+    yield
+    llm_response_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def local_rate_limiter(monkeypatch):
+    """
+    Los tests no disponen de Postgres: el limitador usa buckets en memoria nuevos en cada test,
+    con límites holgados para que los tests de carga no queden retenidos por el TPM por defecto.
+    """
+    local_backend = LocalBucketBackend()
+    monkeypatch.setattr(llm_rate_limiter, "local_backend", local_backend)
+    monkeypatch.setattr(llm_rate_limiter, "backend", local_backend)
+    monkeypatch.setattr(settings, "LLM_DEFAULT_RPM", 1_000_000)
+    monkeypatch.setattr(settings, "LLM_DEFAULT_TPM", 1_000_000_000)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Sustituye los clientes del registro por FakeChatModel y devuelve la lista de llamadas realizadas."""
+    calls: List[Dict[str, Any]] = []
+    clients: Dict[str, FakeChatModel] = {}
+
+    def get_client(model_name: str) -> FakeChatModel:
+        return clients.setdefault(model_name, FakeChatModel(model_name, calls))
+
+    monkeypatch.setattr(llm_client_registry, "get_client", get_client)
+    return calls
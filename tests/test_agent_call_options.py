@@ -0,0 +1,70 @@
+import asyncio
+import random
+
+from blog.agents.blog_agent import BlogAgent
+from blog.models.blog_models import SuccessCaseBlogRequest
+from common.utils.helpers import format_content_for_readability
+from core.config import settings
+from linkedin.agents.linkedin_agent import LinkedInAgent
+from linkedin.models.linkedin_models import LinkedInPostRequestRefactored
+
+
+def _expected(model_key: str, temperature: float, max_tokens: int) -> str:
+    return f"model={settings.MODEL_MAPPING[model_key]}|temperature={temperature}|max_tokens={max_tokens}"
+
+
+def test_shared_linkedin_agent_never_mixes_settings_between_concurrent_requests(fake_llm):
+    agent = LinkedInAgent(model_identifier="Default", temperature=0.7)
+    requests = [
+        LinkedInPostRequestRefactored(
+            human_prompt=f"Tema {i}",
+            model=random.choice(["Default", "Pablo", "Aitor"]),
+            system_prompt="Eres un experto en LinkedIn.",
+            temperature=round(random.uniform(0, 1), 2),
+        )
+        for i in range(200)
+    ]
+
+    async def run():
+        return await asyncio.gather(*(agent.generate_post_refactored(request) for request in requests))
+
+    responses = asyncio.run(run())
+
+    assert len(fake_llm) == len(requests)
+    for request, response in zip(requests, responses):
+        assert response.generated_post == _expected(request.model, request.temperature, settings.DEFAULT_MAX_TOKENS)
+        assert response.actual_model_name_used == settings.MODEL_MAPPING[request.model]
+        assert response.temperature_used == request.temperature
+    # El agente compartido conserva sus valores por defecto
+    assert agent.model_name == settings.MODEL_MAPPING["Default"]
+    assert agent.temperature == 0.7
+
+
+def test_shared_blog_agent_keeps_article_and_summary_settings_isolated(fake_llm):
+    agent = BlogAgent(model_identifier="Default", temperature=0.7)
+    requests = [
+        SuccessCaseBlogRequest(
+            human_prompt=f"Caso {i}",
+            model=random.choice(["Default", "Pablo", "Aitor"]),
+            system_prompt="Eres un redactor de casos de éxito.",
+            temperature=round(random.uniform(0, 1), 2),
+            max_tokens_article=random.randint(500, 3000),
+            max_tokens_summary=random.randint(100, 400),
+        )
+        for i in range(100)
+    ]
+
+    async def run():
+        return await asyncio.gather(*(agent.generate_success_case_article(request) for request in requests))
+
+    responses = asyncio.run(run())
+
+    for request, response in zip(requests, responses):
+        # Los artículos de blog pasan por format_content_for_readability antes de devolverse
+        assert response.full_article == format_content_for_readability(
+            _expected(request.model, request.temperature, request.max_tokens_article)
+        )
+        assert response.summary_article == format_content_for_readability(
+            _expected(request.model, request.temperature, request.max_tokens_summary)
+        )
+    assert agent.max_tokens == settings.DEFAULT_MAX_TOKENS
@@ -0,0 +1,41 @@
+import asyncio
+
+from blog.agents.blog_agent import BlogAgent
+from blog.models.blog_models import GeneralInterestBlogRequest
+
+_CHUNKS = [["Los sensores de vibración anticipan averías."], ["El mantenimiento predictivo reduce paradas."]]
+
+
+def _failing_agent(monkeypatch, failing_steps):
+    agent = BlogAgent("Default", 0.7)
+
+    async def call(system_prompt, human_prompt, options=None):
+        if options.step in failing_steps:
+            raise RuntimeError("proveedor caído")
+        return f"resumen ({options.step})"
+
+    monkeypatch.setattr(agent, "_call_llm_with_prompts", call)
+    return agent
+
+
+def test_failed_single_call_research_is_skipped(monkeypatch):
+    agent = _failing_agent(monkeypatch, {"web_research"})
+
+    assert asyncio.run(agent._research_urls("mantenimiento", _CHUNKS, mode="single")) is None
+
+
+def test_failed_reduce_phase_is_skipped(monkeypatch):
+    agent = _failing_agent(monkeypatch, {"web_research"})
+
+    assert asyncio.run(agent._research_urls("mantenimiento", _CHUNKS, mode="map_reduce")) is None
+
+
+def test_article_prompt_has_no_research_section_without_research():
+    agent = BlogAgent("Default", 0.7)
+    request = GeneralInterestBlogRequest(
+        human_prompt="Escribe sobre mantenimiento predictivo", system_prompt="Eres un redactor técnico.", model="Default"
+    )
+
+    _, human_prompt, _ = agent._build_general_interest_prompt(request, None)
+
+    assert human_prompt == request.human_prompt
@@ -0,0 +1,132 @@
+import re
+
+import pytest
+
+from common.services.context_budget import FALLBACK_CHARS_PER_TOKEN, ContextBudgetManager, ContextSegment
+
+MODEL = "test-model"
+
+
+class _WordEncoding:
+    """Codificación de prueba: un token por palabra (con el espacio que la precede)."""
+
+    def encode(self, text, disallowed_special=()):
+        return re.findall(r"\s*\S+|\s+", text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def _manager(context_window: int = 100) -> ContextBudgetManager:
+    manager = ContextBudgetManager(
+        context_windows={MODEL: context_window, "gpt-4o": 128_000}, default_context_window=8_000, safety_margin_tokens=10
+    )
+    manager._encodings[MODEL] = _WordEncoding() # Sin red para descargar las codificaciones de tiktoken
+    return manager
+
+
+def _words(count: int, word: str = "palabra") -> str:
+    return " ".join(f"{word}{index}" for index in range(count))
+
+
+def test_context_window_resolves_snapshots_fine_tunes_and_unknown_models():
+    manager = _manager()
+
+    assert manager.context_window("gpt-4o-2024-08-06") == 128_000
+    assert manager.context_window("ft:gpt-4o-2024-08-06:org:nombre:id") == 128_000
+    assert manager.context_window("modelo-desconocido") == 8_000
+    assert manager.input_budget(MODEL, max_output_tokens=30) == 60
+
+
+def test_truncation_cuts_at_token_boundaries():
+    manager = _manager()
+
+    assert manager.truncate_to_tokens("uno dos tres cuatro", 2, MODEL) == ("uno dos", 2)
+    assert manager.truncate_to_tokens("uno dos", 5, MODEL) == ("uno dos", 0)
+    assert manager.truncate_to_tokens("uno dos", 0, MODEL) == ("", 2)
+
+
+def test_character_estimate_is_used_without_tokenizer():
+    manager = _manager()
+    manager._encoding_unavailable = True
+    text = "a" * 10
+
+    assert manager.count_tokens(text, MODEL) == 4 # Redondea por exceso
+    assert manager.truncate_to_tokens(text, 2, MODEL) == ("a" * 2 * FALLBACK_CHARS_PER_TOKEN, 2)
+    assert manager.get_stats()["tokenizer"] == "estimacion_por_caracteres"
+
+
+def test_pack_fills_optional_segments_by_priority_and_reports_drops():
+    manager = _manager()
+    segments = [
+        ContextSegment("system", _words(10, "sys"), required=True),
+        ContextSegment("pdf", _words(40, "pdf"), priority=2),
+        ContextSegment("research", _words(40, "web"), priority=1, group="research"),
+    ]
+
+    packed = manager.pack(MODEL, max_output_tokens=30, segments=segments) # 60 tokens de entrada
+
+    assert packed.texts["system"] == segments[0].text
+    assert packed.texts["research"] == segments[2].text # Menor prioridad = se incluye antes
+    assert packed.texts["pdf"] == _words(10, "pdf")
+    assert packed.report.used_tokens == 60
+    assert packed.report.dropped_tokens == {"pdf": 30}
+    assert manager.get_stats()["calls_with_drops"] == 1
+
+
+def test_segment_and_group_limits_cap_optional_text():
+    manager = _manager(context_window=1_000)
+    segments = [
+        ContextSegment("research_0", _words(20, "a"), group="research"),
+        ContextSegment("research_1", _words(20, "b"), group="research"),
+        ContextSegment("pdf", _words(20, "pdf"), max_tokens=5),
+    ]
+
+    packed = manager.pack(MODEL, max_output_tokens=100, segments=segments, group_limits={"research": 25})
+
+    assert packed.texts["research_0"] == _words(20, "a")
+    assert packed.texts["research_1"] == _words(5, "b")
+    assert packed.texts["pdf"] == _words(5, "pdf")
+    assert packed.report.dropped_tokens == {"research": 15, "pdf": 15}
+
+
+def test_optional_segments_are_emptied_when_the_budget_is_spent():
+    manager = _manager()
+    segments = [
+        ContextSegment("user", _words(60, "user"), required=True),
+        ContextSegment("research", _words(10, "web")),
+    ]
+
+    packed = manager.pack(MODEL, max_output_tokens=30, segments=segments)
+
+    assert packed.texts["research"] == ""
+    assert packed.report.dropped_tokens == {"research": 10}
+
+
+def test_required_segments_over_budget_raise():
+    manager = _manager()
+
+    with pytest.raises(ValueError, match="no cabe"):
+        manager.pack(MODEL, max_output_tokens=30, segments=[ContextSegment("user", _words(61), required=True)])
+    assert manager.get_stats()["packed_calls"] == 0
+
+
+def test_split_to_tokens_prefers_paragraph_and_line_boundaries():
+    manager = _manager()
+    paragraphs = [_words(4, "a"), _words(4, "b"), _words(12, "c") + "\n" + _words(3, "d")]
+    text = "\n\n".join(paragraphs)
+
+    sections = manager.split_to_tokens(text, 10, MODEL)
+
+    assert sections[0] == "\n\n".join(paragraphs[:2]) # Dos párrafos caben juntos
+    assert all(manager.count_tokens(section, MODEL) <= 10 for section in sections)
+    # Sin perder ni duplicar palabras: el párrafo largo se parte por líneas y, dentro de la línea, por tokens
+    assert " ".join(" ".join(sections).split()) == " ".join(text.split())
+
+
+def test_split_to_tokens_always_advances_with_tiny_limits():
+    manager = _manager()
+
+    sections = manager.split_to_tokens("abcdef", 0, MODEL)
+
+    assert "".join(sections) == "abcdef"
@@ -0,0 +1,119 @@
+import asyncio
+import uuid
+
+import pytest
+
+from blog.models.blog_models import GeneralInterestBlogRequest
+from blog.services.blog_service import BlogService
+from core.models import GeneratedContent, GenerationLLMUsage
+from linkedin.models.linkedin_models import LinkedInBatchPostRequest, LinkedInPostRequestRefactored
+from linkedin.services.linkedin_service import LinkedInService
+
+USER_ID = uuid.uuid4()
+
+
+class FakeSession:
+    """Sesión de SQLAlchemy mínima: registra los INSERT en bloque y los commit/rollback (los tests no tienen Postgres)."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.inserts = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def execute(self, statement, rows):
+        if self.fail:
+            raise RuntimeError("conexión perdida")
+        self.inserts.append((statement.table.name, rows))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def rows(self, model):
+        return [row for table, rows in self.inserts if table == model.__tablename__ for row in rows]
+
+
+def _linkedin_batch(prompts):
+    return LinkedInBatchPostRequest(items=[
+        LinkedInPostRequestRefactored(human_prompt=prompt, model="Default", system_prompt="Eres un redactor de LinkedIn.")
+        for prompt in prompts
+    ])
+
+
+def _service_failing_on(monkeypatch, failing_prompt: str) -> LinkedInService:
+    service = LinkedInService()
+    generate = service.agent.generate_post_refactored
+
+    async def generate_or_fail(request):
+        if request.human_prompt == failing_prompt:
+            raise RuntimeError("proveedor caído")
+        return await generate(request)
+
+    monkeypatch.setattr(service.agent, "generate_post_refactored", generate_or_fail)
+    return service
+
+
+def test_linkedin_batch_saves_the_generated_posts_when_one_item_fails(fake_llm, monkeypatch):
+    service = _service_failing_on(monkeypatch, "post 1")
+    db = FakeSession()
+
+    response = asyncio.run(service.generate_posts_batch_service_method(_linkedin_batch(["post 0", "post 1", "post 2"]), db, USER_ID))
+
+    assert (response.total, response.succeeded, response.failed) == (3, 2, 1)
+    failed = response.results[1]
+    assert not failed.success and failed.error == "proveedor caído" and failed.content_id is None
+    saved = db.rows(GeneratedContent)
+    # Un único INSERT (y un único commit) con los posts generados, en el orden del lote
+    assert [row["human_prompt_used"] for row in saved] == ["post 0", "post 2"]
+    assert db.commits == 1
+    assert [response.results[0].content_id, response.results[2].content_id] == [row["content_id"] for row in saved]
+    assert {row["content_id"] for row in db.rows(GenerationLLMUsage)} == {row["content_id"] for row in saved}
+    assert len(fake_llm) == 2
+
+
+def test_linkedin_batch_returns_generated_posts_with_history_error_when_saving_fails(fake_llm):
+    service = LinkedInService()
+    db = FakeSession(fail=True)
+
+    response = asyncio.run(service.generate_posts_batch_service_method(_linkedin_batch(["post 0", "post 1"]), db, USER_ID))
+
+    assert response.succeeded == 2
+    assert db.rollbacks == 1 and db.commits == 0
+    for result in response.results:
+        assert result.result.generated_post # Los posts ya generados no se pierden
+        assert result.content_id is None
+        assert result.history_error == "No se pudo guardar en el historial: conexión perdida"
+
+
+def test_linkedin_batch_with_every_item_failing_does_not_touch_the_history(monkeypatch):
+    service = _service_failing_on(monkeypatch, "post 0")
+    db = FakeSession()
+
+    response = asyncio.run(service.generate_posts_batch_service_method(_linkedin_batch(["post 0"]), db, USER_ID))
+
+    assert (response.succeeded, response.failed) == (0, 1)
+    assert db.inserts == [] and db.commits == 0
+
+
+def _blog_request(prompt: str) -> GeneralInterestBlogRequest:
+    return GeneralInterestBlogRequest(human_prompt=prompt, model="Default", system_prompt="Eres un redactor técnico.")
+
+
+def test_blog_article_is_saved_with_a_single_bulk_insert(fake_llm):
+    db = FakeSession()
+
+    response = asyncio.run(BlogService().generate_general_interest_article(_blog_request("mantenimiento"), db, USER_ID))
+
+    saved = db.rows(GeneratedContent)
+    assert [row["generated_text_main"] for row in saved] == [response.generated_article]
+    assert db.commits == 1
+    assert db.rows(GenerationLLMUsage)[0]["content_id"] == saved[0]["content_id"]
+
+
+def test_blog_article_save_failure_is_raised_to_the_caller(fake_llm):
+    # Sin lote no hay resultados parciales que devolver: el error de guardado llega a la ruta
+    with pytest.raises(RuntimeError, match="conexión perdida"):
+        asyncio.run(BlogService().generate_general_interest_article(_blog_request("calidad"), FakeSession(fail=True), USER_ID))
@@ -0,0 +1,115 @@
+from common.utils.helpers import extract_text_from_html
+from common.utils.html_extraction import extract_main_text
+from core.config import settings
+
+_PARAGRAPHS = [
+    "Los sensores de vibración instalados en los motores de la línea de envasado detectan, con semanas de margen, "
+    "los patrones que preceden a una avería de rodamientos.",
+    "Con esos datos, el equipo de mantenimiento planifica las sustituciones en las paradas programadas, reduce las "
+    "intervenciones urgentes y, sobre todo, evita perder lotes completos de producto.",
+    "El modelo se reentrena cada mes con las nuevas lecturas, de modo que se adapta a los cambios de carga, a la "
+    "temperatura ambiente y al desgaste normal de cada máquina.",
+]
+
+_PAGE = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+  <title>Mantenimiento predictivo | Blog</title>
+  <style>.menu {{ display: flex; }}</style>
+  <script>window.dataLayer = window.dataLayer || []; gtag('config', 'G-XXXX');</script>
+</head>
+<body>
+  <header class="site-header">
+    <a href="/">Inicio</a>
+    <nav><ul><li><a href="/soluciones">Soluciones</a></li><li><a href="/blog">Blog</a></li></ul></nav>
+  </header>
+  <div id="cookie-banner">Usamos cookies propias y de terceros para analizar la navegación.</div>
+  <main>
+    <article class="post">
+      <header><h1>Cómo anticipar averías con mantenimiento predictivo</h1></header>
+      <section class="entry-content">
+        <p>{_PARAGRAPHS[0]}</p>
+        <p>{_PARAGRAPHS[1]}</p>
+        <div><p>{_PARAGRAPHS[2]}</p></div>
+      </section>
+      <div class="share-buttons"><a href="#">Compartir en LinkedIn</a><a href="#">Compartir en X</a></div>
+    </article>
+  </main>
+  <aside class="sidebar">
+    <h3>Entradas recientes</h3>
+    <ul><li><a href="/a">Visión artificial en la inspección de calidad de las piezas de fundición</a></li></ul>
+  </aside>
+  <div class="related-posts">
+    <a href="/b">Gemelos digitales para plantas de tratamiento de agua: primeros pasos</a>
+    <a href="/c">Cinco indicadores para medir la eficiencia global de los equipos (OEE)</a>
+  </div>
+  <div hidden>Texto oculto que no se muestra al lector.</div>
+  <footer><p>© 2025 Empresa. Todos los derechos reservados. Aviso legal, política de privacidad y cookies.</p></footer>
+</body>
+</html>
+"""
+
+
+def test_main_content_keeps_title_and_article_paragraphs():
+    text = extract_main_text(_PAGE)
+    lines = text.splitlines()
+
+    assert lines[0] == "Cómo anticipar averías con mantenimiento predictivo"
+    assert lines[1:] == _PARAGRAPHS # Sin duplicar el texto de los bloques anidados
+
+
+def test_scripts_styles_banners_and_hidden_blocks_are_removed():
+    text = extract_main_text(_PAGE)
+
+    for boilerplate in ("dataLayer", "display: flex", "cookies propias", "Texto oculto", "Compartir en LinkedIn"):
+        assert boilerplate not in text
+
+
+def test_navigation_sidebar_related_links_and_footer_are_pruned():
+    text = extract_main_text(_PAGE)
+
+    for boilerplate in ("Soluciones", "Entradas recientes", "Visión artificial", "Gemelos digitales", "Aviso legal"):
+        assert boilerplate not in text
+
+
+def test_page_builder_widget_wrappers_keep_their_content():
+    # HubSpot/Elementor envuelven cada módulo en clases "*_widget"; no son barras laterales
+    paragraphs = "".join(f"<p>{paragraph}</p>" for paragraph in _PARAGRAPHS)
+    html = (
+        '<html><body><div class="row-fluid"><div class="widget-span widget-type-custom_widget">'
+        f'<div class="hs_cos_wrapper hs_cos_wrapper_widget"><div class="rich-text">{paragraphs}</div></div>'
+        "</div></div></body></html>"
+    )
+
+    assert extract_main_text(html).splitlines() == _PARAGRAPHS
+
+
+def test_max_chars_truncates_the_result():
+    assert extract_main_text(_PAGE, max_chars=60) == extract_main_text(_PAGE)[:60]
+
+
+def test_long_pages_are_cut_at_max_chars():
+    body = "".join(f"<p>Párrafo {index}: {_PARAGRAPHS[index % 3]}</p>" for index in range(2000))
+    html = f"<html><body><article>{body}</article></body></html>"
+
+    text = extract_main_text(html, max_chars=1000)
+
+    assert len(text) == 1000
+    assert text.startswith("Párrafo 0:")
+
+
+def test_bs4_engine_is_kept_and_truncated_like_readability(monkeypatch):
+    monkeypatch.setattr(settings, "HTML_EXTRACT_MAX_CHARS", 120)
+
+    bs4_text = extract_text_from_html(_PAGE, engine="bs4")
+    readability_text = extract_text_from_html(_PAGE, engine="readability")
+
+    assert len(bs4_text) == len(readability_text) == 120
+    assert "Soluciones" in bs4_text # El extractor original no poda los menús
+
+
+def test_regex_fallback_when_no_content_block_is_found():
+    html = "<html><head><script>var a = 1;</script></head><body><nav>Inicio · Productos · Contacto</nav></body></html>"
+
+    assert extract_main_text(html) == ""
+    assert extract_text_from_html(html, engine="readability") == "Inicio · Productos · Contacto"
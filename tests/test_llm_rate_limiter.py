@@ -0,0 +1,227 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from common.base_agent import LLMCallOptions
+from common.services.llm_rate_limiter import (
+    AdaptiveConcurrency,
+    LLMRateLimiter,
+    LLMRateLimitTimeoutError,
+    LocalBucketBackend,
+    RateLimit,
+    _take_from_bucket,
+    get_rate_limit,
+    llm_rate_limiter,
+)
+from core.config import settings
+from linkedin.agents.linkedin_agent import LinkedInAgent
+
+
+def test_bucket_grants_until_empty_and_reports_refill_wait():
+    limits = RateLimit(rpm=60, tpm=6000) # 1 petición/s y 100 tokens/s
+
+    requests, tokens, wait = _take_from_bucket(60, 6000, 0, limits, 5000)
+    assert (requests, tokens, wait) == (59, 1000, 0.0)
+
+    requests, tokens, wait = _take_from_bucket(requests, tokens, 0, limits, 1500)
+    assert wait == pytest.approx(5.0) # Faltan 500 tokens a 100 tokens/s
+    assert tokens == 1000 # Sin conceder no se consume nada
+
+    _, tokens, wait = _take_from_bucket(requests, tokens, 5.0, limits, 1500)
+    assert wait == 0.0
+    assert tokens == pytest.approx(0)
+
+
+def test_bucket_refill_is_capped_and_oversized_requests_are_clamped():
+    limits = RateLimit(rpm=60, tpm=6000)
+
+    _, tokens, _ = _take_from_bucket(0, 0, 3600, limits, 0)
+    assert tokens == 6000 # La recarga nunca supera la capacidad
+
+    _, tokens, wait = _take_from_bucket(60, 6000, 0, limits, 50_000)
+    assert wait == 0.0 # Una petición mayor que el bucket se limita a su capacidad
+    assert tokens == 0
+
+
+def test_bucket_waits_for_requests_per_minute():
+    limits = RateLimit(rpm=2, tpm=1_000_000)
+
+    requests, tokens, _ = _take_from_bucket(2, 1_000_000, 0, limits, 1)
+    requests, tokens, _ = _take_from_bucket(requests, tokens, 0, limits, 1)
+    _, _, wait = _take_from_bucket(requests, tokens, 0, limits, 1)
+
+    assert wait == pytest.approx(30.0)
+
+
+def test_local_backend_block_delays_every_acquire():
+    backend = LocalBucketBackend()
+    limits = RateLimit(rpm=1000, tpm=1_000_000)
+
+    assert backend.try_acquire("gpt-4o", limits, 10) == 0.0
+    backend.block("gpt-4o", limits, 5)
+
+    assert 4 < backend.try_acquire("gpt-4o", limits, 10) <= 5
+    assert backend.try_acquire("gpt-4o-mini", limits, 10) == 0.0
+
+
+def test_configured_limits_override_defaults(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"gpt-4o": {"tpm": 800_000}})
+
+    assert get_rate_limit("gpt-4o").tpm == 800_000
+    assert get_rate_limit("gpt-4o").rpm == settings.LLM_DEFAULT_RPM
+    assert get_rate_limit("otro-modelo").tpm == settings.LLM_DEFAULT_TPM
+
+
+def test_aimd_grows_additively_and_shrinks_multiplicatively():
+    concurrency = AdaptiveConcurrency(initial=4, minimum=1, maximum=6, decrease_factor=0.5)
+
+    async def run():
+        for _ in range(5):
+            await concurrency.acquire()
+            concurrency.release(overloaded=False)
+
+    asyncio.run(run())
+    assert concurrency.current_limit == 5 # +1/límite por llamada correcta: +1 tras unas 4 llamadas
+
+    concurrency.in_flight = 1
+    concurrency.release(overloaded=True)
+    assert concurrency.current_limit == 2
+
+    for _ in range(3):
+        concurrency.in_flight = 1
+        concurrency.release(overloaded=True)
+    assert concurrency.current_limit == 1 # Nunca por debajo del mínimo
+
+
+def test_aimd_queues_callers_beyond_the_limit():
+    concurrency = AdaptiveConcurrency(initial=2, minimum=1, maximum=2, decrease_factor=0.5)
+    peak = 0
+
+    async def worker():
+        nonlocal peak
+        await concurrency.acquire()
+        peak = max(peak, concurrency.in_flight)
+        await asyncio.sleep(0.01)
+        concurrency.release(overloaded=False)
+
+    async def run():
+        await asyncio.gather(*(worker() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert concurrency.in_flight == 0
+    assert concurrency.queued == 0
+
+
+
+def test_aimd_wait_for_a_slot_is_bounded():
+    concurrency = AdaptiveConcurrency(initial=1, minimum=1, maximum=1, decrease_factor=0.5)
+
+    async def run():
+        await concurrency.acquire()
+        await concurrency.acquire(timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert concurrency.in_flight == 1
+    assert concurrency.queued == 0
+
+
+def test_aimd_slot_of_a_cancelled_waiter_goes_to_the_next_one():
+    concurrency = AdaptiveConcurrency(initial=1, minimum=1, maximum=1, decrease_factor=0.5)
+
+    async def run():
+        await concurrency.acquire()
+        first = asyncio.ensure_future(concurrency.acquire())
+        second = asyncio.ensure_future(concurrency.acquire())
+        await asyncio.sleep(0)
+        concurrency.release(overloaded=False) # Despierta a `first`...
+        first.cancel() # ...que se cancela antes de llegar a ocupar el hueco
+        await asyncio.wait_for(second, timeout=1)
+        assert first.cancelled()
+
+    asyncio.run(run())
+    assert concurrency.in_flight == 1
+    assert concurrency.queued == 0
+
+def test_limiter_times_out_when_the_wait_exceeds_the_maximum(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"lento": {"rpm": 1000, "tpm": 600}})
+    limiter = LLMRateLimiter(enabled=True, backend_name="local")
+    limiter.max_wait_seconds = 0.5
+
+    async def run():
+        async with limiter.limit("lento", 600):
+            pass
+        async with limiter.limit("lento", 600): # Haría falta esperar 60 s a que se recargue
+            pass
+
+    with pytest.raises(LLMRateLimitTimeoutError):
+        asyncio.run(run())
+    assert limiter.get_stats()["per_model"]["lento"]["queue_timeouts"] == 1
+
+
+def test_limiter_reports_overload_and_reduces_concurrency():
+    limiter = LLMRateLimiter(enabled=True, backend_name="local")
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    error = openai.RateLimitError(
+        "429", response=httpx.Response(429, headers={"retry-after": "2"}, request=request), body=None
+    )
+
+    async def run():
+        with pytest.raises(openai.RateLimitError):
+            async with limiter.limit("gpt-4o", 10):
+                raise error
+
+    asyncio.run(run())
+    assert limiter.get_stats()["per_model"]["gpt-4o"]["overloads"] == 1
+    concurrency = limiter._get_concurrency("gpt-4o")
+    assert concurrency.limit == max(
+        settings.LLM_AIMD_MIN_CONCURRENCY, settings.LLM_AIMD_INITIAL_CONCURRENCY * concurrency.decrease_factor
+    )
+    # Retry-After bloquea el bucket del modelo
+    assert limiter.local_backend.try_acquire("gpt-4o", get_rate_limit("gpt-4o"), 10) > 1
+
+
+def test_unused_reserved_tokens_return_to_the_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {"medido": {"rpm": 1000, "tpm": 600}})
+    limiter = LLMRateLimiter(enabled=True, backend_name="local")
+    limiter.max_wait_seconds = 0.5
+
+    async def run():
+        async with limiter.limit("medido", 600) as reservation:
+            reservation.settle(100) # El proveedor informa de 100 tokens consumidos
+        async with limiter.limit("medido", 500): # Sin devolver los 500 sobrantes habría que esperar 50 s
+            pass
+
+    asyncio.run(run())
+    assert limiter.get_stats()["per_model"]["medido"]["tokens_returned"] == 500
+
+
+def test_reservation_is_kept_when_the_call_reports_no_usage():
+    limiter = LLMRateLimiter(enabled=True, backend_name="local")
+
+    async def run():
+        async with limiter.limit("gpt-4o", 100) as reservation:
+            reservation.settle(0)
+        return reservation
+
+    assert asyncio.run(run()).actual_tokens is None
+    assert limiter.get_stats()["per_model"]["gpt-4o"]["tokens_returned"] == 0
+
+
+def test_agent_calls_settle_the_reservation_with_reported_usage(fake_llm, monkeypatch):
+    agent = LinkedInAgent(model_identifier="Default", temperature=0.7)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMITS", {agent.model_name: {"rpm": 1000, "tpm": 1500}})
+    monkeypatch.setattr(llm_rate_limiter, "max_wait_seconds", 0.5)
+    options = LLMCallOptions(model_name=agent.model_name, temperature=0.7, max_tokens=1000, cache_mode="bypass")
+
+    async def run():
+        # Cada llamada reserva más de 1000 tokens pero consume 50: sin liquidar, la segunda esperaría ~40 s
+        for _ in range(3):
+            await agent._call_llm_with_prompts("system", "human", options)
+
+    asyncio.run(run())
+    assert len(fake_llm) == 3
+    assert llm_rate_limiter.get_stats()["per_model"][agent.model_name]["tokens_returned"] > 2000
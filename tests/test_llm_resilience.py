@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+
+from common.services import llm_resilience as resilience_module
+from common.services.llm_resilience import LLMResilience, _Budget
+
+
+def _timeout() -> httpx.TimeoutException:
+    return httpx.ReadTimeout("timeout")
+
+
+def _resilience(max_attempts: int = 3, hedging_enabled: bool = False) -> LLMResilience:
+    return LLMResilience(max_attempts=max_attempts, base_delay=0, max_delay=0, hedging_enabled=hedging_enabled)
+
+
+def test_budget_limits_extra_attempts_to_a_fraction_of_calls(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(resilience_module.time, "monotonic", lambda: now[0])
+    budget = _Budget(ratio=0.25, min_per_second=0.5, capacity=2)
+
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+
+    for _ in range(4):
+        budget.deposit() # 4 llamadas x 0.25 = 1 crédito
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+    now[0] += 2 # Recarga mínima: 0.5 créditos/s
+    assert budget.try_spend()
+
+
+def test_backoff_is_jittered_bounded_and_respects_retry_after():
+    resilience = LLMResilience(max_attempts=3, base_delay=1, max_delay=4, hedging_enabled=False)
+
+    delays = [resilience.backoff_delay(attempt) for attempt in (1, 2, 3, 10) for _ in range(50)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert max(resilience.backoff_delay(1) for _ in range(50)) <= 1
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    error = httpx.HTTPStatusError(
+        "429", request=request, response=httpx.Response(429, headers={"retry-after": "7"}, request=request)
+    )
+    assert resilience.backoff_delay(1, error) == 7
+
+
+def test_transient_errors_are_retried_until_success():
+    resilience = _resilience()
+    attempts = []
+
+    async def attempt():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _timeout()
+        return "ok"
+
+    assert asyncio.run(resilience.call("gpt-4o", attempt)) == "ok"
+    assert resilience.get_stats()["per_model"]["gpt-4o"]["retries"] == 2
+
+
+def test_non_transient_errors_and_last_attempt_are_not_retried():
+    resilience = _resilience(max_attempts=2)
+    attempts = []
+
+    async def invalid():
+        attempts.append(1)
+        raise ValueError("petición inválida")
+
+    async def always_timeout():
+        attempts.append(1)
+        raise _timeout()
+
+    with pytest.raises(ValueError):
+        asyncio.run(resilience.call("gpt-4o", invalid))
+    assert len(attempts) == 1
+
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(resilience.call("gpt-4o", always_timeout))
+    assert len(attempts) == 3
+
+
+def test_exhausted_retry_budget_stops_retrying():
+    resilience = _resilience(max_attempts=5)
+    resilience._retry_budgets["gpt-4o"] = _Budget(ratio=0, min_per_second=0, capacity=1)
+    attempts = []
+
+    async def always_timeout():
+        attempts.append(1)
+        raise _timeout()
+
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(resilience.call("gpt-4o", always_timeout))
+    assert len(attempts) == 2 # Un único reintento: el crédito inicial del presupuesto
+    assert resilience.get_stats()["per_model"]["gpt-4o"]["retry_budget_exhausted"] == 1
+
+
+def test_slow_attempt_is_hedged_and_the_loser_cancelled(monkeypatch):
+    resilience = _resilience(hedging_enabled=True)
+    monkeypatch.setattr(resilience, "hedge_delay", lambda model_name, first_token=False: 0.01)
+    started = []
+    cancelled = []
+
+    async def attempt():
+        index = len(started)
+        started.append(index)
+        try:
+            await asyncio.sleep(1 if index == 0 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        return f"intento {index}"
+
+    assert asyncio.run(resilience.call("gpt-4o", attempt)) == "intento 1"
+    assert cancelled == [0]
+    stats = resilience.get_stats()["per_model"]["gpt-4o"]
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_no_hedge_without_hedge_budget(monkeypatch):
+    resilience = _resilience(hedging_enabled=True)
+    monkeypatch.setattr(resilience, "hedge_delay", lambda model_name, first_token=False: 0.001)
+    resilience._hedge_budgets["gpt-4o"] = _Budget(ratio=0, min_per_second=0, capacity=0)
+    started = []
+
+    async def attempt():
+        started.append(1)
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    assert asyncio.run(resilience.call("gpt-4o", attempt)) == "ok"
+    assert len(started) == 1
+    assert resilience.get_stats()["per_model"]["gpt-4o"]["hedge_budget_exhausted"] == 1
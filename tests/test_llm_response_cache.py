@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from common.base_agent import LLMCallOptions
+from common.services import llm_response_cache as cache_module
+from common.services.llm_response_cache import LLMCacheMissError, LLMResponseCache
+from linkedin.agents.linkedin_agent import LinkedInAgent
+
+
+def test_key_depends_on_every_call_parameter():
+    base = ("gpt-4o", 0.7, 500, "system", "human")
+    key = LLMResponseCache.make_key(*base)
+
+    assert LLMResponseCache.make_key(*base) == key
+    assert LLMResponseCache.make_key("gpt-4o-mini", 0.7, 500, "system", "human") != key
+    assert LLMResponseCache.make_key("gpt-4o", 0.2, 500, "system", "human") != key
+    assert LLMResponseCache.make_key("gpt-4o", 0.7, 600, "system", "human") != key
+    assert LLMResponseCache.make_key("gpt-4o", 0.7, 500, "system ", "human") != key
+    assert LLMResponseCache.make_key(*base, num_variants=2) != key
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=60, enabled=True)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A" # "a" pasa a ser la más reciente
+
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = LLMResponseCache(max_entries=10, ttl_seconds=30, enabled=True)
+    cache.set("key", "value")
+
+    now[0] += 29
+    assert cache.get("key") == "value"
+    now[0] += 2
+    assert cache.get("key") is None
+    assert cache.expirations == 1
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_disabled_cache_and_empty_values_are_not_stored():
+    disabled = LLMResponseCache(max_entries=10, ttl_seconds=60, enabled=False)
+    disabled.set("key", "value")
+    assert disabled.get("key") is None
+
+    cache = LLMResponseCache(max_entries=10, ttl_seconds=60, enabled=True)
+    cache.set("key", "")
+    assert cache.get("key") is None
+
+
+def test_cache_modes_of_agent_calls(fake_llm):
+    agent = LinkedInAgent(model_identifier="Default", temperature=0.7)
+    options = agent.default_call_options
+
+    async def call(cache_mode: str) -> str:
+        return await agent._call_llm_with_prompts("system", "human", LLMCallOptions(
+            model_name=options.model_name, temperature=0, max_tokens=100, cache_mode=cache_mode
+        ))
+
+    with pytest.raises(LLMCacheMissError):
+        asyncio.run(call("only"))
+    assert len(fake_llm) == 0
+
+    first = asyncio.run(call("prefer"))
+    assert asyncio.run(call("prefer")) == first
+    assert asyncio.run(call("only")) == first
+    assert len(fake_llm) == 1
+
+    asyncio.run(call("bypass"))
+    assert len(fake_llm) == 2
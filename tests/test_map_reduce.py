@@ -0,0 +1,155 @@
+import asyncio
+
+from blog.agents.blog_agent import BlogAgent
+from blog.prompts import blog_prompts
+from common.services.context_budget import context_budget_manager
+from core.config import settings
+
+_PDF_PARAGRAPHS = [
+    f"Apartado {index}: la planta {index} instaló sensores de vibración en sus compresores y redujo las paradas "
+    f"no planificadas en un {10 + index}% durante el primer año de explotación."
+    for index in range(12)
+]
+
+_RESEARCH_TOPIC = "mantenimiento predictivo de rodamientos"
+_RESEARCH_CHUNKS = [
+    [
+        "El mantenimiento predictivo de rodamientos analiza la vibración de cada motor.",
+        "El horario de la cafetería cambia en agosto.",
+        "Los rodamientos dañados muestran picos de vibración semanas antes del fallo.",
+    ],
+    [
+        "Un programa de mantenimiento predictivo redujo un 30% las averías de la planta.",
+        "La empresa patrocina el equipo de baloncesto local.",
+        "El análisis de rodamientos combina vibración y temperatura.",
+    ],
+]
+
+
+class _FakeSteps:
+    """Sustituye _call_llm_with_prompts: registra cada llamada (paso y prompt) y la concurrencia máxima alcanzada."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, system_prompt, human_prompt, options=None):
+        self.calls.append((options.step, human_prompt))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return self.reply(options.step, human_prompt)
+        finally:
+            self.active -= 1
+
+    def prompts(self, step):
+        return [prompt for call_step, prompt in self.calls if call_step == step]
+
+
+def _agent(monkeypatch, reply):
+    agent = BlogAgent("Default", 0.7)
+    steps = _FakeSteps(reply)
+    monkeypatch.setattr(agent, "_call_llm_with_prompts", steps)
+    return agent, steps
+
+
+def _pdf_reply(failing_paragraph=None):
+    def reply(step, prompt):
+        if step == "pdf_transform_map":
+            if failing_paragraph is not None and failing_paragraph in prompt:
+                raise RuntimeError("proveedor caído")
+            return f"borrador de la sección {prompt.split()[1]}"
+        return "borrador del documento completo"
+    return reply
+
+
+def _transform_pdf(monkeypatch, reply, dropped_tokens=None):
+    monkeypatch.setattr(settings, "PDF_TRANSFORM_SECTION_TOKENS", 50)
+    monkeypatch.setattr(settings, "PDF_TRANSFORM_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "CONTEXT_MAX_PDF_TOKENS", 100_000)
+    agent, steps = _agent(monkeypatch, reply)
+    options = agent._pdf_transform_options(agent.default_call_options)
+    pdf_text = "\n\n".join(_PDF_PARAGRAPHS)
+    pdf_tokens = context_budget_manager.count_tokens(pdf_text, options.model_name)
+
+    result = asyncio.run(agent._transform_pdf_map_reduce(pdf_text, pdf_tokens, options, dropped_tokens))
+    return result, steps
+
+
+def test_pdf_map_reduce_covers_every_section_with_bounded_concurrency(monkeypatch):
+    result, steps = _transform_pdf(monkeypatch, _pdf_reply())
+
+    map_prompts = steps.prompts("pdf_transform_map")
+    assert len(map_prompts) > 2
+    # Cada párrafo va a exactamente una sección, sin cortes a mitad de párrafo
+    for paragraph in _PDF_PARAGRAPHS:
+        assert sum(paragraph in prompt for prompt in map_prompts) == 1
+    assert steps.max_active == settings.PDF_TRANSFORM_CONCURRENCY
+
+    assert steps.calls[-1][0] == "pdf_transform" # La fase reduce va después de todas las secciones
+    reduce_prompt = steps.calls[-1][1]
+    positions = [reduce_prompt.index(f"borrador de la sección {index + 1}") for index in range(len(map_prompts))]
+    assert positions == sorted(positions)
+    assert result == "borrador del documento completo"
+
+
+def test_pdf_map_reduce_reports_failed_sections_and_combines_the_rest(monkeypatch):
+    dropped_tokens = {}
+
+    result, steps = _transform_pdf(monkeypatch, _pdf_reply(failing_paragraph=_PDF_PARAGRAPHS[0]), dropped_tokens)
+
+    assert result == "borrador del documento completo"
+    reduce_prompt = steps.calls[-1][1]
+    assert "[Sección 1]" not in reduce_prompt and "[Sección 2]" in reduce_prompt
+    assert dropped_tokens["pdf_sections_failed"] > 0
+
+
+def test_pdf_map_reduce_returns_none_when_every_section_fails(monkeypatch):
+    def reply(step, prompt):
+        raise RuntimeError("proveedor caído")
+
+    result, steps = _transform_pdf(monkeypatch, reply)
+
+    assert result is None
+    assert not steps.prompts("pdf_transform") # Sin borradores no hay fase reduce
+
+
+def _research_reply(step, prompt):
+    if step == "research_map":
+        return f"nota: {prompt.rsplit(chr(10), 1)[-1]}"
+    return "resumen combinado"
+
+
+def test_research_map_reduce_summarizes_the_relevant_chunks_with_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "RESEARCH_MAP_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "RESEARCH_MAP_MAX_CHUNKS", 4)
+    agent, steps = _agent(monkeypatch, _research_reply)
+    dropped_tokens = {}
+
+    result = asyncio.run(agent._research_map_reduce(_RESEARCH_TOPIC, _RESEARCH_CHUNKS, dropped_tokens))
+
+    map_prompts = steps.prompts("research_map")
+    assert len(map_prompts) == 4
+    assert not any("cafetería" in prompt or "baloncesto" in prompt for prompt in map_prompts)
+    assert dropped_tokens["research_map"] > 0
+    assert steps.max_active == 2
+
+    assert result == "resumen combinado"
+    reduce_prompt = steps.prompts("web_research")[0]
+    assert reduce_prompt.count("[Fuente 1]") == 2 and reduce_prompt.count("[Fuente 2]") == 2
+
+
+def test_research_falls_back_to_a_single_call_without_partial_summaries(monkeypatch):
+    def reply(step, prompt):
+        return blog_prompts.RESEARCH_MAP_NO_INFO if step == "research_map" else "resumen en una llamada"
+
+    agent, steps = _agent(monkeypatch, reply)
+
+    result = asyncio.run(agent._research_urls(_RESEARCH_TOPIC, _RESEARCH_CHUNKS, mode="map_reduce"))
+
+    assert result == "resumen en una llamada"
+    single_call_prompt = steps.prompts("web_research")[0]
+    assert "Contenido extraído de URLs de referencia" in single_call_prompt
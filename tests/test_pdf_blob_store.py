@@ -0,0 +1,68 @@
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from common.services.pdf_blob_store import PdfBlobNotFoundError, PdfBlobStore
+
+
+def _store(directory: str, max_bytes: int = 1_000_000) -> PdfBlobStore:
+    return PdfBlobStore(directory=directory, max_bytes=max_bytes, max_file_bytes=1_000_000, chunk_size=64)
+
+
+def _upload(store: PdfBlobStore, content: bytes, filename: str, owner: str):
+    return asyncio.run(store.save_upload(UploadFile(io.BytesIO(content), filename=filename), owner=owner))
+
+
+def test_same_content_is_stored_once_and_filenames_stay_per_user(tmp_path):
+    store = _store(str(tmp_path))
+    content = b"%PDF-1.4 contenido del caso de exito"
+
+    first = _upload(store, content, "informe-confidencial.pdf", owner="user-1")
+    second = _upload(store, content, "caso.pdf", owner="user-2")
+
+    assert first.pdf_hash == second.pdf_hash
+    assert second.already_stored
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".pdf")]) == 1
+    assert store.describe(first.pdf_hash, "user-1").filename == "informe-confidencial.pdf"
+    assert store.describe(first.pdf_hash, "user-2").filename == "caso.pdf"
+
+
+def test_users_cannot_reference_pdfs_they_did_not_upload(tmp_path):
+    store = _store(str(tmp_path))
+    stored = _upload(store, b"%PDF-1.4 caso de exito de otro cliente", "privado.pdf", owner="user-1")
+
+    with pytest.raises(PdfBlobNotFoundError):
+        store.describe(stored.pdf_hash, "user-2")
+    with pytest.raises(PdfBlobNotFoundError):
+        store.locate(stored.pdf_hash, owner="user-2")
+    assert store.locate(stored.pdf_hash, owner="user-1")[1] == stored.size_bytes
+
+
+def test_non_pdf_uploads_and_unknown_hashes_are_rejected(tmp_path):
+    store = _store(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        _upload(store, b"<html></html>", "pagina.html", owner="user-1")
+    with pytest.raises(PdfBlobNotFoundError):
+        store.locate("0" * 64)
+    assert not [name for name in os.listdir(tmp_path) if not name.startswith(".")]
+
+
+def test_eviction_keeps_blobs_recently_used_by_another_worker(tmp_path):
+    worker_a = _store(str(tmp_path), max_bytes=2500)
+    worker_b = _store(str(tmp_path), max_bytes=2500)
+    older = _upload(worker_a, b"%PDF-" + b"a" * 1000, "a.pdf", owner="user-1")
+    newer = _upload(worker_a, b"%PDF-" + b"b" * 1000, "b.pdf", owner="user-1")
+
+    time.sleep(0.01)
+    worker_b.locate(older.pdf_hash) # Otro worker entrega el PDF más antiguo del índice de worker_a
+    time.sleep(0.01)
+    _upload(worker_a, b"%PDF-" + b"c" * 1000, "c.pdf", owner="user-1")
+
+    worker_b.locate(older.pdf_hash)
+    with pytest.raises(PdfBlobNotFoundError):
+        worker_b.locate(newer.pdf_hash)
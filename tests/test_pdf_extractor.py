@@ -0,0 +1,116 @@
+import asyncio
+import io
+
+import pytest
+from PyPDF2 import PdfWriter
+
+from common.services.pdf_extractor import (
+    PdfExtractionOverloadedError,
+    PdfExtractor,
+    PdfTooLargeError,
+    _MemoryAdmission,
+)
+
+
+def _blank_pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _extractor(**kwargs) -> PdfExtractor:
+    # workers=0: pool de hilos, para no lanzar procesos en los tests
+    options = dict(workers=0, pages_per_task=2, max_pages=100, max_bytes=10_000_000, memory_factor=1,
+                   max_inflight_memory_mb=1, admission_timeout=0.05, normalize=True)
+    options.update(kwargs)
+    return PdfExtractor(**options)
+
+
+def test_admission_waits_until_memory_is_released():
+    admission = _MemoryAdmission(limit_bytes=100)
+    order = []
+
+    async def parse(name: str, size: int, duration: float):
+        reserved = await admission.acquire(size, timeout=1)
+        order.append(f"{name}+")
+        await asyncio.sleep(duration)
+        order.append(f"{name}-")
+        await admission.release(reserved)
+
+    async def run():
+        await asyncio.gather(parse("a", 70, 0.02), parse("b", 50, 0), parse("c", 30, 0))
+
+    asyncio.run(run())
+    # "c" cabe junto a "a"; "b" espera a que "a" libere su memoria
+    assert order.index("b+") > order.index("a-")
+    assert order.index("c+") < order.index("a-")
+    assert admission.in_use_bytes == 0
+    assert admission.waiting == 0
+
+
+def test_admission_times_out_when_memory_never_frees():
+    admission = _MemoryAdmission(limit_bytes=100)
+
+    async def run():
+        await admission.acquire(80, timeout=1)
+        await admission.acquire(40, timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert admission.in_use_bytes == 80
+    assert admission.waiting == 0
+
+
+def test_documents_larger_than_the_limit_are_admitted_alone():
+    admission = _MemoryAdmission(limit_bytes=100)
+
+    async def run():
+        reserved = await admission.acquire(500, timeout=0.01)
+        assert reserved == 100
+        await admission.release(reserved)
+
+    asyncio.run(run())
+    assert admission.in_use_bytes == 0
+
+
+def test_extraction_is_rejected_when_admission_is_saturated():
+    extractor = _extractor()
+    pdf_bytes = _blank_pdf(1)
+
+    async def run():
+        await extractor._admission.acquire(extractor._admission.limit_bytes, timeout=1)
+        await extractor.extract_text(pdf_bytes)
+
+    try:
+        with pytest.raises(PdfExtractionOverloadedError):
+            asyncio.run(run())
+    finally:
+        extractor.shutdown()
+    assert extractor.get_stats()["rejected_overloaded"] == 1
+
+
+def test_oversized_pdfs_are_rejected_before_parsing():
+    extractor = _extractor(max_bytes=10)
+
+    with pytest.raises(PdfTooLargeError):
+        asyncio.run(extractor.extract_text(_blank_pdf(1)))
+    assert extractor.get_stats()["rejected_too_large"] == 1
+
+
+def test_pages_are_extracted_in_ranges_up_to_max_pages():
+    extractor = _extractor(max_pages=3)
+
+    try:
+        result = asyncio.run(extractor.extract_text(_blank_pdf(5)))
+    finally:
+        extractor.shutdown()
+
+    assert result.page_count == 5
+    assert result.pages_extracted == 3
+    assert result.truncated
+    stats = extractor.get_stats()
+    assert stats["truncated_documents"] == 1
+    assert stats["inflight_memory_mb"] == 0
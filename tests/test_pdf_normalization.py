@@ -0,0 +1,88 @@
+from common.utils.pdf_normalization import normalize_pdf_pages
+
+# Cuerpos distintos en cada página: con páginas tan cortas, todas sus líneas están en la zona de cabecera/pie
+_BODIES = [
+    "El cliente necesitaba reducir sus tiempos de entrega.",
+    "Se analizaron los procesos del almacén central.",
+    "La solución combinó sensores y un panel de control.",
+    "Los operarios recibieron formación durante una semana.",
+    "El plazo medio de entrega bajó un tercio.",
+]
+
+
+def _page(number: int, body: str, header: str = "Informe técnico ACME") -> str:
+    return f"{header}\n{body}\n{number}"
+
+
+def test_repeated_headers_and_sequential_page_numbers_are_removed():
+    pages = [_page(number, body) for number, body in enumerate(_BODIES, start=1)]
+
+    normalized = normalize_pdf_pages(pages)
+
+    assert "Informe técnico ACME" not in normalized.text
+    assert normalized.text.splitlines() == _BODIES
+    assert normalized.removed_lines == 10
+
+
+def test_page_numbers_with_offset_and_page_of_total_are_removed():
+    # La numeración empieza en 3 (portada e índice sin numerar) y usa el formato "Página N de M"
+    pages = [f"{body}\nPágina {index + 3} de 9" for index, body in enumerate(_BODIES)]
+
+    normalized = normalize_pdf_pages(pages)
+
+    assert "Página" not in normalized.text
+    assert normalized.removed_lines == 5
+
+
+def test_numeric_edge_lines_outside_the_page_sequence_are_kept():
+    pages = [_page(number, body) for number, body in enumerate(_BODIES, start=1)]
+    pages[1] = "2023\nResumen del ejercicio.\n2"
+    pages[3] = "Informe técnico ACME\nTotal de horas ahorradas\n1250"
+
+    normalized = normalize_pdf_pages(pages)
+
+    lines = normalized.text.splitlines()
+    assert "2023" in lines
+    assert "1250" in lines
+    assert "2" not in lines
+
+
+def test_lone_numbers_are_kept_in_short_documents():
+    normalized = normalize_pdf_pages(["Ventas\n2023", "Costes\n2024"])
+
+    assert normalized.text == "Ventas\n2023\nCostes\n2024"
+    assert normalized.removed_lines == 0
+
+
+def test_line_break_hyphens_are_joined():
+    normalized = normalize_pdf_pages(["La implemen-\ntación se completó en tres semanas."])
+
+    assert normalized.text == "La implementación se completó en tres semanas."
+    assert normalized.dehyphenated == 1
+
+
+def test_compound_words_keep_their_hyphen_when_both_parts_are_words_in_the_document():
+    text = (
+        "Aplicamos machine learning al proceso.\n"
+        "El modelo de machine-\nlearning redujo los errores."
+    )
+
+    normalized = normalize_pdf_pages([text])
+
+    assert "machine-learning redujo" in normalized.text
+    assert normalized.dehyphenated == 0
+
+
+def test_compound_words_keep_their_hyphen_when_the_compound_appears_elsewhere():
+    text = "El acuerdo franco-alemán se firmó en 2021.\nEl consorcio franco-\nalemán amplió el proyecto."
+
+    normalized = normalize_pdf_pages([text])
+
+    assert "consorcio franco-alemán amplió" in normalized.text
+
+
+def test_soft_hyphen_breaks_are_always_joined():
+    normalized = normalize_pdf_pages(["Aplicamos machine learning.\nmachine­\nlearning"])
+
+    assert normalized.text.endswith("machinelearning")
+    assert normalized.dehyphenated == 1
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+import pytest
+
+from common.services.pipeline import Pipeline, pipeline_stats
+
+
+def test_steps_receive_their_dependencies_and_run_in_order():
+    order = []
+
+    def source():
+        order.append("source")
+        return 2
+
+    async def double(source):
+        order.append("double")
+        return source * 2
+
+    def total(source, double):
+        order.append("total")
+        return source + double
+
+    pipeline = Pipeline("test_order").add("total", total, depends_on=["source", "double"])
+    pipeline.add("double", double, depends_on=["source"]).add("source", source)
+
+    result = asyncio.run(pipeline.run())
+
+    assert order == ["source", "double", "total"]
+    assert result.results == {"source": 2, "double": 4, "total": 6}
+    assert set(result.timings_ms) == {"source", "double", "total"}
+    assert pipeline_stats.get_stats()["test_order"]["total"]["runs"] >= 1
+
+
+def test_independent_steps_run_in_parallel():
+    async def run():
+        started_a, started_b = asyncio.Event(), asyncio.Event()
+
+        async def step_a():
+            started_a.set()
+            await started_b.wait() # Solo termina si el otro paso ha arrancado a la vez
+            return "a"
+
+        async def step_b():
+            started_b.set()
+            await started_a.wait()
+            return "b"
+
+        pipeline = Pipeline("test_parallel").add("a", step_a).add("b", step_b)
+        return await asyncio.wait_for(pipeline.run(), timeout=1)
+
+    assert asyncio.run(run()).results == {"a": "a", "b": "b"}
+
+
+def test_blocking_steps_run_outside_the_event_loop_thread():
+    loop_thread = threading.get_ident()
+    pipeline = Pipeline("test_blocking").add("parse", threading.get_ident, blocking=True)
+
+    assert asyncio.run(pipeline.run()).results["parse"] != loop_thread
+
+
+def test_a_failing_step_propagates_and_cancels_the_rest():
+    cancelled = []
+    dependents = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise RuntimeError("paso caído")
+
+    pipeline = Pipeline("test_failure").add("slow", slow).add("failing", failing)
+    pipeline.add("after", lambda failing: dependents.append(failing), depends_on=["failing"])
+
+    with pytest.raises(RuntimeError, match="paso caído"):
+        asyncio.run(pipeline.run())
+    assert cancelled == ["slow"]
+    assert dependents == []
+
+
+def test_provided_results_are_reused_instead_of_recomputed():
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "calculado"
+
+    pipeline = Pipeline("test_reuse").add("expensive", expensive)
+    pipeline.add("upper", lambda expensive: expensive.upper(), depends_on=["expensive"])
+
+    result = asyncio.run(pipeline.run({"expensive": "cacheado"}))
+
+    assert calls == []
+    assert result.reused == ["expensive"]
+    assert result.results["upper"] == "CACHEADO"
+
+
+def test_cycles_missing_dependencies_and_duplicates_are_rejected():
+    cyclic = Pipeline("test_cycle").add("a", lambda b: b, depends_on=["b"]).add("b", lambda a: a, depends_on=["a"])
+    with pytest.raises(ValueError, match="cíclicas"):
+        asyncio.run(cyclic.run())
+
+    missing = Pipeline("test_missing").add("a", lambda ghost: ghost, depends_on=["ghost"])
+    with pytest.raises(ValueError, match="inexistentes"):
+        asyncio.run(missing.run())
+    # Una dependencia aportada ya calculada sí es válida
+    assert asyncio.run(missing.run({"ghost": 1})).results["a"] == 1
+
+    with pytest.raises(ValueError, match="duplicado"):
+        Pipeline("test_duplicate").add("a", lambda: 1).add("a", lambda: 2)
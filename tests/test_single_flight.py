@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from common.base_agent import LLMCallOptions
+from common.services.single_flight import SingleFlight
+from linkedin.agents.linkedin_agent import LinkedInAgent
+
+
+def test_concurrent_callers_share_the_leader_result():
+    flight = SingleFlight("test", enabled=True)
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resultado"
+
+    async def run():
+        return await asyncio.gather(*(flight.run("key", operation) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["resultado"] * 5
+    assert len(calls) == 1
+    assert flight.leaders == 1
+    assert flight.coalesced == 4
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_followers_receive_the_leader_exception_and_the_key_is_released():
+    flight = SingleFlight("test", enabled=True)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("proveedor caído")
+
+    async def run():
+        return await asyncio.gather(*(flight.run("key", failing) for _ in range(3)), return_exceptions=True)
+
+    async def succeeding():
+        return "recuperado"
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.get_stats()["in_flight"] == 0
+    # El error no queda memorizado: la siguiente llamada con la misma clave se ejecuta de nuevo
+    assert asyncio.run(flight.run("key", succeeding)) == "recuperado"
+
+
+def test_cancelling_one_caller_does_not_cancel_the_shared_operation():
+    flight = SingleFlight("test", enabled=True)
+
+    async def operation():
+        await asyncio.sleep(0.02)
+        return "resultado"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.run("key", operation))
+        follower = asyncio.ensure_future(flight.run("key", operation))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "resultado"
+    assert flight.leaders == 1
+
+
+def test_different_keys_and_sequential_calls_are_not_merged():
+    flight = SingleFlight("test", enabled=True)
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def run():
+        await asyncio.gather(flight.run("a", operation), flight.run("b", operation))
+        await flight.run("a", operation)
+
+    asyncio.run(run())
+    assert len(calls) == 3
+
+
+def _agent_calls(fake_llm, temperature: float, cache_mode: str) -> int:
+    agent = LinkedInAgent(model_identifier="Default", temperature=0.7)
+    options = LLMCallOptions(
+        model_name=agent.model_name, temperature=temperature, max_tokens=100, cache_mode=cache_mode
+    )
+
+    async def run():
+        await asyncio.gather(*(agent._call_llm_with_prompts("system", "human", options) for _ in range(4)))
+
+    asyncio.run(run())
+    return len(fake_llm)
+
+
+def test_agent_merges_identical_deterministic_calls(fake_llm):
+    assert _agent_calls(fake_llm, temperature=0, cache_mode="bypass") == 1
+
+
+def test_agent_merges_identical_cacheable_calls(fake_llm):
+    assert _agent_calls(fake_llm, temperature=0.7, cache_mode="prefer") == 1
+
+
+def test_agent_does_not_merge_fresh_sampled_calls(fake_llm):
+    assert _agent_calls(fake_llm, temperature=0.7, cache_mode="bypass") == 4
@@ -0,0 +1,12 @@
+from common.utils.stats import percentile
+
+
+def test_nearest_rank_percentile_on_sorted_values():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 0) == 1.0 # Los extremos no se salen de la lista
+    assert percentile(values, 100) == 100.0
+    assert percentile([1.23456], 99, ndigits=2) == 1.23
+    assert percentile([], 50) is None
@@ -0,0 +1,145 @@
+import asyncio
+from typing import List
+
+import httpx
+
+from common.services.url_cache import CachedPage, UrlContentCache
+from common.services.url_fetcher import UrlFetcher
+from core.config import settings
+
+_URL = "https://example.com/articulo"
+_HTML = (
+    "<html><body><article><h1>Mantenimiento predictivo</h1>"
+    "<p>Los sensores de vibración anticipan las averías de los motores con semanas de margen.</p>"
+    "</article></body></html>"
+)
+
+
+def _fetcher(handler) -> UrlFetcher:
+    fetcher = UrlFetcher(http2=False)
+    fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=False)
+    return fetcher
+
+
+def _run_fetches(fetcher: UrlFetcher, cache: UrlContentCache, times: int) -> List[str]:
+    async def run():
+        try:
+            return [await fetcher.fetch_text(_URL, cache=cache) for _ in range(times)]
+        finally:
+            await fetcher.aclose()
+
+    return asyncio.run(run())
+
+
+def test_fresh_entries_are_served_without_network(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, headers={"content-type": "text/html", "etag": '"v1"'}, text=_HTML)
+
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=3600, max_bytes=1_000_000, enabled=True)
+    texts = _run_fetches(_fetcher(handler), cache, times=3)
+
+    assert len(requests) == 1
+    assert texts[0] and texts[0] == texts[1] == texts[2]
+    assert "sensores de vibración" in texts[0]
+    assert (cache.misses, cache.hits) == (1, 2)
+
+
+def test_stale_entries_are_revalidated_with_conditional_get(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/html", "etag": '"v1"', "last-modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+            text=_HTML,
+        )
+
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=0, max_bytes=1_000_000, enabled=True)
+    texts = _run_fetches(_fetcher(handler), cache, times=2)
+
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[0].headers
+    assert requests[1].headers["if-none-match"] == '"v1"'
+    assert requests[1].headers["if-modified-since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert texts[0] == texts[1]
+    assert cache.revalidated == 1
+
+
+def test_changed_pages_replace_the_cached_text(tmp_path):
+    versions = iter(["Primera versión del informe técnico.", "Segunda versión del informe técnico."])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = f"<html><body><article><p>{next(versions)} Incluye resultados y métricas.</p></article></body></html>"
+        return httpx.Response(200, headers={"content-type": "text/html", "etag": '"otra"'}, text=body)
+
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=0, max_bytes=1_000_000, enabled=True)
+    first, second = _run_fetches(_fetcher(handler), cache, times=2)
+
+    assert "Primera" in first
+    assert "Segunda" in second
+    assert cache.misses == 2
+
+
+def test_stale_copy_is_served_when_the_origin_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "URL_CACHE_STALE_IF_ERROR", True)
+    responses = iter([
+        httpx.Response(200, headers={"content-type": "text/html"}, text=_HTML),
+        httpx.Response(503),
+    ])
+
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=0, max_bytes=1_000_000, enabled=True)
+    first, second = _run_fetches(_fetcher(lambda request: next(responses)), cache, times=2)
+
+    assert second == first
+    assert cache.stale_served == 1
+
+
+def test_no_store_responses_are_not_cached(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, headers={"content-type": "text/html", "cache-control": "no-store"}, text=_HTML)
+
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=3600, max_bytes=1_000_000, enabled=True)
+    _run_fetches(_fetcher(handler), cache, times=2)
+
+    assert len(requests) == 2
+    assert not list(tmp_path.iterdir())
+
+
+
+def test_truncated_pages_are_not_cached(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, headers={"content-type": "text/html", "etag": '"v1"'}, text=_HTML)
+
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=3600, max_bytes=1_000_000, enabled=True)
+    fetcher = _fetcher(handler)
+    fetcher.max_bytes = len(_HTML) // 2
+    texts = _run_fetches(fetcher, cache, times=2)
+
+    assert texts[0] # El texto recortado se usa en la petición, pero no se guarda
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[1].headers
+    assert not list(tmp_path.iterdir())
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = UrlContentCache(directory=str(tmp_path), ttl_seconds=3600, max_bytes=700, enabled=True)
+    for name in ("a", "b"):
+        cache._write(CachedPage(url=f"https://example.com/{name}", text=name * 200))
+    assert cache._read("https://example.com/a") is not None # "a" pasa a ser la usada más recientemente
+
+    cache._write(CachedPage(url="https://example.com/c", text="c" * 200))
+
+    assert cache._read("https://example.com/b") is None
+    assert cache._read("https://example.com/a") is not None
+    assert cache.evictions == 1